@@ -0,0 +1,142 @@
+"""
+Application factory. Routers and the services they use are imported by
+``create_app``, so importing the package, e.g. by CLI tools, doesn't import
+FastAPI and controllers.
+"""
+import anyio.to_thread
+from fastapi import FastAPI, Request, HTTPException
+from fastapi.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse
+
+from acc_server_mgr.config import config
+from acc_server_mgr.database import db
+from acc_server_mgr.ownership import SupervisorUnavailable
+from acc_server_mgr.storage.utils import FilterError, VersionConflict
+
+
+async def handle_http_exception(request: Request, exc: HTTPException):
+    return JSONResponse(
+        {
+            "detail": exc.detail
+        },
+        status_code=exc.status_code
+    )
+
+
+async def handle_filter_error(request: Request, exc: FilterError):
+    return JSONResponse(
+        {
+            "detail": str(exc)
+        },
+        status_code=422
+    )
+
+
+async def handle_version_conflict(request: Request, exc: VersionConflict):
+    return JSONResponse(
+        {
+            "detail": "changed since If-Match"
+        },
+        status_code=412
+    )
+
+
+async def handle_supervisor_unavailable(request: Request,
+                                        exc: SupervisorUnavailable):
+    return JSONResponse(
+        {
+            "detail": f"supervisor unavailable: {exc}"
+        },
+        status_code=503
+    )
+
+
+async def handle_exception(request: Request, exc: Exception):
+    return JSONResponse(
+        {"status": "error", "message": str(exc)},
+        status_code=500
+    )
+
+exception_handlers = {
+    HTTPException: handle_http_exception,
+    FilterError: handle_filter_error,
+    VersionConflict: handle_version_conflict,
+    SupervisorUnavailable: handle_supervisor_unavailable,
+    Exception: handle_exception
+}
+
+
+def allow_origins() -> list[str]:
+    """
+    ``[csrf] allow_origins``, separated by commas or lines.
+    """
+    value = config.get("csrf", "allow_origins")
+    return [
+        it.strip() for it in value.replace("\n", ",").split(",") if it.strip()
+    ]
+
+
+async def limit_threadpool():
+    """
+    Limit threads running sync endpoints and dependencies to
+    ``[server] threadpool_size``. Each keeps a read connection open.
+    """
+    anyio.to_thread.current_default_thread_limiter().total_tokens = \
+        config.getint("server", "threadpool_size")
+
+
+def create_app() -> FastAPI:
+    from acc_server_mgr.controllers import (
+        users, auth, server_config, event, leaderboard, admin, metrics,
+    )
+    from acc_server_mgr import migrations
+    from acc_server_mgr.metrics import MetricsMiddleware, on_execute
+    from acc_server_mgr.ownership import ownership
+    from acc_server_mgr.process_stats import sampler
+    from acc_server_mgr.slow_queries import slow_queries
+
+    app = FastAPI(
+        exception_handlers=exception_handlers,
+        on_startup=[
+            limit_threadpool, migrations.startup, ownership.startup,
+            sampler.startup,
+        ],
+        on_shutdown=[sampler.shutdown, ownership.shutdown, db.stop_writer],
+    )
+    app.add_middleware(
+        CORSMiddleware,
+        expose_headers=[
+            "Authorization",
+            "Content-Type",
+            "Content-Length",
+            "Accept",
+            "ETag",
+        ],
+        allow_origins=allow_origins(),
+        allow_credentials=True,
+        allow_methods=[
+            "GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS", "HEAD",
+        ],
+        allow_headers=[
+            "Authorization",
+            "Content-Type",
+            "Content-Length",
+            "Accept",
+            "If-Match",
+            "If-None-Match",
+        ]
+    )
+    # outermost, so responses of other middleware are measured too
+    app.add_middleware(MetricsMiddleware)
+    if on_execute not in db.execute_hooks:
+        db.execute_hooks.append(on_execute)
+    slow_queries.install()
+
+    app.include_router(admin.router)
+    app.include_router(auth.router)
+    app.include_router(event.router)
+    app.include_router(leaderboard.router)
+    app.include_router(metrics.router)
+    app.include_router(server_config.router)
+    app.include_router(users.router)
+    return app
@@ -0,0 +1,68 @@
+import configparser
+import os
+
+CONFIG_PATH = os.environ.get("ACC_SERVER_MGR_CONFIG", "./config.ini")
+
+DEFAULTS = {
+    "database": {
+        "path": "./app.db",
+        "cache_size": "64000",
+        "mmap_size": "0",
+        "synchronous": "off",
+        "result_cache_size": "256",
+        "slow_query_seconds": "",
+        "slow_query_log_size": "100",
+    },
+    "server": {
+        "host": "127.0.0.1",
+        "port": "8000",
+        "root_path": "/api",
+        "workers": "1",
+        "threadpool_size": "40",
+        "reload": "false",
+        "lease_ttl": "10",
+        "lease_interval": "3",
+    },
+    "csrf": {
+        "allow_origins": "*",
+    },
+    "auth": {
+        "token_cache_size": "1024",
+        "token_cache_ttl": "300",
+    },
+    "acc": {
+        "server_exe_path": "",
+        "instances_path": "./instances",
+        "stop_timeout": "10",
+        "spawn_limit": "8",
+        "log_lines": "1000",
+        "log_line_length": "1024",
+        "output_max_size": "10485760",
+        "state_transitions": "1000",
+        "stats_interval": "1",
+        "stats_samples": "3600",
+        "results_scan_interval": "30",
+    },
+}
+
+
+# paths that are left empty in the file, e.g. as in older dist.config.ini,
+# use the default
+PATHS = [("database", "path"), ("acc", "instances_path")]
+
+
+def load(path=CONFIG_PATH) -> configparser.ConfigParser:
+    """
+    Read config file at ``path`` on top of ``DEFAULTS``. A missing file is not
+    an error, defaults apply.
+    """
+    parser = configparser.ConfigParser()
+    parser.read_dict(DEFAULTS)
+    parser.read(path, encoding="UTF-8")
+    for section, option in PATHS:
+        if not parser.get(section, option).strip():
+            parser.set(section, option, DEFAULTS[section][option])
+    return parser
+
+
+config = load()
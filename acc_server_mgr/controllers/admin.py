@@ -0,0 +1,53 @@
+from fastapi import APIRouter, Depends, Response
+from acc_server_mgr.controllers.auth import require_auth
+from acc_server_mgr.controllers.utils import authorize
+from acc_server_mgr.models.schema import (
+    CacheInfoResponse, SlowQueriesResponse,
+)
+from acc_server_mgr.slow_queries import slow_queries
+from acc_server_mgr.storage import cache, compiler
+from acc_server_mgr.token_cache import tokens
+
+AUTH_SCOPE = "admin"
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+
+@router.get("/cache", response_model=CacheInfoResponse)
+def cache_info(auth=Depends(require_auth)):
+    """
+    requires user authorization scope ``admin``
+
+    Hit and miss counters of storage caches.
+    """
+    authorize(auth, AUTH_SCOPE)
+    return CacheInfoResponse(
+        statements=compiler.statements.info(),
+        counts=cache.counts.info(),
+        tokens=tokens.info(),
+        results=cache.results.info(),
+    )
+
+
+@router.get("/slow_queries", response_model=SlowQueriesResponse)
+def slow_queries_(auth=Depends(require_auth)):
+    """
+    requires user authorization scope ``admin``
+
+    Statements slower than ``[database] slow_query_seconds``, with their
+    query plans.
+    """
+    authorize(auth, AUTH_SCOPE)
+    return SlowQueriesResponse(
+        threshold=slow_queries.threshold, items=slow_queries.items()
+    )
+
+
+@router.delete("/slow_queries")
+def clear_slow_queries(auth=Depends(require_auth)):
+    """
+    requires user authorization scope ``admin``
+    """
+    authorize(auth, AUTH_SCOPE)
+    slow_queries.clear()
+    return Response(status_code=204)
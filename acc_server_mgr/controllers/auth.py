@@ -8,7 +8,9 @@ from jwt import PyJWTError
 
 from acc_server_mgr.controllers.utils import Unauthorized, Forbidden
 from acc_server_mgr.database import use_db
-from acc_server_mgr.storage import user as storage
+from acc_server_mgr.models.db import User as UserModel
+from acc_server_mgr.storage import cache, user as storage
+from acc_server_mgr.token_cache import tokens, VerifiedToken
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 secret = "secret"
@@ -17,13 +19,32 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/token")
 log = logging.getLogger(__name__)
 
 
-def require_auth(token=Depends(oauth2_scheme)):
+def require_auth(token=Depends(oauth2_scheme), db=Depends(use_db)):
+    """
+    Claims of ``token`` with scopes of its user, who must exist and be
+    enabled. Verified tokens are cached until users are written.
+    """
+    key = tokens.key(token)
+    generations = cache.generations(UserModel)
+    verified = tokens.get(key, generations)
+    if verified is not None:
+        return verified
+
     try:
-        return jwt.decode(token.encode("UTF-8"), secret, algorithms=[algorithm])
+        claims = jwt.decode(
+            token.encode("UTF-8"), secret, algorithms=[algorithm]
+        )
     except PyJWTError as err:
         log.exception("token decode error")
         raise Forbidden()
 
+    user_obj = storage.get_one(db, claims.get("user_id"))
+    if user_obj is None or not user_obj.is_enabled:
+        raise Forbidden()
+    verified = VerifiedToken(claims, user_obj.scopes)
+    tokens.set(key, verified, generations)
+    return verified
+
 
 class TokenResponse(pydantic.BaseModel):
     token_type: str
@@ -1,6 +1,13 @@
-from fastapi import APIRouter, Depends, Response
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Request, Response, Header
+from fastapi.concurrency import run_in_threadpool
+from acc_server_mgr import serializers
 from acc_server_mgr.controllers.auth import require_auth
-from acc_server_mgr.controllers.utils import authorize, NotFound
+from acc_server_mgr.controllers.utils import (
+    authorize, NotFound, Conflict, parse_records, import_records, etag,
+    not_modified, expected_version,
+)
 from acc_server_mgr.database import use_db
 from acc_server_mgr.models.schema import (
     Event,
@@ -8,6 +15,7 @@ from acc_server_mgr.models.schema import (
     EventCreateRequest,
     EventResponse,
     EventSearchResponse, FilterRequest,
+    BulkImportResponse,
 )
 from acc_server_mgr.storage import event as storage
 
@@ -26,14 +34,45 @@ def create(data: EventCreateRequest, auth=Depends(require_auth), db=Depends(use_
     return EventResponse.from_orm(obj)
 
 
+@router.post("/_bulk", response_model=BulkImportResponse)
+async def bulk_import(request: Request,
+                      auth=Depends(require_auth),
+                      db=Depends(use_db)):
+    """
+    requires user authorization scope ``event``
+
+    Create events from a JSON array of ``EventCreateRequest``, or NDJSON with
+    ``Content-Type: application/x-ndjson``. Invalid or rejected records are
+    reported per record, the others are created.
+    """
+    authorize(auth, AUTH_SCOPE)
+    records = parse_records(
+        await request.body(), request.headers.get("content-type")
+    )
+    return await run_in_threadpool(
+        import_records, db, records, EventCreateRequest, storage.create_many
+    )
+
+
 @router.get("/{id}", response_model=EventResponse)
-def get_one(id: int, auth=Depends(require_auth), db=Depends(use_db)):
+def get_one(id: int,
+            response: Response,
+            if_none_match: Optional[str] = Header(None),
+            auth=Depends(require_auth),
+            db=Depends(use_db)):
     """
     requires user authorization scope ``event``
+
+    Responds 304 if ``If-None-Match`` matches the ``ETag`` of the event.
     """
     authorize(auth, AUTH_SCOPE)
+    unchanged = not_modified(if_none_match, storage.get_version, db, id)
+    if unchanged is not None:
+        return unchanged
+
     obj = storage.get_one(db, id)
     if obj:
+        response.headers["ETag"] = etag(storage.version(obj))
         return EventResponse.from_orm(obj)
 
     raise NotFound()
@@ -42,14 +81,21 @@ def get_one(id: int, auth=Depends(require_auth), db=Depends(use_db)):
 @router.patch("/{id}", response_model=EventResponse)
 def update_one(id: int,
                data: EventUpdateRequest,
+               response: Response,
+               if_match: Optional[str] = Header(None),
                auth=Depends(require_auth),
                db=Depends(use_db)):
     """
     requires user authorization scope ``event``
+
+    Responds 412 if ``If-Match`` doesn't match the ``ETag`` of the event.
     """
     authorize(auth, AUTH_SCOPE)
-    update_obj = storage.update_one(db, id, data)
+    update_obj = storage.update_one(
+        db, id, data, expected_version(if_match)
+    )
     if update_obj:
+        response.headers["ETag"] = etag(storage.version(update_obj))
         return EventResponse.from_orm(update_obj)
 
     raise NotFound()
@@ -61,7 +107,8 @@ def delete_one(id: int, auth=Depends(require_auth), db=Depends(use_db)):
     requires user authorization scope ``event``
     """
     authorize(auth, AUTH_SCOPE)
-    storage.delete_one(db, id)
+    if not storage.delete_one(db, id):
+        raise Conflict("event is used by server configs")
     return Response(status_code=204)
 
 
@@ -73,8 +120,6 @@ def filter_(filter_request: FilterRequest,
     requires user authorization scope ``event``
     """
     authorize(auth, AUTH_SCOPE)
-    count, items = storage.search(db, filter_request)
-    return EventSearchResponse(
-        total_count=count,
-        items=[EventResponse.from_orm(it) for it in items]
+    return serializers.cached_search_response(
+        serializers.events, storage.FIELDS, storage.search, db, filter_request
     )
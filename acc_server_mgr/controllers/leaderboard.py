@@ -0,0 +1,45 @@
+from fastapi import APIRouter, Depends
+from acc_server_mgr import serializers
+from acc_server_mgr.controllers.auth import require_auth
+from acc_server_mgr.controllers.utils import authorize, NotFound
+from acc_server_mgr.database import use_db
+from acc_server_mgr.models.schema import (
+    PersonalBestResponse,
+    PersonalBestSearchResponse,
+    FilterRequest,
+)
+from acc_server_mgr.storage import leaderboard as storage
+
+AUTH_SCOPE = "leaderboard"
+
+router = APIRouter(prefix="/leaderboard", tags=["leaderboard"])
+
+
+@router.get("/{id}", response_model=PersonalBestResponse)
+def get_one(id: int, auth=Depends(require_auth), db=Depends(use_db)):
+    """
+    requires user authorization scope ``leaderboard``
+    """
+    authorize(auth, AUTH_SCOPE)
+    obj = storage.get_one(db, id)
+    if obj:
+        return PersonalBestResponse.from_orm(obj)
+
+    raise NotFound()
+
+
+@router.post("/_filter", response_model=PersonalBestSearchResponse)
+def filter_(filter_request: FilterRequest,
+            auth=Depends(require_auth),
+            db=Depends(use_db)):
+    """
+    requires user authorization scope ``leaderboard``
+
+    Personal best laps per driver, track and car group. Sorted by
+    ``lap_time`` if ``sort`` is empty.
+    """
+    authorize(auth, AUTH_SCOPE)
+    return serializers.cached_search_response(
+        serializers.personal_bests, storage.FIELDS, storage.search, db,
+        filter_request
+    )
@@ -0,0 +1,22 @@
+from fastapi import APIRouter, Depends, Response
+from acc_server_mgr import metrics as registry
+from acc_server_mgr.controllers.auth import require_auth
+from acc_server_mgr.controllers.utils import authorize
+
+AUTH_SCOPE = "metrics"
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get("/metrics")
+def metrics(auth=Depends(require_auth)):
+    """
+    requires user authorization scope ``metrics``
+
+    Metrics in the Prometheus text format: latency, statements and status
+    codes per route, requests in flight, supervised instances and caches.
+    """
+    authorize(auth, AUTH_SCOPE)
+    return Response(
+        registry.registry.render(), media_type=registry.CONTENT_TYPE
+    )
@@ -1,13 +1,26 @@
-from fastapi import APIRouter, Depends, Response
-from acc_server_mgr import process_control
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Request, Response, Header, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+
+from acc_server_mgr import serializers
 from acc_server_mgr.controllers.auth import require_auth
-from acc_server_mgr.controllers.utils import authorize, NotFound
+from acc_server_mgr.controllers.utils import (
+    authorize, NotFound, Conflict, parse_records, import_records, etag,
+    not_modified, expected_version,
+)
 from acc_server_mgr.database import use_db
+from acc_server_mgr.ownership import use_supervisor
+from acc_server_mgr.process_stats import use_sampler
 from acc_server_mgr.models.schema import (
     ServerConfig,
     ServerConfigCreate,
     ServerConfigUpdate,
     ServerConfigResponse, ServerConfigSearchResponse, FilterRequest,
+    BulkProcessRequest, BulkProcessResponse, BulkProcessResult,
+    BulkProcessStatus, BulkImportResponse, ProcessStatsResponse,
+    StatsAggregate,
 )
 from acc_server_mgr.storage import server_config as storage
 
@@ -26,14 +39,72 @@ def create(data: ServerConfigCreate, auth=Depends(require_auth), db=Depends(use_
     return ServerConfigResponse.from_orm(obj)
 
 
+@router.post("/_bulk", response_model=BulkImportResponse)
+async def bulk_import(request: Request,
+                      auth=Depends(require_auth),
+                      db=Depends(use_db)):
+    """
+    requires user authorization scope ``server_config``
+
+    Create server configs from a JSON array of ``ServerConfigCreate``, or
+    NDJSON with ``Content-Type: application/x-ndjson``. Invalid or rejected
+    records are reported per record, the others are created.
+    """
+    authorize(auth, AUTH_SCOPE)
+    records = parse_records(
+        await request.body(), request.headers.get("content-type")
+    )
+    return await run_in_threadpool(
+        import_records, db, records, ServerConfigCreate, storage.create_many
+    )
+
+
+@router.get("/_states")
+async def states(ids: Optional[list[int]] = Query(None),
+                 backlog: int = Query(0, ge=0),
+                 last_event_id: Optional[int] = Header(None),
+                 auth=Depends(require_auth),
+                 supervisor=Depends(use_supervisor)):
+    """
+    requires user authorization scope ``server_config``
+
+    Stream state transitions of server processes of ``ids``, or of all, as
+    server-sent events with ``ProcessTransition`` JSON data. Starts with
+    transitions among up to ``backlog`` buffered ones. Event ids are
+    transition sequence numbers, reconnecting with header ``Last-Event-ID``
+    resumes after that transition.
+    """
+    authorize(auth, AUTH_SCOPE)
+    position = None if last_event_id is None else last_event_id + 1
+    return StreamingResponse(
+        _server_sent_events(
+            await supervisor.follow_states(ids, position, backlog)
+        ),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"},
+    )
+
+
 @router.get("/{id}", response_model=ServerConfigResponse)
-def get_one(id: int, auth=Depends(require_auth), db=Depends(use_db)):
+def get_one(id: int,
+            response: Response,
+            if_none_match: Optional[str] = Header(None),
+            auth=Depends(require_auth),
+            db=Depends(use_db)):
     """
     requires user authorization scope ``server_config``
+
+    Responds 304 if ``If-None-Match`` matches the ``ETag`` of the server
+    config.
     """
     authorize(auth, AUTH_SCOPE)
+    unchanged = not_modified(if_none_match, storage.get_version, db, id)
+    if unchanged is not None:
+        return unchanged
+
     obj = storage.get_one(db, id)
     if obj:
+        response.headers["ETag"] = etag(storage.version(obj))
         return ServerConfigResponse.from_orm(obj)
 
     raise NotFound()
@@ -42,14 +113,24 @@ def get_one(id: int, auth=Depends(require_auth), db=Depends(use_db)):
 @router.patch("/{id}", response_model=ServerConfigResponse)
 def update_one(id: int,
                data: ServerConfigUpdate,
+               response: Response,
+               if_match: Optional[str] = Header(None),
                auth=Depends(require_auth),
                db=Depends(use_db)):
     """
     requires user authorization scope ``server_config``
+
+    Responds 412 if ``If-Match`` doesn't match the ``ETag`` of the server
+    config.
     """
     authorize(auth, AUTH_SCOPE)
-    updated_server_config = storage.update_one(db, id, data)
+    updated_server_config = storage.update_one(
+        db, id, data, expected_version(if_match)
+    )
     if updated_server_config:
+        response.headers["ETag"] = etag(
+            storage.version(updated_server_config)
+        )
         return ServerConfigResponse.from_orm(updated_server_config)
 
     raise NotFound()
@@ -73,47 +154,206 @@ def filter_(filter_request: FilterRequest,
     requires user authorization scope ``server_config``
     """
     authorize(auth, AUTH_SCOPE)
-    count, items = storage.search(db, filter_request)
-    return ServerConfigSearchResponse(
-        total_count=count,
-        items=[ServerConfigResponse.from_orm(it) for it in items]
+    return serializers.cached_search_response(
+        serializers.server_configs, storage.FIELDS, storage.search, db,
+        filter_request
     )
 
 
 @router.post("/{id}/_start", response_model=ServerConfigResponse)
-def start(id: int, auth=Depends(require_auth), db=Depends(use_db)):
+async def start(id: int,
+                auth=Depends(require_auth),
+                db=Depends(use_db),
+                supervisor=Depends(use_supervisor)):
     """
     requires user authorization scope ``server_config``
     """
     authorize(auth, AUTH_SCOPE)
-    server_config = storage.get_one(db, id)
-
+    server_config = await run_in_threadpool(storage.get_one, db, id)
     if server_config is None:
         raise NotFound()
 
-    try:
-        process_control.start_server(server_config)
-        storage.update_obj(server_config)
-    except Exception:
-        pass
+    if not server_config.is_enabled:
+        raise Conflict("server_config is disabled")
+
+    instance = await supervisor.start(server_config)
+    for attr, value in instance.process_info().items():
+        setattr(server_config, attr, value)
 
     return ServerConfigResponse.from_orm(server_config)
 
 
 @router.post("/{id}/_stop", response_model=ServerConfigResponse)
-def stop(id: int, auth=Depends(require_auth), db=Depends(use_db)):
+async def stop(id: int,
+               auth=Depends(require_auth),
+               db=Depends(use_db),
+               supervisor=Depends(use_supervisor)):
     """
     requires user authorization scope ``server_config``
     """
     authorize(auth, AUTH_SCOPE)
-    server_config = storage.get_one(db, id)
+    await supervisor.stop(id)
+    server_config = await run_in_threadpool(storage.get_one, db, id)
     if server_config is None:
         raise NotFound()
 
-    try:
-        process_control.stop_server(server_config)
-        storage.update_obj(db, server_config)
-    except Exception:
-        pass
-
     return ServerConfigResponse.from_orm(server_config)
+
+
+def _requested_ids(data: BulkProcessRequest, server_configs):
+    if data.ids is not None:
+        return data.ids
+    return [it.id for it in server_configs]
+
+
+@router.post("/_bulk_start", response_model=BulkProcessResponse)
+async def bulk_start(data: BulkProcessRequest,
+                     auth=Depends(require_auth),
+                     db=Depends(use_db),
+                     supervisor=Depends(use_supervisor)):
+    """
+    requires user authorization scope ``server_config``
+
+    Start server configs concurrently, returns result by id.
+    """
+    authorize(auth, AUTH_SCOPE)
+    server_configs = await run_in_threadpool(
+        storage.get_many, db, data.ids, data.filter
+    )
+    found = {it.id: it for it in server_configs}
+    enabled = [it for it in server_configs if it.is_enabled]
+    running = await supervisor.running([it.id for it in enabled])
+    started = await supervisor.start_many(enabled)
+
+    items = []
+    for id in _requested_ids(data, server_configs):
+        if id not in found:
+            items.append(BulkProcessResult(
+                id=id, status=BulkProcessStatus.not_found
+            ))
+        elif id not in started:
+            items.append(BulkProcessResult(
+                id=id, status=BulkProcessStatus.disabled
+            ))
+        elif isinstance(started[id], BaseException):
+            items.append(BulkProcessResult(
+                id=id, status=BulkProcessStatus.error, detail=str(started[id])
+            ))
+        else:
+            items.append(BulkProcessResult(
+                id=id,
+                status=(
+                    BulkProcessStatus.running if id in running
+                    else BulkProcessStatus.started
+                ),
+                **started[id].process_info()
+            ))
+    return BulkProcessResponse(items=items)
+
+
+@router.post("/_bulk_stop", response_model=BulkProcessResponse)
+async def bulk_stop(data: BulkProcessRequest,
+                    auth=Depends(require_auth),
+                    db=Depends(use_db),
+                    supervisor=Depends(use_supervisor)):
+    """
+    requires user authorization scope ``server_config``
+
+    Stop server configs concurrently, returns result by id.
+    """
+    authorize(auth, AUTH_SCOPE)
+    server_configs = await run_in_threadpool(
+        storage.get_many, db, data.ids, data.filter
+    )
+    found = {it.id: it for it in server_configs}
+    stopped = await supervisor.stop_many(list(found))
+
+    items = []
+    for id in _requested_ids(data, server_configs):
+        if id not in found:
+            items.append(BulkProcessResult(
+                id=id, status=BulkProcessStatus.not_found
+            ))
+        elif stopped[id] is None:
+            items.append(BulkProcessResult(
+                id=id,
+                status=BulkProcessStatus.not_running,
+                process_is_running=found[id].process_is_running,
+                process_last_start=found[id].process_last_start,
+                process_last_stop=found[id].process_last_stop,
+                process_id=found[id].process_id,
+            ))
+        else:
+            items.append(BulkProcessResult(
+                id=id,
+                status=BulkProcessStatus.stopped,
+                process_last_start=stopped[id].started,
+                **stopped[id].exit_info()
+            ))
+    return BulkProcessResponse(items=items)
+
+
+async def _server_sent_events(items):
+    async for item in items:
+        if item is None:
+            yield ": keep-alive\n\n"
+        else:
+            position, line = item
+            yield f"id: {position}\ndata: {line.replace(chr(13), '')}\n\n"
+
+
+@router.get("/{id}/_log")
+async def log(id: int,
+              backlog: int = Query(100, ge=0),
+              last_event_id: Optional[int] = Header(None),
+              auth=Depends(require_auth),
+              db=Depends(use_db),
+              supervisor=Depends(use_supervisor)):
+    """
+    requires user authorization scope ``server_config``
+
+    Stream server output as server-sent events, starting with up to
+    ``backlog`` buffered lines. Event ids are line sequence numbers,
+    reconnecting with header ``Last-Event-ID`` resumes after that line.
+    """
+    authorize(auth, AUTH_SCOPE)
+    if await run_in_threadpool(storage.get_one, db, id) is None:
+        raise NotFound()
+
+    position = None if last_event_id is None else last_event_id + 1
+    return StreamingResponse(
+        _server_sent_events(
+            await supervisor.follow_log(id, position, backlog)
+        ),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"},
+    )
+
+
+@router.get("/{id}/_stats", response_model=ProcessStatsResponse)
+def stats(id: int,
+          seconds: Optional[float] = None,
+          step: float = 0,
+          aggregate: StatsAggregate = StatsAggregate.mean,
+          auth=Depends(require_auth),
+          db=Depends(use_db),
+          sampler=Depends(use_sampler)):
+    """
+    requires user authorization scope ``server_config``
+
+    CPU and memory usage of the server process, sampled every
+    ``acc.stats_interval`` seconds, of the last ``seconds`` or all buffered
+    samples. With ``step`` samples are aggregated per ``step`` seconds by
+    ``aggregate``.
+    """
+    authorize(auth, AUTH_SCOPE)
+    if storage.get_one(db, id) is None:
+        raise NotFound()
+
+    times, cpu, rss = sampler.series(id, seconds, step, aggregate)
+    return Response(serializers.dumps({
+        "interval": sampler.interval,
+        "time": times,
+        "cpu_percent": cpu,
+        "rss_bytes": rss,
+    }), media_type="application/json")
@@ -1,6 +1,11 @@
-from fastapi import APIRouter, Response, Depends
+from typing import Optional
+
+from fastapi import APIRouter, Response, Depends, Header
+from acc_server_mgr import serializers
 from acc_server_mgr.controllers.auth import require_auth
-from acc_server_mgr.controllers.utils import NotFound, authorize
+from acc_server_mgr.controllers.utils import (
+    NotFound, authorize, etag, not_modified, expected_version,
+)
 from acc_server_mgr.database import use_db
 from acc_server_mgr.models.schema import UserCreate, UserUpdate, UserResponse, \
     UserFilterResponse, FilterRequest
@@ -19,20 +24,37 @@ def create(user: UserCreate, auth=Depends(require_auth), db=Depends(use_db)):
 
 
 @router.get("/{id}", response_model=UserResponse)
-def get_one(id: int, auth=Depends(require_auth), db=Depends(use_db)):
+def get_one(id: int,
+            response: Response,
+            if_none_match: Optional[str] = Header(None),
+            auth=Depends(require_auth),
+            db=Depends(use_db)):
     authorize(auth, AUTH_SCOPE)
+    unchanged = not_modified(if_none_match, storage.get_version, db, id)
+    if unchanged is not None:
+        return unchanged
+
     user = storage.get_one(db, id)
     if user:
+        response.headers["ETag"] = etag(storage.version(user))
         return UserResponse.from_orm(user)
 
     raise NotFound()
 
 
 @router.patch("/{id}", response_model=UserResponse)
-def update_one(id: int, user: UserUpdate, auth=Depends(require_auth), db=Depends(use_db)):
+def update_one(id: int,
+               user: UserUpdate,
+               response: Response,
+               if_match: Optional[str] = Header(None),
+               auth=Depends(require_auth),
+               db=Depends(use_db)):
     authorize(auth, AUTH_SCOPE)
-    updated_user = storage.update_one(db, id, user)
+    updated_user = storage.update_one(
+        db, id, user, expected_version(if_match)
+    )
     if updated_user:
+        response.headers["ETag"] = etag(storage.version(updated_user))
         return UserResponse.from_orm(updated_user)
 
     raise NotFound()
@@ -48,8 +70,6 @@ def delete_one(id: int, auth=Depends(require_auth), db=Depends(use_db)):
 @router.post("/_filter", response_model=UserFilterResponse)
 def filter_(filter_request: FilterRequest, auth=Depends(require_auth), db=Depends(use_db)):
     authorize(auth, AUTH_SCOPE)
-    total_count, items = storage.search(db, filter_request)
-    return UserFilterResponse(
-        total_count=total_count,
-        items=[UserResponse.from_orm(it) for it in items]
+    return serializers.cached_search_response(
+        serializers.users, storage.FIELDS, storage.search, db, filter_request
     )
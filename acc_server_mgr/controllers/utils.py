@@ -1,15 +1,27 @@
+import hashlib
+import json
+from typing import Optional
+
+from pydantic import ValidationError
 from starlette.exceptions import HTTPException
+from starlette.responses import Response
+
+from acc_server_mgr.models.schema import (
+    BulkImportResponse, BulkImportResult, BulkImportStatus,
+)
+
+NDJSON_MEDIA_TYPES = ("application/x-ndjson", "application/jsonl")
 
 
 def authorize(token, *required_scopes):
-    if token["scopes"] is None:
+    if not token.scope_set:
         raise Forbidden()
 
-    if "admin" in token["scopes"]:
+    if "admin" in token.scope_set:
         return
 
     for scope in required_scopes:
-        if scope not in token["scopes"]:
+        if scope not in token.scope_set:
             raise Forbidden()
 
 
@@ -28,4 +40,134 @@ class Forbidden(HTTPException):
         super().__init__(status_code=403)
 
 
+class Conflict(HTTPException):
+    def __init__(self, detail=None):
+        super().__init__(status_code=409, detail=detail)
+
+
+class UnprocessableEntity(HTTPException):
+    def __init__(self, detail=None):
+        super().__init__(status_code=422, detail=detail)
+
+
+def etag(version: tuple) -> str:
+    """
+    Strong entity tag of a row ``version``, as returned by ``version`` and
+    ``get_version`` of storage modules.
+    """
+    digest = hashlib.blake2b(repr(version).encode("UTF-8"), digest_size=8)
+    return f'"{digest.hexdigest()}"'
+
+
+def etag_matches(tag: str, header: Optional[str], weak=False) -> bool:
+    """
+    Whether ``tag`` matches an entity tag of an ``If-Match`` ``header``, or
+    with ``weak`` comparison of an ``If-None-Match`` ``header``.
+    """
+    if header is None:
+        return False
+    if header.strip() == "*":
+        return True
+    for it in header.split(","):
+        it = it.strip()
+        if weak and it.startswith("W/"):
+            it = it[2:]
+        if it == tag:
+            return True
+    return False
+
+
+def not_modified(if_none_match: Optional[str], get_version, *args
+                 ) -> Optional[Response]:
+    """
+    304 response if the version by ``get_version(*args)`` matches
+    ``if_none_match``, looked up only if the header is given.
+    """
+    if if_none_match is None:
+        return None
+    version = get_version(*args)
+    if version is None:
+        return None
+    tag = etag(version)
+    if etag_matches(tag, if_none_match, weak=True):
+        return Response(status_code=304, headers={"ETag": tag})
+    return None
+
+
+def expected_version(if_match: Optional[str]):
+    """
+    ``expected`` of storage updates, accepting versions matching
+    ``if_match``, None to accept any.
+    """
+    if if_match is None:
+        return None
+    return lambda version: etag_matches(etag(version), if_match)
+
+
+def parse_records(body: bytes, content_type: Optional[str]) -> list:
+    """
+    Records of NDJSON ``body`` if ``content_type`` says so, of a JSON array
+    otherwise. NDJSON lines that aren't valid JSON are replaced by their
+    ``ValueError``, so other lines can still be imported.
+    """
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    if media_type in NDJSON_MEDIA_TYPES:
+        records = []
+        for line in body.splitlines():
+            if not line.strip():
+                continue
+            try:
+                records.append(json.loads(line))
+            except ValueError as exc:
+                records.append(exc)
+        return records
+
+    try:
+        records = json.loads(body)
+    except ValueError:
+        records = None
+    if not isinstance(records, list):
+        raise UnprocessableEntity("expected JSON array or NDJSON")
+    return records
+
+
+def import_records(db, records: list, schema, create_many
+                   ) -> BulkImportResponse:
+    """
+    Validate ``records`` with pydantic model ``schema`` and create valid ones
+    with ``create_many`` of a storage module.
+    """
+    items = []
+    valid = []
+    for index, record in enumerate(records):
+        if isinstance(record, ValueError):
+            items.append(BulkImportResult(
+                index=index, status=BulkImportStatus.invalid,
+                detail=str(record),
+            ))
+            continue
+        try:
+            valid.append((index, schema.parse_obj(record)))
+        except ValidationError as exc:
+            items.append(BulkImportResult(
+                index=index, status=BulkImportStatus.invalid,
+                detail=exc.errors(),
+            ))
+
+    results = create_many(db, [it for _, it in valid]) if valid else []
+    for (index, _), result in zip(valid, results):
+        if isinstance(result, Exception):
+            items.append(BulkImportResult(
+                index=index, status=BulkImportStatus.rejected,
+                detail=str(result),
+            ))
+        else:
+            items.append(BulkImportResult(
+                index=index, status=BulkImportStatus.created, id=result,
+            ))
 
+    items.sort(key=lambda it: it.index)
+    created = sum(it.status == BulkImportStatus.created for it in items)
+    return BulkImportResponse(
+        created=created, failed=len(items) - created, items=items
+    )
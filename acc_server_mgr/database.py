@@ -1,12 +1,173 @@
+import contextvars
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from urllib.parse import quote
+
 import peewee
 
-db = peewee.SqliteDatabase("./app.db", pragmas={
-    "journal_mode": "wal",
-    "cache_size": -1 * 64000,
-    "foreign_keys": 1,
-    "ignore_check_constraints": 0,
-    "synchronous": 0
-})
+from acc_server_mgr.config import config
+
+log = logging.getLogger(__name__)
+
+
+class _Job:
+    __slots__ = ("fn", "context", "future")
+
+    def __init__(self, fn):
+        self.fn = fn
+        self.context = contextvars.copy_context()
+        self.future = Future()
+
+
+class Database(peewee.SqliteDatabase):
+    """
+    SQLite database with a single writer thread. Writes are submitted with
+    ``write`` and run on the writer thread, which serializes them and commits
+    up to ``write_batch`` queued writes in one transaction, each in its own
+    savepoint. All other threads read through read-only connections, in WAL
+    mode readers never block behind the writer.
+
+    peewee keeps one connection per thread, opened on first use and kept
+    open for the lifetime of the thread, scope reads with ``db.atomic()``.
+
+    Functions in ``execute_hooks`` are called with SQL, parameters and
+    seconds taken of every statement executed, on the executing thread.
+    """
+
+    def __init__(self, database, *args, write_batch=64, **kwargs):
+        super().__init__(database, *args, **kwargs)
+        self.write_batch = write_batch
+        self.execute_hooks = []
+        self._jobs = queue.SimpleQueue()
+        self._writer = None
+        self._writer_lock = threading.Lock()
+
+    def execute_sql(self, sql, params=None, commit=None):
+        if not self.execute_hooks:
+            return super().execute_sql(sql, params, commit)
+
+        start = time.perf_counter()
+        try:
+            return super().execute_sql(sql, params, commit)
+        finally:
+            seconds = time.perf_counter() - start
+            for hook in self.execute_hooks:
+                hook(sql, params, seconds)
+
+    def _connect(self):
+        if self.is_writer():
+            return super()._connect()
+
+        conn = sqlite3.connect(
+            f"file:{quote(self.database)}?mode=ro", uri=True,
+            timeout=self._timeout, isolation_level=None, **self.connect_params
+        )
+        try:
+            self._add_conn_hooks(conn)
+        except:
+            conn.close()
+            raise
+        return conn
+
+    def is_writer(self) -> bool:
+        return threading.current_thread() is self._writer
+
+    def write(self, fn):
+        """
+        Run ``fn`` on the writer thread in a transaction and return its
+        result, or raise its exception, once committed. ``fn`` runs in the
+        context of the caller. Nested writes run inline.
+        """
+        if self.is_writer():
+            with self.atomic():
+                return fn()
+
+        job = _Job(fn)
+        self._start_writer()
+        self._jobs.put(job)
+        return job.future.result()
+
+    def stop_writer(self):
+        with self._writer_lock:
+            if self._writer is None:
+                return
+            self._jobs.put(None)
+            self._writer.join()
+            self._writer = None
+
+    def _start_writer(self):
+        with self._writer_lock:
+            if self._writer is None:
+                self._writer = threading.Thread(
+                    target=self._run_writer, name="db-writer", daemon=True
+                )
+                self._writer.start()
+
+    def _run_writer(self):
+        try:
+            while True:
+                jobs = [self._jobs.get()]
+                while jobs[-1] is not None and len(jobs) < self.write_batch:
+                    try:
+                        jobs.append(self._jobs.get_nowait())
+                    except queue.Empty:
+                        break
+                stop = jobs[-1] is None
+                if stop:
+                    jobs.pop()
+                if jobs:
+                    self._commit(jobs)
+                if stop:
+                    return
+        finally:
+            self.close()
+
+    def _commit(self, jobs: list[_Job]):
+        """
+        Run ``jobs`` in one transaction, a failing job only rolls back its
+        own savepoint.
+        """
+        results = []
+        try:
+            with self.atomic(lock_type="IMMEDIATE"):
+                for job in jobs:
+                    try:
+                        with self.atomic():
+                            results.append((job.context.run(job.fn), None))
+                    except Exception as exc:
+                        results.append((None, exc))
+        except Exception as exc:
+            log.exception("committing %s writes failed", len(jobs))
+            for job in jobs:
+                job.future.set_exception(exc)
+            return
+
+        for job, (result, exc) in zip(jobs, results):
+            if exc is None:
+                job.future.set_result(result)
+            else:
+                job.future.set_exception(exc)
+
+
+def pragmas(config) -> dict:
+    """
+    Pragmas of connections, tuning from ``[database]`` of ``config``.
+    """
+    return {
+        "journal_mode": "wal",
+        "cache_size": -1 * config.getint("database", "cache_size"),
+        "mmap_size": config.getint("database", "mmap_size"),
+        "foreign_keys": 1,
+        "ignore_check_constraints": 0,
+        "synchronous": config.get("database", "synchronous"),
+    }
+
+
+db = Database(config.get("database", "path"), pragmas=pragmas(config))
 
 
 class Base(peewee.Model):
@@ -0,0 +1,168 @@
+import asyncio
+import os
+from collections import deque
+from itertools import islice
+from typing import Any, AsyncIterator, Optional
+
+
+class RingBuffer:
+    """
+    Fixed size ring buffer of items numbered by a sequence. Any number of
+    followers share the buffer, each tracking its own position.
+
+    Must be used from within the running event loop of the app.
+    """
+
+    def __init__(self, max_items=1000):
+        self.items = deque(maxlen=max_items)
+        # sequence number of the next item appended
+        self.end = 0
+        self._appended = asyncio.Event()
+
+    @property
+    def start(self) -> int:
+        """
+        Sequence number of the oldest item in the buffer.
+        """
+        return self.end - len(self.items)
+
+    def append(self, item):
+        self.items.append(item)
+        self.end += 1
+        self._appended.set()
+        self._appended = asyncio.Event()
+
+    def tail(self, position: int) -> list[tuple[int, Any]]:
+        """
+        Items from sequence number ``position`` on, as tuples of sequence
+        number and item. Items already dropped from the buffer are skipped.
+        """
+        position = max(position, self.start)
+        return list(zip(
+            range(position, self.end),
+            islice(self.items, position - self.start, None)
+        ))
+
+    async def follow(self, position: Optional[int] = None,
+                     keep_alive: float = 15.0
+                     ) -> AsyncIterator[Optional[tuple[int, Any]]]:
+        """
+        Yield items from sequence number ``position`` on, then wait for new
+        items. Default position is the oldest item in the buffer, as is a
+        position after the end, e.g. one of before an app restart, as
+        numbering restarts. Yields None after ``keep_alive`` seconds without
+        new items.
+        """
+        if position is None or position > self.end:
+            position = self.start
+
+        while True:
+            for item in self.tail(position):
+                yield item
+                position = item[0] + 1
+            appended = self._appended
+            if position < self.end:
+                continue
+            try:
+                await asyncio.wait_for(appended.wait(), keep_alive)
+            except asyncio.TimeoutError:
+                yield None
+
+
+class LogBuffer(RingBuffer):
+    """
+    Ring buffer of output lines of a server process. Lines are numbered by a
+    sequence continuing across process restarts.
+    """
+
+    def __init__(self, max_lines=1000, max_line_length=1024):
+        super().__init__(max_lines)
+        self.max_line_length = max_line_length
+
+    @property
+    def lines(self) -> deque:
+        return self.items
+
+    def append(self, line: str):
+        super().append(line[:self.max_line_length])
+
+
+class FileTail:
+    """
+    Stream of a file another process writes to, for ``read_lines``. At the
+    end of the file reads wait for more until ``finish`` was called, then
+    return the rest and EOF. Starting at ``position`` after the start skips
+    to the next line.
+
+    Once read past ``max_size`` and up to the end, the file is truncated, so
+    it doesn't grow without bound. The writer must append to it, output it
+    writes between reaching the end and truncating is lost.
+    """
+
+    def __init__(self, path, position=0, poll_interval=0.2, max_size=None):
+        self.path = path
+        self.fp = open(path, "rb")
+        if position > 0:
+            self.fp.seek(position - 1)
+            self.fp.readline()
+        self.poll_interval = poll_interval
+        self.max_size = max_size
+        self.finished = False
+
+    def finish(self):
+        self.finished = True
+
+    def _truncate(self):
+        position = self.fp.tell()
+        if self.max_size is None or position < self.max_size:
+            return
+        if os.fstat(self.fp.fileno()).st_size == position:
+            os.truncate(self.path, 0)
+            self.fp.seek(0)
+
+    async def read(self, size: int) -> bytes:
+        while True:
+            finished = self.finished
+            chunk = self.fp.read(size)
+            if chunk:
+                return chunk
+            if finished:
+                self.fp.close()
+                return b""
+            self._truncate()
+            await asyncio.sleep(self.poll_interval)
+
+
+async def read_lines(stream, buffer: LogBuffer,
+                     encoding="UTF-8", chunk_size=4096):
+    """
+    Append lines read from ``stream``, e.g. a ``StreamReader`` or
+    ``FileTail``, to ``buffer`` until EOF. Partial lines
+    are held back at most ``buffer.max_line_length`` long, the rest of an
+    overlong line is discarded.
+    """
+    partial = b""
+    overlong = False
+    while True:
+        chunk = await stream.read(chunk_size)
+        if not chunk:
+            break
+
+        *lines, rest = chunk.split(b"\n")
+        for line in lines:
+            if not overlong:
+                buffer.append(
+                    (partial + line).rstrip(b"\r").decode(encoding, "replace")
+                )
+            partial = b""
+            overlong = False
+
+        if not overlong:
+            partial += rest
+            if len(partial) > buffer.max_line_length:
+                buffer.append(partial.decode(encoding, "replace"))
+                partial = b""
+                overlong = True
+
+    if partial and not overlong:
+        buffer.append(partial.rstrip(b"\r").decode(encoding, "replace"))
@@ -0,0 +1,301 @@
+"""
+Metrics in the Prometheus text format. Requests are measured per route by
+``MetricsMiddleware``, SQL statements by ``on_execute``, a hook of
+``Database.execute_hooks``, also per request they are executed for. Values
+of collected metrics, like supervised instances, are read when rendered.
+"""
+import bisect
+import contextvars
+import math
+import threading
+import time
+from typing import Callable, Optional
+
+from acc_server_mgr.ownership import ownership
+from acc_server_mgr.process_control import supervisor
+from acc_server_mgr.storage import cache, compiler
+from acc_server_mgr.token_cache import tokens
+
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+DB_LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0,
+)
+STATEMENT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+
+def _format_value(value) -> str:
+    if isinstance(value, float):
+        if math.isinf(value):
+            return "+Inf" if value > 0 else "-Inf"
+        return repr(value)
+    return str(value)
+
+
+def _format_labels(names, values) -> str:
+    if not names:
+        return ""
+    return "{%s}" % ",".join(
+        '%s="%s"' % (name, str(value).replace("\\", "\\\\")
+                     .replace("\n", "\\n").replace('"', '\\"'))
+        for name, value in zip(names, values)
+    )
+
+
+class Metric:
+    """
+    Metric ``name`` with values by tuples of label values of ``labels``,
+    or collected by ``collect`` returning them when rendered.
+    """
+    type = None
+
+    def __init__(self, name, description, labels=(),
+                 collect: Optional[Callable[[], dict]] = None):
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self.collect = collect
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def samples(self) -> list[tuple[str, tuple, tuple, object]]:
+        """
+        Samples as tuples of name suffix, label names, label values and
+        value.
+        """
+        if self.collect is not None:
+            values = dict(self.collect())
+            with self._lock:
+                self._values = values
+        with self._lock:
+            return [
+                ("", self.labels, labels, value)
+                for labels, value in sorted(self._values.items())
+            ]
+
+    def render(self) -> list[str]:
+        lines = [
+            f"# HELP {self.name} {self.description}",
+            f"# TYPE {self.name} {self.type}",
+        ]
+        for suffix, names, values, value in self.samples():
+            lines.append(
+                f"{self.name}{suffix}{_format_labels(names, values)}"
+                f" {_format_value(value)}"
+            )
+        return lines
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, labels=(), amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def inc(self, labels=(), amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, labels=(), amount=1):
+        self.inc(labels, -amount)
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name, description, labels=(),
+                 buckets=LATENCY_BUCKETS):
+        super().__init__(name, description, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, labels, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                # count per bucket, +Inf last, and sum
+                entry = [[0] * (len(self.buckets) + 1), 0]
+                self._values[labels] = entry
+            entry[0][index] += 1
+            entry[1] += value
+
+    def samples(self):
+        samples = []
+        with self._lock:
+            entries = [
+                (labels, list(counts), total)
+                for labels, (counts, total) in sorted(self._values.items())
+            ]
+        names = self.labels + ("le",)
+        for labels, counts, total in entries:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                samples.append((
+                    "_bucket", names, labels + (_format_value(bound),),
+                    cumulative,
+                ))
+            samples.append(("_sum", self.labels, labels, total))
+            samples.append(("_count", self.labels, labels, cumulative))
+        return samples
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+requests_total = registry.register(Counter(
+    "http_requests_total", "HTTP requests by route and status code",
+    ["method", "route", "status"],
+))
+requests_in_flight = registry.register(Gauge(
+    "http_requests_in_flight", "HTTP requests being served", ["method"],
+))
+request_seconds = registry.register(Histogram(
+    "http_request_duration_seconds",
+    "Time until the response is sent, by route",
+    ["method", "route"],
+))
+request_statements = registry.register(Histogram(
+    "http_request_db_statements", "SQL statements per request, by route",
+    ["method", "route"], buckets=STATEMENT_BUCKETS,
+))
+request_db_seconds = registry.register(Histogram(
+    "http_request_db_seconds", "Time executing SQL per request, by route",
+    ["method", "route"], buckets=DB_LATENCY_BUCKETS,
+))
+statements_total = registry.register(Counter(
+    "db_statements_total", "SQL statements by first keyword", ["statement"],
+))
+statement_seconds = registry.register(Counter(
+    "db_statement_seconds_total", "Time executing SQL by first keyword",
+    ["statement"],
+))
+registry.register(Gauge(
+    "acc_instances_running", "Server processes owned by the supervisor",
+    collect=lambda: {(): len(supervisor.instances)},
+))
+registry.register(Gauge(
+    "acc_supervisor_owner", "1 if this worker owns the supervisor",
+    collect=lambda: {(): int(ownership.owns())},
+))
+
+
+def _cache_info(field):
+    return lambda: {
+        (name,): info[field] for name, info in [
+            ("statements", compiler.statements.info()),
+            ("counts", cache.counts.info()),
+            ("results", cache.results.info()),
+            ("tokens", tokens.info()),
+        ]
+    }
+
+
+registry.register(Counter(
+    "cache_hits_total", "Cache hits", ["cache"],
+    collect=_cache_info("hits"),
+))
+registry.register(Counter(
+    "cache_misses_total", "Cache misses", ["cache"],
+    collect=_cache_info("misses"),
+))
+
+
+class RequestStats:
+    __slots__ = ("scope", "statements", "seconds")
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.statements = 0
+        self.seconds = 0.0
+
+
+# stats of the request being served, shared by threads it runs code on
+_request_stats: contextvars.ContextVar[Optional[RequestStats]] = \
+    contextvars.ContextVar("request_stats", default=None)
+
+
+def _route(scope) -> str:
+    return getattr(scope.get("route"), "path", "unmatched")
+
+
+def current_route() -> Optional[str]:
+    """
+    Path of the route serving the current request, None outside requests.
+    """
+    stats = _request_stats.get()
+    if stats is None:
+        return None
+    return _route(stats.scope)
+
+
+def on_execute(sql, params, seconds):
+    statement = sql.split(None, 1)[0].upper() if sql else ""
+    statements_total.inc((statement,))
+    statement_seconds.inc((statement,), seconds)
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.statements += 1
+        stats.seconds += seconds
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware measuring HTTP requests by the path of the route
+    serving them, ``unmatched`` if none did.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        method = scope["method"]
+        status = 500
+
+        async def send_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        stats = RequestStats(scope)
+        token = _request_stats.set(stats)
+        requests_in_flight.inc((method,))
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_status)
+        finally:
+            seconds = time.perf_counter() - start
+            requests_in_flight.dec((method,))
+            _request_stats.reset(token)
+            route = _route(scope)
+            labels = (method, route)
+            requests_total.inc((method, route, str(status)))
+            request_seconds.observe(labels, seconds)
+            request_statements.observe(labels, stats.statements)
+            request_db_seconds.observe(labels, stats.seconds)
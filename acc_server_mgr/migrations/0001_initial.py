@@ -0,0 +1,216 @@
+"""
+Initial schema, as created by ``create_tables`` before migrations. Tables
+already existing are kept, so databases created before are adopted.
+"""
+
+STATEMENTS = [
+    """
+    CREATE TABLE IF NOT EXISTS "user" (
+        "id" INTEGER NOT NULL PRIMARY KEY,
+        "mail" TEXT NOT NULL,
+        "password_hash" TEXT NOT NULL,
+        "is_enabled" INTEGER NOT NULL,
+        "created" DATETIME NOT NULL,
+        "last_login" DATETIME,
+        "scopes" TEXT
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS "event" (
+        "id" INTEGER NOT NULL PRIMARY KEY,
+        "created" DATETIME NOT NULL,
+        "name" TEXT NOT NULL,
+        "track" TEXT NOT NULL,
+        "pre_race_waiting_time_seconds" INTEGER NOT NULL,
+        "session_over_time_seconds" INTEGER NOT NULL,
+        "ambient_temp" INTEGER NOT NULL,
+        "cloud_level" REAL NOT NULL,
+        "rain" REAL NOT NULL,
+        "weather_randomness" INTEGER NOT NULL,
+        "post_qualy_seconds" INTEGER NOT NULL,
+        "post_race_seconds" INTEGER NOT NULL,
+        "meta_data" TEXT NOT NULL,
+        "simracer_weather_conditions" INTEGER NOT NULL,
+        "is_fixed_condition_qualification" INTEGER NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS "session" (
+        "id" INTEGER NOT NULL PRIMARY KEY,
+        "created" DATETIME NOT NULL,
+        "name" TEXT NOT NULL,
+        "hour_of_day" INTEGER NOT NULL,
+        "day_of_weekend" INTEGER NOT NULL,
+        "time_multiplier" INTEGER NOT NULL,
+        "session_type" TEXT NOT NULL,
+        "session_duration_minutes" INTEGER NOT NULL,
+        "event_id" INTEGER NOT NULL,
+        FOREIGN KEY ("event_id") REFERENCES "event" ("id")
+    )
+    """,
+    'CREATE INDEX IF NOT EXISTS "session_event_id" ON "session" ("event_id")',
+    """
+    CREATE TABLE IF NOT EXISTS "serverconfig" (
+        "id" INTEGER NOT NULL PRIMARY KEY,
+        "name" TEXT NOT NULL,
+        "created" DATETIME NOT NULL,
+        "is_enabled" INTEGER NOT NULL,
+        "event_id" INTEGER,
+        "settings_server_name" TEXT NOT NULL,
+        "settings_admin_password" TEXT NOT NULL,
+        "settings_car_group" TEXT NOT NULL,
+        "settings_track_medals_requirement" INTEGER NOT NULL,
+        "settings_safety_rating_requirement" INTEGER NOT NULL,
+        "settings_racecraft_rating_requirement" INTEGER NOT NULL,
+        "settings_password" TEXT NOT NULL,
+        "settings_spectator_password" TEXT NOT NULL,
+        "settings_max_car_slots" INTEGER NOT NULL,
+        "settings_dump_leaderboards" INTEGER NOT NULL,
+        "settings_dump_entry_list" INTEGER NOT NULL,
+        "settings_is_race_locked" INTEGER NOT NULL,
+        "settings_short_formation_lap" INTEGER NOT NULL,
+        "settings_formation_lap_type" INTEGER NOT NULL,
+        "settings_do_driver_swap_broadcast" INTEGER NOT NULL,
+        "settings_randomize_track_when_empty" INTEGER NOT NULL,
+        "settings_central_entry_list_path" TEXT NOT NULL,
+        "settings_allow_auto_dq" INTEGER NOT NULL,
+        "settings_ignore_premature_disconnects" INTEGER NOT NULL,
+        "settings_version" TEXT NOT NULL,
+        "config_tcp_port" INTEGER NOT NULL,
+        "config_udp_port" INTEGER NOT NULL,
+        "config_register_to_lobby" INTEGER NOT NULL,
+        "config_max_connections" INTEGER NOT NULL,
+        "config_lan_discovery" INTEGER NOT NULL,
+        "config_version" TEXT NOT NULL,
+        "config_public_ip" TEXT NOT NULL,
+        "process_is_running" INTEGER NOT NULL,
+        "process_last_start" DATETIME,
+        "process_last_stop" DATETIME,
+        "process_id" INTEGER,
+        FOREIGN KEY ("event_id") REFERENCES "event" ("id")
+    )
+    """,
+    'CREATE INDEX IF NOT EXISTS "serverconfig_event_id" '
+    'ON "serverconfig" ("event_id")',
+    """
+    CREATE TABLE IF NOT EXISTS "driver" (
+        "id" INTEGER NOT NULL PRIMARY KEY,
+        "player_id" TEXT NOT NULL,
+        "first_name" TEXT NOT NULL,
+        "last_name" TEXT NOT NULL,
+        "short_name" TEXT NOT NULL
+    )
+    """,
+    'CREATE UNIQUE INDEX IF NOT EXISTS "driver_player_id" '
+    'ON "driver" ("player_id")',
+    """
+    CREATE TABLE IF NOT EXISTS "sessionresult" (
+        "id" INTEGER NOT NULL PRIMARY KEY,
+        "server_config_id" INTEGER,
+        "file_name" TEXT NOT NULL,
+        "created" DATETIME NOT NULL,
+        "session_type" TEXT NOT NULL,
+        "track" TEXT NOT NULL,
+        "server_name" TEXT NOT NULL,
+        "session_index" INTEGER NOT NULL,
+        "race_weekend_index" INTEGER NOT NULL,
+        "meta_data" TEXT NOT NULL,
+        "is_wet_session" INTEGER NOT NULL,
+        "best_lap" INTEGER,
+        FOREIGN KEY ("server_config_id") REFERENCES "serverconfig" ("id")
+            ON DELETE SET NULL
+    )
+    """,
+    'CREATE INDEX IF NOT EXISTS "sessionresult_server_config_id" '
+    'ON "sessionresult" ("server_config_id")',
+    'CREATE INDEX IF NOT EXISTS "sessionresult_track" '
+    'ON "sessionresult" ("track")',
+    'CREATE UNIQUE INDEX IF NOT EXISTS '
+    '"sessionresult_server_config_id_file_name" '
+    'ON "sessionresult" ("server_config_id", "file_name")',
+    """
+    CREATE TABLE IF NOT EXISTS "sessionresultline" (
+        "id" INTEGER NOT NULL PRIMARY KEY,
+        "session_result_id" INTEGER NOT NULL,
+        "position" INTEGER NOT NULL,
+        "car_id" INTEGER NOT NULL,
+        "race_number" INTEGER NOT NULL,
+        "car_model" INTEGER NOT NULL,
+        "car_group" TEXT,
+        "cup_category" INTEGER NOT NULL,
+        "team_name" TEXT NOT NULL,
+        "driver_id" INTEGER,
+        "best_lap" INTEGER,
+        "total_time" INTEGER,
+        "lap_count" INTEGER NOT NULL,
+        FOREIGN KEY ("session_result_id") REFERENCES "sessionresult" ("id")
+            ON DELETE CASCADE,
+        FOREIGN KEY ("driver_id") REFERENCES "driver" ("id")
+    )
+    """,
+    'CREATE INDEX IF NOT EXISTS "sessionresultline_session_result_id" '
+    'ON "sessionresultline" ("session_result_id")',
+    'CREATE INDEX IF NOT EXISTS "sessionresultline_driver_id" '
+    'ON "sessionresultline" ("driver_id")',
+    """
+    CREATE TABLE IF NOT EXISTS "lap" (
+        "id" INTEGER NOT NULL PRIMARY KEY,
+        "session_result_id" INTEGER NOT NULL,
+        "driver_id" INTEGER NOT NULL,
+        "car_id" INTEGER NOT NULL,
+        "car_model" INTEGER,
+        "car_group" TEXT,
+        "lap_time" INTEGER NOT NULL,
+        "splits" TEXT NOT NULL,
+        "is_valid_for_best" INTEGER NOT NULL,
+        FOREIGN KEY ("session_result_id") REFERENCES "sessionresult" ("id")
+            ON DELETE CASCADE,
+        FOREIGN KEY ("driver_id") REFERENCES "driver" ("id")
+    )
+    """,
+    'CREATE INDEX IF NOT EXISTS "lap_session_result_id" '
+    'ON "lap" ("session_result_id")',
+    'CREATE INDEX IF NOT EXISTS "lap_driver_id" ON "lap" ("driver_id")',
+    """
+    CREATE TABLE IF NOT EXISTS "resultcheckpoint" (
+        "id" INTEGER NOT NULL PRIMARY KEY,
+        "server_config_id" INTEGER NOT NULL,
+        "last_file" TEXT NOT NULL,
+        "updated" DATETIME NOT NULL,
+        FOREIGN KEY ("server_config_id") REFERENCES "serverconfig" ("id")
+            ON DELETE CASCADE
+    )
+    """,
+    'CREATE UNIQUE INDEX IF NOT EXISTS "resultcheckpoint_server_config_id" '
+    'ON "resultcheckpoint" ("server_config_id")',
+    """
+    CREATE TABLE IF NOT EXISTS "personalbest" (
+        "id" INTEGER NOT NULL PRIMARY KEY,
+        "track" TEXT NOT NULL,
+        "car_group" TEXT NOT NULL,
+        "driver_id" INTEGER NOT NULL,
+        "lap_time" INTEGER NOT NULL,
+        "splits" TEXT NOT NULL,
+        "car_model" INTEGER,
+        "session_result_id" INTEGER,
+        "achieved" DATETIME NOT NULL,
+        FOREIGN KEY ("driver_id") REFERENCES "driver" ("id"),
+        FOREIGN KEY ("session_result_id") REFERENCES "sessionresult" ("id")
+            ON DELETE SET NULL
+    )
+    """,
+    'CREATE INDEX IF NOT EXISTS "personalbest_driver_id" '
+    'ON "personalbest" ("driver_id")',
+    'CREATE INDEX IF NOT EXISTS "personalbest_session_result_id" '
+    'ON "personalbest" ("session_result_id")',
+    'CREATE UNIQUE INDEX IF NOT EXISTS '
+    '"personalbest_track_car_group_driver_id" '
+    'ON "personalbest" ("track", "car_group", "driver_id")',
+    'CREATE INDEX IF NOT EXISTS "personalbest_track_car_group_lap_time" '
+    'ON "personalbest" ("track", "car_group", "lap_time")',
+]
+
+
+def migrate(db):
+    for statement in STATEMENTS:
+        db.execute_sql(statement)
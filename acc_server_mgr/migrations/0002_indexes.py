@@ -0,0 +1,24 @@
+"""
+Indexes for the login lookup by ``mail``, server configs by event and
+columns lists are sorted by.
+"""
+
+STATEMENTS = [
+    'CREATE INDEX IF NOT EXISTS "user_mail" ON "user" ("mail")',
+    'CREATE INDEX IF NOT EXISTS "user_created" ON "user" ("created")',
+    'CREATE INDEX IF NOT EXISTS "user_last_login" ON "user" ("last_login")',
+    'CREATE INDEX IF NOT EXISTS "event_created" ON "event" ("created")',
+    'CREATE INDEX IF NOT EXISTS "event_name" ON "event" ("name")',
+    'CREATE INDEX IF NOT EXISTS "serverconfig_event_id" '
+    'ON "serverconfig" ("event_id")',
+    'CREATE INDEX IF NOT EXISTS "serverconfig_name" '
+    'ON "serverconfig" ("name")',
+    'CREATE INDEX IF NOT EXISTS "serverconfig_created" '
+    'ON "serverconfig" ("created")',
+]
+
+
+def migrate(db):
+    for statement in STATEMENTS:
+        db.execute_sql(statement)
+    db.execute_sql("ANALYZE")
@@ -0,0 +1,15 @@
+"""
+Row versions of users, events, sessions and server configs, incremented by
+every write of the row. Responses are tagged with them for conditional
+requests.
+"""
+
+TABLES = ["user", "event", "session", "serverconfig"]
+
+
+def migrate(db):
+    for table in TABLES:
+        db.execute_sql(
+            f'ALTER TABLE "{table}" '
+            'ADD COLUMN "version" INTEGER NOT NULL DEFAULT 1'
+        )
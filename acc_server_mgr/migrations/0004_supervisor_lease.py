@@ -0,0 +1,18 @@
+"""
+Lease electing the worker process owning server processes, when running
+several workers.
+"""
+
+
+def migrate(db):
+    db.execute_sql(
+        """
+        CREATE TABLE IF NOT EXISTS "supervisorlease" (
+            "id" INTEGER NOT NULL PRIMARY KEY,
+            "owner" TEXT NOT NULL,
+            "address" TEXT NOT NULL,
+            "secret" TEXT NOT NULL,
+            "expires" REAL NOT NULL
+        )
+        """
+    )
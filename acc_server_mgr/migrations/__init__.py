@@ -0,0 +1,70 @@
+"""
+Versioned schema migrations. A migration is a module ``NNNN_name.py`` of
+this package with a function ``migrate(db)``. Pending migrations are applied
+in order of their names, each in one transaction together with recording it
+in table ``migration``, at startup or with::
+
+    python -m acc_server_mgr.migrations
+"""
+import importlib
+import logging
+import pkgutil
+from datetime import datetime
+
+from peewee import TextField, DateTimeField
+
+from acc_server_mgr.database import Base, db
+
+log = logging.getLogger(__name__)
+
+
+class Migration(Base):
+    name = TextField(primary_key=True)
+    applied = DateTimeField()
+
+
+def available() -> list[str]:
+    return sorted(
+        it.name for it in pkgutil.iter_modules(__path__)
+        if it.name[:4].isdigit()
+    )
+
+
+def applied(db) -> list[str]:
+    db.write(lambda: db.create_tables([Migration]))
+    with db.atomic():
+        return [
+            it.name for it in Migration.select().order_by(Migration.name)
+        ]
+
+
+def pending(db) -> list[str]:
+    done = set(applied(db))
+    return [it for it in available() if it not in done]
+
+
+def migrate(db) -> list[str]:
+    """
+    Apply pending migrations, returns names of migrations applied. The write
+    lock is taken before checking a migration is pending, so concurrent
+    processes apply each migration once.
+    """
+    names = []
+    for name in pending(db):
+        module = importlib.import_module(f"{__name__}.{name}")
+
+        def apply():
+            if Migration.get_or_none(Migration.name == name):
+                return False
+            module.migrate(db)
+            Migration.create(name=name, applied=datetime.now())
+            return True
+
+        if db.write(apply):
+            log.info("applied migration %s", name)
+            names.append(name)
+    return names
+
+
+def startup():
+    migrate(db)
@@ -0,0 +1,23 @@
+import argparse
+
+from acc_server_mgr.database import db
+from acc_server_mgr.migrations import migrate, applied, pending
+
+parser = argparse.ArgumentParser(
+    prog="python -m acc_server_mgr.migrations",
+    description="Apply pending schema migrations.",
+)
+parser.add_argument(
+    "--list", action="store_true",
+    help="list applied and pending migrations, don't apply"
+)
+args = parser.parse_args()
+
+if args.list:
+    for name in applied(db):
+        print(f"applied  {name}")
+    for name in pending(db):
+        print(f"pending  {name}")
+else:
+    for name in migrate(db):
+        print(f"applied  {name}")
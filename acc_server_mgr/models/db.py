@@ -1,21 +1,31 @@
 from peewee import TextField, BooleanField, DateTimeField, IntegerField, \
-    FloatField, ForeignKeyField
+    FloatField, ForeignKeyField, SQL
 
 from acc_server_mgr.database import Base
 
 
+class VersionField(IntegerField):
+    """
+    Version of a row, incremented by every write of the row.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(default=1, constraints=[SQL("DEFAULT 1")], **kwargs)
+
+
 class User(Base):
-    mail = TextField()
+    mail = TextField(index=True)
     password_hash = TextField()
     is_enabled = BooleanField()
-    created = DateTimeField()
-    last_login = DateTimeField(null=True)
+    created = DateTimeField(index=True)
+    last_login = DateTimeField(null=True, index=True)
     scopes = TextField(null=True)
+    version = VersionField()
 
 
 class Event(Base):
-    created = DateTimeField()
-    name = TextField()
+    created = DateTimeField(index=True)
+    name = TextField(index=True)
     track = TextField()
     pre_race_waiting_time_seconds = IntegerField()
     session_over_time_seconds = IntegerField()
@@ -28,6 +38,7 @@ class Event(Base):
     meta_data = TextField()
     simracer_weather_conditions = BooleanField()
     is_fixed_condition_qualification = BooleanField()
+    version = VersionField()
 
 
 class Session(Base):
@@ -39,11 +50,12 @@ class Session(Base):
     session_type = TextField()
     session_duration_minutes = IntegerField()
     event = ForeignKeyField(Event, backref="sessions")
+    version = VersionField()
 
 
 class ServerConfig(Base):
-    name = TextField()
-    created = DateTimeField()
+    name = TextField(index=True)
+    created = DateTimeField(index=True)
     is_enabled = BooleanField()
     event = ForeignKeyField(Event, null=True)
 
@@ -83,3 +95,110 @@ class ServerConfig(Base):
     process_last_start = DateTimeField(null=True)
     process_last_stop = DateTimeField(null=True)
     process_id = IntegerField(null=True)
+    version = VersionField()
+
+
+class Driver(Base):
+    player_id = TextField(unique=True)
+    first_name = TextField()
+    last_name = TextField()
+    short_name = TextField()
+
+
+class SessionResult(Base):
+    """
+    Session results read from result files of a server instance.
+    """
+    server_config = ForeignKeyField(ServerConfig, null=True,
+                                    on_delete="SET NULL")
+    file_name = TextField()
+    created = DateTimeField()
+    session_type = TextField()
+    track = TextField(index=True)
+    server_name = TextField()
+    session_index = IntegerField()
+    race_weekend_index = IntegerField()
+    meta_data = TextField()
+    is_wet_session = BooleanField()
+    best_lap = IntegerField(null=True)
+
+    class Meta:
+        indexes = (
+            (("server_config", "file_name"), True),
+        )
+
+
+class SessionResultLine(Base):
+    """
+    Leaderboard line of a car in a session result.
+    """
+    session_result = ForeignKeyField(SessionResult, backref="lines",
+                                     on_delete="CASCADE")
+    position = IntegerField()
+    car_id = IntegerField()
+    race_number = IntegerField()
+    car_model = IntegerField()
+    car_group = TextField(null=True)
+    cup_category = IntegerField()
+    team_name = TextField()
+    driver = ForeignKeyField(Driver, null=True)
+    best_lap = IntegerField(null=True)
+    total_time = IntegerField(null=True)
+    lap_count = IntegerField()
+
+
+class Lap(Base):
+    session_result = ForeignKeyField(SessionResult, backref="laps",
+                                     on_delete="CASCADE")
+    driver = ForeignKeyField(Driver, backref="laps")
+    car_id = IntegerField()
+    car_model = IntegerField(null=True)
+    car_group = TextField(null=True)
+    lap_time = IntegerField()
+    splits = TextField()
+    is_valid_for_best = BooleanField()
+
+
+class ResultCheckpoint(Base):
+    """
+    Name of the last result file ingested per server instance. Result files
+    are named by date and time, files sorting after it are new.
+    """
+    server_config = ForeignKeyField(ServerConfig, unique=True,
+                                    on_delete="CASCADE")
+    last_file = TextField()
+    updated = DateTimeField()
+
+
+class PersonalBest(Base):
+    """
+    Best valid lap per driver, track and car group. Maintained incrementally
+    when ingesting session results.
+    """
+    track = TextField()
+    car_group = TextField()
+    driver = ForeignKeyField(Driver, backref="personal_bests")
+    lap_time = IntegerField()
+    splits = TextField()
+    car_model = IntegerField(null=True)
+    session_result = ForeignKeyField(SessionResult, null=True,
+                                     on_delete="SET NULL")
+    achieved = DateTimeField()
+
+    class Meta:
+        indexes = (
+            (("track", "car_group", "driver"), True),
+            (("track", "car_group", "lap_time"), False),
+        )
+
+
+class SupervisorLease(Base):
+    """
+    Lease of the worker process owning server processes, a single row. The
+    owner serves commands of other workers at ``address``, authenticated by
+    ``secret``. ``expires`` is a unix timestamp.
+    """
+    owner = TextField()
+    address = TextField()
+    secret = TextField()
+    expires = FloatField()
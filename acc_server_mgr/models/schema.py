@@ -2,7 +2,7 @@ from datetime import datetime
 from enum import Enum
 from typing import Optional, Annotated
 
-from pydantic import BaseModel, Field, validator
+from pydantic import BaseModel, Field, validator, root_validator
 from pydantic.types import Any, conint, confloat
 
 from acc_server_mgr.models.utils import AllOptional
@@ -36,11 +36,44 @@ class SortingDir(str, Enum):
 SortTerm = tuple[str, SortingDir]
 
 
+class PaginationMode(str, Enum):
+    offset = "offset"
+    cursor = "cursor"
+
+
+class CountStrategy(str, Enum):
+    exact = "exact"
+    cached = "cached"
+    none = "none"
+
+
 class FilterRequest(BaseModel):
     query: list[FilterTerm]
     sort: list[SortTerm]
     page: Optional[int] = 0
-    items_per_page: Optional[int] = 10
+    items_per_page: conint(ge=1) = 10
+    pagination: PaginationMode = Field(
+        PaginationMode.offset,
+        description=(
+            "Paginate by ``page`` or by ``cursor``. Cursor pagination doesn't"
+            " slow down on deep pages."
+        ),
+    )
+    cursor: Optional[str] = Field(
+        None,
+        description=(
+            "``next_cursor`` of the previous page, empty for the first page."
+            " Only valid with unchanged ``query`` and ``sort``."
+        ),
+    )
+    count: CountStrategy = Field(
+        CountStrategy.exact,
+        description=(
+            "How to compute ``total_count``. ``cached`` reuses the count of an"
+            " earlier request with the same ``query`` until the table is"
+            " written, ``none`` skips counting, ``total_count`` is null then."
+        ),
+    )
 
 
 class UserCredentials(BaseModel):
@@ -96,8 +129,9 @@ class UserResponse(BaseModel):
 
 
 class UserFilterResponse(BaseModel):
-    total_count: int
+    total_count: Optional[int]
     items: list[UserResponse]
+    next_cursor: Optional[str] = None
 
 
 class UserTokenRequest(BaseModel):
@@ -278,8 +312,9 @@ class EventResponse(Event):
 
 
 class EventSearchResponse(BaseModel):
-    total_count: int
+    total_count: Optional[int]
     items: list[EventResponse]
+    next_cursor: Optional[str] = None
 
 
 class ServerConfig(BaseModel):
@@ -551,5 +586,186 @@ class ServerConfigResponse(ServerConfigProcessInfo):
 
 
 class ServerConfigSearchResponse(BaseModel):
-    total_count: int
+    total_count: Optional[int]
     items: list[ServerConfigResponse]
+    next_cursor: Optional[str] = None
+
+
+class BulkProcessRequest(BaseModel):
+    """
+    Select server configs by ``ids``, by ``filter`` or both.
+    """
+    ids: Optional[list[int]] = None
+    filter: Optional[FilterRequest] = None
+
+    @root_validator
+    def _ids_or_filter(cls, values):
+        if values.get("ids") is None and values.get("filter") is None:
+            raise ValueError("requires ids or filter")
+        return values
+
+
+class BulkProcessStatus(str, Enum):
+    started = "started"
+    running = "running"
+    stopped = "stopped"
+    not_running = "not_running"
+    disabled = "disabled"
+    not_found = "not_found"
+    error = "error"
+
+
+class BulkProcessResult(ProcessInfo):
+    id: int
+    status: BulkProcessStatus
+    detail: Optional[str] = None
+
+
+class BulkProcessResponse(BaseModel):
+    items: list[BulkProcessResult]
+
+
+class ProcessState(str, Enum):
+    starting = "starting"
+    running = "running"
+    failed = "failed"
+    exited = "exited"
+    stopped = "stopped"
+
+
+class ProcessTransition(BaseModel):
+    """
+    State transition of a server process. ``exited`` processes exited on
+    their own, ``stopped`` ones were stopped, ``failed`` ones couldn't be
+    started.
+    """
+    server_config_id: int
+    state: ProcessState
+    time: datetime
+    pid: Optional[int] = None
+    returncode: Optional[int] = None
+    detail: Optional[str] = None
+
+
+class StatsAggregate(str, Enum):
+    mean = "mean"
+    min = "min"
+    max = "max"
+
+
+class ProcessStatsResponse(BaseModel):
+    """
+    Samples of a server process, oldest first, as one list per series.
+    """
+    interval: float = Field(..., description="Seconds between samples")
+    time: list[float] = Field(
+        ..., description="Unix timestamps, of the start of each step if"
+        " downsampled"
+    )
+    cpu_percent: list[float] = Field(
+        ..., description="CPU usage in percent of one core"
+    )
+    rss_bytes: list[int] = Field(..., description="Resident set size")
+
+
+class BulkImportStatus(str, Enum):
+    created = "created"
+    invalid = "invalid"
+    rejected = "rejected"
+
+
+class BulkImportResult(BaseModel):
+    index: int = Field(..., description="Position of the record in the input")
+    status: BulkImportStatus
+    id: Optional[int] = None
+    detail: Optional[Any] = Field(
+        None,
+        description=(
+            "Validation errors of ``invalid`` records, database error of"
+            " ``rejected`` records"
+        ),
+    )
+
+
+class BulkImportResponse(BaseModel):
+    created: int
+    failed: int
+    items: list[BulkImportResult]
+
+
+class DriverResponse(BaseModel):
+    id: int
+    player_id: str
+    first_name: str
+    last_name: str
+    short_name: str
+
+
+def parse_splits(value):
+    """
+    Split times of comma separated ``value`` as stored.
+    """
+    if isinstance(value, str):
+        return [int(it) for it in value.split(",") if it]
+    return value
+
+
+class PersonalBestResponse(BaseModel):
+    id: int
+    track: str
+    car_group: str
+    car_model: Optional[int]
+    lap_time: int = Field(..., description="Lap time in milliseconds")
+    splits: list[int] = Field(..., description="Split times in milliseconds")
+    achieved: datetime
+    session_result_id: Optional[int]
+    driver: DriverResponse
+
+    @validator("splits", pre=True)
+    def _splits_list(cls, value):
+        return parse_splits(value)
+
+
+class PersonalBestSearchResponse(BaseModel):
+    total_count: Optional[int]
+    items: list[PersonalBestResponse]
+    next_cursor: Optional[str] = None
+
+
+class CacheInfo(BaseModel):
+    hits: int
+    misses: int
+    hit_rate: float
+    size: int
+    maxsize: int
+
+
+class CacheInfoResponse(BaseModel):
+    statements: CacheInfo = Field(
+        ..., description="Compiled filter statements"
+    )
+    counts: CacheInfo = Field(
+        ..., description="Counts of ``count`` strategy ``cached``"
+    )
+    tokens: CacheInfo = Field(..., description="Verified access tokens")
+    results: CacheInfo = Field(..., description="Rendered search responses")
+
+
+class SlowQuery(BaseModel):
+    time: datetime
+    sql: str = Field(..., description="Normalized statement")
+    params: list[str] = Field(..., description="Types of parameters")
+    seconds: float
+    route: Optional[str] = Field(
+        ..., description="Path of the route executing it, if any"
+    )
+    plan: list[str] = Field(
+        ..., description="EXPLAIN QUERY PLAN, indented by depth"
+    )
+
+
+class SlowQueriesResponse(BaseModel):
+    threshold: Optional[float] = Field(
+        ..., description="Seconds, None if not logging"
+    )
+    items: list[SlowQuery] = Field(..., description="Oldest first")
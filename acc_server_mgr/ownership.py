@@ -0,0 +1,427 @@
+"""
+Election of the one worker process owning server processes, when the API
+runs in several workers. Workers hold the role by a lease in the database,
+renewed every ``interval`` seconds. Another worker takes it over once it
+expired, or at once if the process holding it is gone.
+
+Every worker listens on a local TCP port for commands of other workers,
+the owner serves them with its supervisor, others refuse. A connection
+carries one command as a line of JSON, answered by a line ``{}`` or
+``{"error": ...}``, then one or, for streams, many lines of JSON.
+"""
+import asyncio
+import hmac
+import json
+import logging
+import os
+import secrets
+import socket
+import time
+from datetime import datetime
+from typing import Optional
+
+from acc_server_mgr.config import config
+from acc_server_mgr.database import db
+from acc_server_mgr.process_control import Instance, Supervisor, supervisor
+from acc_server_mgr.results import ingestor
+from acc_server_mgr.storage import lease as storage
+from acc_server_mgr.storage import server_config as server_config_storage
+
+log = logging.getLogger(__name__)
+
+HOST = "127.0.0.1"
+
+
+class SupervisorUnavailable(Exception):
+    """
+    No worker owns the supervisor or the owner can't be reached, e.g. while
+    ownership changes.
+    """
+
+
+def _is_gone(owner: str) -> bool:
+    """
+    Whether process ``owner``, as named by ``Ownership.owner``, runs on
+    this host and exited. An exited worker not yet reaped by its parent is
+    a zombie.
+    """
+    host, _, pid = owner.rpartition(":")
+    if host != socket.gethostname() or not pid.isdigit():
+        return False
+    try:
+        with open(f"/proc/{pid}/stat", "rb") as fp:
+            stat = fp.read()
+        return stat[stat.rindex(b")") + 2:].startswith(b"Z")
+    except FileNotFoundError:
+        return True
+    except OSError:
+        pass
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        pass
+    return False
+
+
+def _instance_data(instance: Optional[Instance]) -> Optional[dict]:
+    if instance is None:
+        return None
+    return {
+        "pid": instance.pid,
+        "started": instance.started.isoformat(),
+        "stopped": instance.stopped and instance.stopped.isoformat(),
+    }
+
+
+class RemoteInstance(Instance):
+    """
+    Instance owned by the supervisor of another worker, as reported by it.
+    """
+
+    def __init__(self, server_config_id: int, data: dict):
+        self.server_config_id = server_config_id
+        self.process = None
+        self._pid = data["pid"]
+        self.started = datetime.fromisoformat(data["started"])
+        self.stopped = data["stopped"] and \
+            datetime.fromisoformat(data["stopped"])
+
+    @property
+    def pid(self):
+        return self._pid
+
+
+class SupervisorClient:
+    """
+    Forwards commands to the supervisor of the owner worker, with the
+    interface of ``Supervisor`` used by controllers.
+    """
+
+    def __init__(self, ownership: "Ownership"):
+        self.ownership = ownership
+
+    async def _connect(self, request: dict, refresh: bool):
+        lease = self.ownership.lease
+        if refresh or lease is None:
+            lease = await self.ownership.refresh()
+        if lease is None or lease.expires < time.time():
+            raise SupervisorUnavailable("no worker owns the supervisor")
+
+        host, _, port = lease.address.rpartition(":")
+        try:
+            reader, writer = await asyncio.open_connection(host, int(port))
+            writer.write(json.dumps({**request, "secret": lease.secret})
+                         .encode("UTF-8") + b"\n")
+            await writer.drain()
+        except OSError as exc:
+            raise SupervisorUnavailable(str(exc))
+        return reader, writer
+
+    async def _accepted(self, request: dict):
+        """
+        Reader and writer of a connection the owner accepted ``request`` on.
+        Connects to the owner known from the lease read last, if that fails
+        to the owner of the lease read anew.
+        """
+        for refresh in (False, True):
+            try:
+                reader, writer = await self._connect(request, refresh)
+                status = json.loads(await reader.readline() or "null")
+            except SupervisorUnavailable:
+                if refresh:
+                    raise
+                continue
+            except (ConnectionError, ValueError):
+                status = None
+            if isinstance(status, dict) and "error" not in status:
+                return reader, writer
+            writer.close()
+            if refresh:
+                raise SupervisorUnavailable(
+                    status["error"] if status else "no response"
+                )
+
+    async def _call(self, request: dict) -> dict:
+        reader, writer = await self._accepted(request)
+        try:
+            line = await reader.readline()
+        except ConnectionError:
+            line = b""
+        finally:
+            writer.close()
+        if not line:
+            raise SupervisorUnavailable("connection lost")
+        return json.loads(line)
+
+    async def start(self, server_config) -> Instance:
+        result = (await self.start_many([server_config]))[server_config.id]
+        if isinstance(result, BaseException):
+            raise result
+        return result
+
+    async def start_many(self, server_configs: list) -> dict:
+        response = await self._call({
+            "op": "start", "ids": [it.id for it in server_configs],
+        })
+        return {
+            int(id): (
+                RuntimeError(result["error"]) if "error" in result
+                else RemoteInstance(int(id), result)
+            )
+            for id, result in response["results"].items()
+        }
+
+    async def stop(self, server_config_id: int) -> Optional[Instance]:
+        return (await self.stop_many([server_config_id]))[server_config_id]
+
+    async def stop_many(self, server_config_ids: list[int]) -> dict:
+        response = await self._call({"op": "stop", "ids": server_config_ids})
+        return {
+            int(id): result and RemoteInstance(int(id), result)
+            for id, result in response["results"].items()
+        }
+
+    async def running(self, server_config_ids: list[int]) -> set[int]:
+        response = await self._call({
+            "op": "running", "ids": server_config_ids,
+        })
+        return set(response["ids"])
+
+    async def _follow(self, request: dict):
+        """
+        Items of a stream, it ends when the owner gives up the role.
+        Connects before returning, so failing to raises here.
+        """
+        reader, writer = await self._accepted(request)
+        return self._items(reader, writer)
+
+    @staticmethod
+    async def _items(reader, writer):
+        try:
+            while line := await reader.readline():
+                item = json.loads(line)
+                yield item and tuple(item)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def follow_log(self, server_config_id: int,
+                         position: Optional[int] = None, backlog: int = 0):
+        return await self._follow({
+            "op": "log", "id": server_config_id, "position": position,
+            "backlog": backlog,
+        })
+
+    async def follow_states(self,
+                            server_config_ids: Optional[list[int]] = None,
+                            position: Optional[int] = None, backlog: int = 0):
+        return await self._follow({
+            "op": "states", "ids": server_config_ids, "position": position,
+            "backlog": backlog,
+        })
+
+
+class Ownership:
+    """
+    Holds or follows the lease of the supervisor role for this worker. The
+    owner runs ``supervisor`` and ``services``, started when it takes the
+    role and stopped, or for ``supervisor`` released, when it loses it.
+
+    Must be used from within the running event loop of the app.
+    """
+
+    def __init__(self, db, supervisor: Supervisor, services=(), ttl=10.0,
+                 interval=3.0):
+        self.db = db
+        self.local = supervisor
+        self.services = services
+        self.ttl = ttl
+        self.interval = interval
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self.secret = secrets.token_hex(16)
+        self.address = None
+        self.lease = None
+        self.is_owner = False
+        self.expires = 0.0
+        self.client = SupervisorClient(self)
+        self.server = None
+        self.task = None
+        self._connections = set()
+
+    def owns(self) -> bool:
+        """
+        Whether this worker owns the supervisor. A lease expired while
+        renewing it was blocked, e.g. by a stalled event loop, may have been
+        taken over already.
+        """
+        return self.is_owner and time.time() < self.expires
+
+    @property
+    def supervisor(self):
+        """
+        The supervisor of this worker if it's the owner, else a client of
+        the owner's.
+        """
+        return self.local if self.owns() else self.client
+
+    async def startup(self):
+        self.server = await asyncio.start_server(self._serve, HOST, 0)
+        port = self.server.sockets[0].getsockname()[1]
+        self.address = f"{HOST}:{port}"
+        await self.renew()
+        self.task = asyncio.create_task(self._run())
+
+    async def shutdown(self):
+        if self.task is not None:
+            self.task.cancel()
+        if self.server is not None:
+            self.server.close()
+        if self.is_owner:
+            await self._demote(stop=True)
+            await asyncio.to_thread(storage.release, self.db, self.owner)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.renew()
+            except Exception:
+                log.exception("renewing supervisor lease failed")
+                if self.is_owner and time.time() >= self.expires:
+                    await self._demote()
+
+    async def _acquire(self, replace=None):
+        return await asyncio.to_thread(
+            storage.acquire, self.db, self.owner, self.address, self.secret,
+            self.ttl, replace,
+        )
+
+    async def renew(self):
+        """
+        Renew the lease if owner, else take it over if possible.
+        """
+        lease = await self._acquire()
+        if lease.owner != self.owner and _is_gone(lease.owner):
+            # don't wait for expiry of a lease of an exited worker
+            lease = await self._acquire(replace=lease.owner)
+        self.lease = lease
+        if lease.owner == self.owner:
+            self.expires = lease.expires
+            if not self.is_owner:
+                await self._promote()
+        elif self.is_owner:
+            await self._demote()
+
+    async def refresh(self):
+        """
+        Lease as committed, e.g. after the owner couldn't be reached.
+        """
+        self.lease = await asyncio.to_thread(storage.get, self.db)
+        return self.lease
+
+    async def _promote(self):
+        log.info("worker %s owns the supervisor", self.owner)
+        self.is_owner = True
+        await self.local.startup()
+        for service in self.services:
+            await service.startup()
+
+    async def _demote(self, stop=False):
+        """
+        Give up the role, stopping server processes if ``stop``, else
+        leaving them to the next owner.
+        """
+        log.info("worker %s no longer owns the supervisor", self.owner)
+        self.is_owner = False
+        for service in self.services:
+            await service.shutdown()
+        if stop:
+            await self.local.shutdown()
+        else:
+            self.local.release()
+        # streams end, clients reconnect to the new owner
+        for writer in list(self._connections):
+            writer.close()
+
+    async def _serve(self, reader, writer):
+        self._connections.add(writer)
+        try:
+            request = json.loads(await reader.readline() or "null")
+            if not isinstance(request, dict) or not hmac.compare_digest(
+                str(request.get("secret")), self.secret
+            ):
+                return
+            if not self.owns():
+                await self._send(writer, {"error": "not owner"})
+                return
+            handler = getattr(self, f"_handle_{request.get('op')}", None)
+            if handler is None:
+                await self._send(writer, {"error": "unknown op"})
+                return
+            await self._send(writer, {})
+            async for response in handler(request):
+                await self._send(writer, response)
+        except (ConnectionError, ValueError):
+            pass
+        except Exception:
+            log.exception("serving supervisor command failed")
+        finally:
+            self._connections.discard(writer)
+            writer.close()
+
+    @staticmethod
+    async def _send(writer, response):
+        writer.write(json.dumps(response).encode("UTF-8") + b"\n")
+        await writer.drain()
+
+    async def _handle_start(self, request):
+        server_configs = await asyncio.to_thread(
+            server_config_storage.get_many, self.db, request["ids"]
+        )
+        results = {id: {"error": "not found"} for id in request["ids"]}
+        started = await self.local.start_many(server_configs)
+        for id, result in started.items():
+            results[id] = (
+                {"error": str(result)} if isinstance(result, BaseException)
+                else _instance_data(result)
+            )
+        yield {"results": results}
+
+    async def _handle_stop(self, request):
+        stopped = await self.local.stop_many(request["ids"])
+        yield {
+            "results": {
+                id: _instance_data(it) for id, it in stopped.items()
+            }
+        }
+
+    async def _handle_running(self, request):
+        yield {"ids": list(await self.local.running(request["ids"]))}
+
+    async def _handle_log(self, request):
+        async for item in await self.local.follow_log(
+            request["id"], request["position"], request["backlog"]
+        ):
+            yield item
+
+    async def _handle_states(self, request):
+        async for item in await self.local.follow_states(
+            request["ids"], request["position"], request["backlog"]
+        ):
+            yield item
+
+
+ownership = Ownership(
+    db,
+    supervisor,
+    services=[ingestor],
+    ttl=config.getfloat("server", "lease_ttl"),
+    interval=config.getfloat("server", "lease_interval"),
+)
+
+
+def use_supervisor():
+    return ownership.supervisor
@@ -1,28 +1,504 @@
+import asyncio
+import logging
 import os
 import pathlib
+import signal
+import time
 from datetime import datetime
+from subprocess import DEVNULL, STDOUT
+from typing import AsyncIterator, Optional, Union
 
+from acc_server_mgr import render
+from acc_server_mgr.config import config
+from acc_server_mgr.database import db
+from acc_server_mgr.log_buffer import (
+    FileTail, LogBuffer, RingBuffer, read_lines,
+)
 from acc_server_mgr.models.db import ServerConfig
+from acc_server_mgr.models.schema import ProcessState, ProcessTransition
+from acc_server_mgr.storage import server_config as storage
 
-TMP_PATH = pathlib.Path("")
+log = logging.getLogger(__name__)
 
+# output of a server process, in its instance directory
+OUTPUT_FILE = "output.log"
 
-def start_server(server_config: ServerConfig):
-    server_config_file_path = TMP_PATH / "server_config.ini"
-    with open(server_config_file_path, "w") as fp:
-        fp.write(server_config.config)
 
-    server_config.process_id = os.spawnl(
-        os.P_NOWAIT, "server", "args", server_config_file_path
-    )
-    server_config.is_running = True
-    server_config.last_start = datetime.now()
-    return server_config
+def is_server_process(pid: int, server_exe_path: str) -> bool:
+    """
+    Whether ``pid`` is a live process running ``server_exe_path``, as the
+    program or as script of an interpreter. Without ``/proc`` only whether
+    ``pid`` exists.
+    """
+    try:
+        with open(f"/proc/{pid}/cmdline", "rb") as fp:
+            cmdline = fp.read()
+    except FileNotFoundError:
+        return False
+    except OSError:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
+    # zombies have an empty command line
+    return os.fsencode(server_exe_path) in cmdline.split(b"\0")
 
 
-def stop_server(server_config):
-    os.spawnl(os.P_NOWAIT, "taskkill", "/F", "/PID", str(server_config.process_id))
-    server_config.last_stop = datetime.now()
-    server_config.is_running = False
-    server_config.process_id = 0
-    return server_config
+class AdoptedProcess:
+    """
+    Server process spawned by another supervisor, of a previous run or of a
+    worker that lost ownership. It isn't a child process, its exit is polled
+    and its return code unknown.
+    """
+    returncode = None
+
+    def __init__(self, pid: int, server_exe_path: str, poll_interval=1.0):
+        self.pid = pid
+        self.server_exe_path = server_exe_path
+        self.poll_interval = poll_interval
+
+    def terminate(self):
+        os.kill(self.pid, signal.SIGTERM)
+
+    def kill(self):
+        os.kill(self.pid, signal.SIGKILL)
+
+    async def wait(self):
+        while is_server_process(self.pid, self.server_exe_path):
+            await asyncio.sleep(self.poll_interval)
+        return self.returncode
+
+
+class Instance:
+    """
+    A running server process owned by the supervisor.
+    """
+
+    def __init__(self, server_config_id: int, process, started=None):
+        self.server_config_id = server_config_id
+        self.process = process
+        self.started = started or datetime.now()
+        self.stopped = None
+        self.persisted = asyncio.Event()
+        self.persist_exit = True
+        self.reaper = None
+        self.reader = None
+        self.output = None
+
+    @property
+    def pid(self):
+        return self.process.pid
+
+    def process_info(self) -> dict:
+        return dict(
+            process_is_running=True,
+            process_last_start=self.started,
+            process_id=self.pid,
+        )
+
+    def exit_info(self) -> dict:
+        return dict(
+            process_is_running=False,
+            process_last_stop=self.stopped,
+            process_id=None,
+        )
+
+
+class StateHub:
+    """
+    Publishes state transitions of server processes to any number of
+    subscribers. Transitions are rendered once and kept in a ring buffer
+    numbered by a sequence, subscribers follow the buffer, so a subscriber
+    resuming at the sequence number after the last one it received misses
+    no transition still buffered.
+
+    Must be used from within the running event loop of the app.
+    """
+
+    def __init__(self, max_transitions=1000):
+        self.buffer = RingBuffer(max_transitions)
+
+    def publish(self, server_config_id: int, state: ProcessState, **info):
+        transition = ProcessTransition(
+            server_config_id=server_config_id,
+            state=state,
+            time=datetime.now(),
+            **info
+        )
+        self.buffer.append((server_config_id, transition.json()))
+
+    async def subscribe(self, position: Optional[int] = None,
+                        server_config_ids: Optional[list[int]] = None,
+                        keep_alive: float = 15.0
+                        ) -> AsyncIterator[Optional[tuple[int, str]]]:
+        """
+        Yield transitions of ``server_config_ids``, or of all instances, as
+        tuples of sequence number and JSON from ``position`` on, default is
+        the next transition published. Yields None after ``keep_alive``
+        seconds without transitions yielded.
+        """
+        if position is None:
+            position = self.buffer.end
+        ids = None if server_config_ids is None else set(server_config_ids)
+        last = time.monotonic()
+        async for item in self.buffer.follow(position, keep_alive):
+            if item is not None:
+                position, (server_config_id, data) = item
+                if ids is None or server_config_id in ids:
+                    last = time.monotonic()
+                    yield position, data
+                    continue
+            if time.monotonic() - last >= keep_alive:
+                last = time.monotonic()
+                yield None
+
+
+class Supervisor:
+    """
+    Owns all server processes, spawned as asyncio subprocesses. Instances are
+    registered by ``ServerConfig.id``. The running state is persisted after
+    spawning, then a reaper task awaits process exit, removes the instance from
+    the registry and persists the stopped state.
+
+    Processes run in their own session with output to ``OUTPUT_FILE`` in
+    their instance directory, so they survive the app and can be adopted by
+    the next supervisor. One reader task per process tails it into a
+    ``LogBuffer`` per ``ServerConfig.id``, kept across restarts, and
+    truncates it once read past ``output_max_size`` bytes. State
+    transitions are published to ``states`` once persisted.
+
+    Must be used from within the running event loop of the app.
+    """
+
+    def __init__(self, db, server_exe_path, instances_path, stop_timeout=10.0,
+                 spawn_limit=8, log_lines=1000, log_line_length=1024,
+                 state_transitions=1000, output_max_size=None):
+        self.db = db
+        self.server_exe_path = server_exe_path
+        self.instances_path = pathlib.Path(instances_path)
+        self.stop_timeout = stop_timeout
+        self.spawn_limit = spawn_limit
+        self.spawn_semaphore = None
+        self.spawn_locks: dict[int, asyncio.Lock] = {}
+        self.log_lines = log_lines
+        self.log_line_length = log_line_length
+        self.output_max_size = output_max_size
+        self.instances: dict[int, Instance] = {}
+        self.logs: dict[int, LogBuffer] = {}
+        self.states = StateHub(state_transitions)
+
+    def instance_path(self, server_config_id: int) -> pathlib.Path:
+        return self.instances_path / str(server_config_id)
+
+    def get(self, server_config_id: int):
+        return self.instances.get(server_config_id)
+
+    def is_running(self, server_config_id: int) -> bool:
+        return server_config_id in self.instances
+
+    def log(self, server_config_id: int) -> LogBuffer:
+        buffer = self.logs.get(server_config_id)
+        if buffer is None:
+            buffer = LogBuffer(self.log_lines, self.log_line_length)
+            self.logs[server_config_id] = buffer
+        return buffer
+
+    async def startup(self):
+        """
+        Take over processes recorded as running, spawned by a previous app
+        run or by the previous owner worker, if they still run. Process info
+        of others is stale, it's reset.
+        """
+        self.spawn_semaphore = asyncio.Semaphore(self.spawn_limit)
+        running = await asyncio.to_thread(
+            storage.get_running_processes, self.db
+        )
+        for server_config_id, (pid, started) in running.items():
+            if server_config_id not in self.instances \
+                    and self.server_exe_path \
+                    and is_server_process(pid, self.server_exe_path):
+                self._adopt(server_config_id, pid, started)
+        await asyncio.to_thread(
+            storage.reset_process_info, self.db, list(self.instances)
+        )
+
+    def _adopt(self, server_config_id: int, pid: int, started: datetime):
+        process = AdoptedProcess(pid, self.server_exe_path)
+        instance = Instance(server_config_id, process, started)
+        instance.persisted.set()
+        self.instances[server_config_id] = instance
+        self.log(server_config_id).append(f"[adopted pid {pid}]")
+        output_path = self.instance_path(server_config_id) / OUTPUT_FILE
+        try:
+            # recent output, as much as the log buffer holds at most
+            position = max(
+                output_path.stat().st_size
+                - self.log_lines * self.log_line_length, 0
+            )
+            self._read_output(instance, FileTail(
+                output_path, position, max_size=self.output_max_size
+            ))
+        except OSError:
+            log.warning("can't read output of server_config %s",
+                        server_config_id, exc_info=True)
+        instance.reaper = asyncio.create_task(self._reap(instance))
+        log.info("adopted server_config %s, pid %s", server_config_id, pid)
+        self.states.publish(server_config_id, ProcessState.running, pid=pid)
+
+    async def shutdown(self):
+        await self.stop_many(list(self.instances))
+
+    def release(self):
+        """
+        Give up all instances without stopping them, for another supervisor
+        to adopt. Their exits are no longer persisted.
+        """
+        for instance in self.instances.values():
+            instance.persist_exit = False
+        self.instances.clear()
+
+    async def running(self, server_config_ids: list[int]) -> set[int]:
+        return {it for it in server_config_ids if it in self.instances}
+
+    async def follow_log(self, server_config_id: int,
+                         position: Optional[int] = None, backlog: int = 0):
+        """
+        ``LogBuffer.follow`` the output of ``server_config_id`` from
+        ``position``, default is the last ``backlog`` lines.
+        """
+        buffer = self.log(server_config_id)
+        if position is None:
+            position = max(buffer.end - backlog, 0)
+        return buffer.follow(position)
+
+    async def follow_states(self,
+                            server_config_ids: Optional[list[int]] = None,
+                            position: Optional[int] = None, backlog: int = 0):
+        """
+        ``StateHub.subscribe`` to transitions of ``server_config_ids`` from
+        ``position``, default is the last ``backlog`` transitions.
+        """
+        if position is None:
+            position = max(self.states.buffer.end - backlog, 0)
+        return self.states.subscribe(position, server_config_ids)
+
+    async def start(self, server_config: ServerConfig) -> Instance:
+        """
+        Spawn server process for ``server_config``, returns immediately after
+        spawning. Starting an already running instance returns the running
+        instance.
+        """
+        result = (await self.start_many([server_config]))[server_config.id]
+        if isinstance(result, BaseException):
+            raise result
+        return result
+
+    async def start_many(self, server_configs: list[ServerConfig]
+                         ) -> dict[int, Union[Instance, BaseException]]:
+        """
+        Spawn server processes concurrently, at most ``spawn_limit`` at a time.
+        Running state of all spawned instances is persisted in one
+        transaction. Returns instance or raised exception by
+        ``ServerConfig.id``.
+        """
+        async def spawn(server_config):
+            async with self.spawn_semaphore:
+                return await self._spawn(server_config)
+
+        results = await asyncio.gather(
+            *(spawn(it) for it in server_configs),
+            return_exceptions=True
+        )
+        spawned = [
+            result[0] for result in results
+            if not isinstance(result, BaseException) and result[1]
+        ]
+        try:
+            await asyncio.to_thread(
+                storage.update_process_info_many, self.db,
+                {it.server_config_id: it.process_info() for it in spawned}
+            )
+        finally:
+            for instance in spawned:
+                instance.persisted.set()
+                self.states.publish(
+                    instance.server_config_id, ProcessState.running,
+                    pid=instance.pid,
+                )
+
+        return {
+            server_config.id: (
+                result if isinstance(result, BaseException) else result[0]
+            )
+            for server_config, result in zip(server_configs, results)
+        }
+
+    async def _spawn(self, server_config: ServerConfig):
+        """
+        Returns tuple of instance and whether it was spawned by this call.
+        Calls for the same ``ServerConfig.id`` run one after another, so a
+        call while another is spawning returns the instance it spawned.
+        """
+        lock = self.spawn_locks.setdefault(server_config.id, asyncio.Lock())
+        async with lock:
+            instance = self.instances.get(server_config.id)
+            if instance is not None:
+                return instance, False
+            return await self._spawn_new(server_config), True
+
+    async def _spawn_new(self, server_config: ServerConfig) -> Instance:
+        if not self.server_exe_path:
+            raise RuntimeError("acc.server_exe_path is not configured")
+
+        self.states.publish(server_config.id, ProcessState.starting)
+        try:
+            instance_path = self.instance_path(server_config.id)
+            await asyncio.to_thread(
+                render.write_files, self.db, server_config,
+                instance_path / "cfg"
+            )
+            if server_config.settings_dump_leaderboards:
+                # ACC doesn't create it
+                (instance_path / "results").mkdir(exist_ok=True)
+            output_path = instance_path / OUTPUT_FILE
+            # appended to, so truncating it after reading leaves no gap
+            fd = os.open(
+                output_path,
+                os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_APPEND, 0o644,
+            )
+            with open(fd, "wb") as output:
+                process = await asyncio.create_subprocess_exec(
+                    self.server_exe_path,
+                    cwd=instance_path,
+                    stdin=DEVNULL,
+                    stdout=output,
+                    stderr=STDOUT,
+                    start_new_session=True,
+                )
+        except Exception as exc:
+            self.states.publish(
+                server_config.id, ProcessState.failed, detail=str(exc)
+            )
+            raise
+        instance = Instance(server_config.id, process)
+        self.instances[server_config.id] = instance
+        self._read_output(instance, FileTail(
+            output_path, max_size=self.output_max_size
+        ))
+        instance.reaper = asyncio.create_task(self._reap(instance))
+        log.info("started server_config %s, pid %s",
+                 server_config.id, instance.pid)
+        return instance
+
+    def _read_output(self, instance: Instance, output: FileTail):
+        instance.output = output
+        instance.reader = asyncio.create_task(
+            read_lines(output, self.log(instance.server_config_id))
+        )
+
+    async def stop(self, server_config_id: int):
+        """
+        Terminate server process of ``server_config_id``, kill it if it didn't
+        exit within ``stop_timeout``. Returns after the process was reaped.
+        Stopping an instance that isn't running is a no-op.
+        """
+        return (await self.stop_many([server_config_id]))[server_config_id]
+
+    async def stop_many(self, server_config_ids: list[int]
+                        ) -> dict[int, Optional[Instance]]:
+        """
+        Stop instances concurrently, persisting stopped state of all in one
+        transaction. Returns the stopped instance, or None if not running, by
+        ``ServerConfig.id``.
+        """
+        instances = {
+            server_config_id: self.instances.get(server_config_id)
+            for server_config_id in server_config_ids
+        }
+        stopping = [it for it in instances.values() if it is not None]
+        if not stopping:
+            return instances
+
+        for instance in stopping:
+            # stopped state is persisted below, not by the reaper
+            instance.persist_exit = False
+        await asyncio.gather(*(self._terminate(it) for it in stopping))
+        try:
+            await asyncio.to_thread(
+                storage.update_process_info_many, self.db,
+                {it.server_config_id: it.exit_info() for it in stopping}
+            )
+        finally:
+            for instance in stopping:
+                self.states.publish(
+                    instance.server_config_id, ProcessState.stopped,
+                    pid=instance.pid, returncode=instance.process.returncode,
+                )
+        return instances
+
+    async def _terminate(self, instance: Instance):
+        try:
+            instance.process.terminate()
+        except ProcessLookupError:
+            pass
+
+        try:
+            await asyncio.wait_for(asyncio.shield(instance.reaper),
+                                   self.stop_timeout)
+        except asyncio.TimeoutError:
+            log.warning("server_config %s didn't terminate, killing pid %s",
+                        instance.server_config_id, instance.pid)
+            try:
+                instance.process.kill()
+            except ProcessLookupError:
+                pass
+            await instance.reaper
+
+    async def _reap(self, instance: Instance):
+        returncode = await instance.process.wait()
+        if instance.output is not None:
+            # read the rest of the output before logging the exit
+            instance.output.finish()
+            await asyncio.gather(instance.reader, return_exceptions=True)
+        # an early exit must not be overwritten by persisting the start
+        await instance.persisted.wait()
+        instance.stopped = datetime.now()
+        if self.instances.get(instance.server_config_id) is instance:
+            del self.instances[instance.server_config_id]
+        log.info("server_config %s, pid %s exited with %s",
+                 instance.server_config_id, instance.pid, returncode)
+        self.log(instance.server_config_id).append(
+            f"[pid {instance.pid} exited with {returncode}]"
+        )
+        if not instance.persist_exit:
+            return returncode
+
+        try:
+            await asyncio.to_thread(
+                storage.update_process_info, self.db,
+                instance.server_config_id, **instance.exit_info()
+            )
+        except Exception:
+            log.exception("persisting exit of server_config %s failed",
+                          instance.server_config_id)
+        self.states.publish(
+            instance.server_config_id, ProcessState.exited,
+            pid=instance.pid, returncode=returncode,
+        )
+        return returncode
+
+
+supervisor = Supervisor(
+    db,
+    server_exe_path=config.get("acc", "server_exe_path"),
+    instances_path=config.get("acc", "instances_path"),
+    stop_timeout=config.getfloat("acc", "stop_timeout"),
+    spawn_limit=config.getint("acc", "spawn_limit"),
+    log_lines=config.getint("acc", "log_lines"),
+    log_line_length=config.getint("acc", "log_line_length"),
+    state_transitions=config.getint("acc", "state_transitions"),
+    output_max_size=config.getint("acc", "output_max_size"),
+)
@@ -0,0 +1,221 @@
+"""
+Samples CPU usage and resident memory of running server processes from
+``/proc``, into fixed size ring buffers per server config.
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+from array import array
+from typing import Optional
+
+from acc_server_mgr.config import config
+from acc_server_mgr.database import db
+from acc_server_mgr.models.schema import StatsAggregate
+from acc_server_mgr.storage import server_config as storage
+
+log = logging.getLogger(__name__)
+
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+AGGREGATES = {
+    StatsAggregate.mean: lambda values: sum(values) / len(values),
+    StatsAggregate.min: min,
+    StatsAggregate.max: max,
+}
+
+
+def read_proc(pid: int) -> Optional[tuple[int, int, int]]:
+    """
+    Start time and CPU time, user and system, in clock ticks and resident
+    set size in KiB of process ``pid``, None if it doesn't exist.
+    """
+    try:
+        with open(f"/proc/{pid}/stat", "rb") as fp:
+            stat = fp.read()
+        with open(f"/proc/{pid}/status", "rb") as fp:
+            status = fp.read()
+    except OSError:
+        return None
+
+    # the command name may contain spaces and parentheses, fields from 3 on
+    # follow its closing parenthesis
+    fields = stat[stat.rindex(b")") + 2:].split()
+    utime, stime, starttime = fields[11], fields[12], fields[19]
+    rss = 0
+    for line in status.splitlines():
+        if line.startswith(b"VmRSS:"):
+            rss = int(line.split()[1])
+            break
+    return int(starttime), int(utime) + int(stime), rss
+
+
+class SampleBuffer:
+    """
+    Fixed size ring buffer of samples, time as unix timestamp, CPU usage in
+    percent of one core and resident set size in KiB, stored in arrays of 16
+    bytes per sample.
+    """
+
+    def __init__(self, size=3600):
+        self.size = size
+        self.times = array("d", bytes(8 * size))
+        self.cpu = array("f", bytes(4 * size))
+        self.rss = array("I", bytes(4 * size))
+        # number of samples appended
+        self.end = 0
+
+    def append(self, timestamp: float, cpu: float, rss: int):
+        index = self.end % self.size
+        self.times[index] = timestamp
+        self.cpu[index] = cpu
+        self.rss[index] = rss
+        self.end += 1
+
+    def series(self, since: Optional[float] = None
+               ) -> tuple[list[float], list[float], list[int]]:
+        """
+        Times, CPU usage and resident set sizes of buffered samples taken
+        at or after ``since``, oldest first.
+        """
+        count = min(self.end, self.size)
+        start = self.end - count
+        indexes = [it % self.size for it in range(start, self.end)]
+        if since is not None:
+            indexes = [it for it in indexes if self.times[it] >= since]
+        return (
+            [self.times[it] for it in indexes],
+            [self.cpu[it] for it in indexes],
+            [self.rss[it] for it in indexes],
+        )
+
+
+def downsample(times: list[float], series: list[list], step: float,
+               aggregate: StatsAggregate) -> tuple[list[float], list[list]]:
+    """
+    Aggregate ``series`` sampled at ``times`` per ``step`` seconds. Times of
+    the result are the starts of the steps.
+    """
+    convert = AGGREGATES[aggregate]
+    bucket_times = []
+    buckets = [[] for _ in series]
+    results = [[] for _ in series]
+    current = None
+
+    def flush():
+        for bucket, result in zip(buckets, results):
+            result.append(convert(bucket))
+            bucket.clear()
+
+    for index, timestamp in enumerate(times):
+        key = timestamp // step
+        if key != current:
+            if current is not None:
+                flush()
+            current = key
+            bucket_times.append(key * step)
+        for bucket, values in zip(buckets, series):
+            bucket.append(values[index])
+    if current is not None:
+        flush()
+    return bucket_times, results
+
+
+class StatsSampler:
+    """
+    Background task sampling processes of server configs with a
+    ``process_id`` every ``interval`` seconds. CPU usage is averaged over
+    the interval, so the first sample of a process is taken one interval
+    after it is first seen. Buffers are kept across process restarts.
+    """
+
+    def __init__(self, db, interval=1.0, samples=3600):
+        self.db = db
+        self.interval = interval
+        self.samples = samples
+        self.buffers: dict[int, SampleBuffer] = {}
+        # server config id -> pid, start time, CPU ticks, monotonic time
+        self._previous: dict[int, tuple[int, int, int, float]] = {}
+        self._lock = threading.Lock()
+        self.task = None
+
+    async def startup(self):
+        if not os.path.exists("/proc/self/stat"):
+            log.info("no /proc, not sampling server processes")
+            return
+        self.task = asyncio.create_task(self._run())
+
+    async def shutdown(self):
+        if self.task is not None:
+            self.task.cancel()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.sample_all)
+            except Exception:
+                log.exception("sampling server processes failed")
+            await asyncio.sleep(self.interval)
+
+    def sample_all(self):
+        process_ids = storage.get_process_ids(self.db)
+        for server_config_id in list(self._previous):
+            if server_config_id not in process_ids:
+                del self._previous[server_config_id]
+        for server_config_id, pid in process_ids.items():
+            self.sample(server_config_id, pid)
+
+    def sample(self, server_config_id: int, pid: int):
+        proc = read_proc(pid)
+        now = time.monotonic()
+        if proc is None:
+            self._previous.pop(server_config_id, None)
+            return
+
+        starttime, ticks, rss = proc
+        previous = self._previous.get(server_config_id)
+        self._previous[server_config_id] = (pid, starttime, ticks, now)
+        if previous is None or previous[:2] != (pid, starttime):
+            return
+
+        cpu = (ticks - previous[2]) / CLOCK_TICKS / (now - previous[3]) * 100
+        with self._lock:
+            buffer = self.buffers.get(server_config_id)
+            if buffer is None:
+                buffer = SampleBuffer(self.samples)
+                self.buffers[server_config_id] = buffer
+            buffer.append(time.time(), cpu, rss)
+
+    def series(self, server_config_id: int, seconds: Optional[float] = None,
+               step: float = 0, aggregate=StatsAggregate.mean
+               ) -> tuple[list[float], list[float], list[int]]:
+        """
+        Times, CPU usage and resident set sizes in bytes of the last
+        ``seconds``, or of all buffered samples, of ``server_config_id``.
+        Aggregated per ``step`` seconds, if given.
+        """
+        since = None if seconds is None else time.time() - seconds
+        with self._lock:
+            buffer = self.buffers.get(server_config_id)
+            if buffer is None:
+                return [], [], []
+            times, cpu, rss = buffer.series(since)
+        if step > 0:
+            times, (cpu, rss) = downsample(times, [cpu, rss], step, aggregate)
+        return (
+            times,
+            [round(it, 2) for it in cpu],
+            [int(it * 1024) for it in rss],
+        )
+
+
+sampler = StatsSampler(
+    db,
+    interval=config.getfloat("acc", "stats_interval"),
+    samples=config.getint("acc", "stats_samples"),
+)
+
+
+def use_sampler():
+    return sampler
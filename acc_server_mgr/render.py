@@ -0,0 +1,245 @@
+"""
+Renders ``ServerConfig`` and ``Event`` rows to the json files an ACC server
+reads from its ``cfg`` directory.
+
+Rendered files are cached per ``ServerConfig.id`` with their sha256 digest,
+keyed by the versions of the row and of its event, so rows written by any
+process, or read before a write, render anew. Storage modules also
+invalidate the cache on writes, to free entries. Files are only written
+when their digest differs from the file on disk, writing replaces the file
+atomically.
+"""
+import hashlib
+import json
+import os
+import pathlib
+import tempfile
+import threading
+from typing import Optional
+
+from acc_server_mgr.models.db import (
+    ServerConfig as ServerConfigModel,
+    Event as EventModel,
+    Session as SessionModel,
+)
+
+# ACC server writes and reads its json files UTF-16 LE with BOM
+ENCODING = "utf-16-le"
+BOM = b"\xff\xfe"
+
+
+class RenderedFile:
+    def __init__(self, name: str, content: bytes):
+        self.name = name
+        self.content = content
+        self.digest = hashlib.sha256(content).hexdigest()
+
+
+class Rendered:
+    """
+    Rendered cfg files of a ``ServerConfig``.
+    """
+
+    def __init__(self, server_config_id: int, event_id: Optional[int],
+                 key: tuple, files: list[RenderedFile]):
+        self.server_config_id = server_config_id
+        self.event_id = event_id
+        self.key = key
+        self.files = files
+
+
+_cache: dict[int, Rendered] = {}
+_cache_lock = threading.Lock()
+# (digest, mtime, size) of files written, by path
+_written: dict[str, tuple[str, int, int]] = {}
+
+
+def _version(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 1
+
+
+def _dump(data: dict) -> bytes:
+    return BOM + json.dumps(data, indent=2).encode(ENCODING)
+
+
+def _without_none(data: dict) -> dict:
+    return {key: value for key, value in data.items() if value is not None}
+
+
+def render_settings(obj: ServerConfigModel) -> dict:
+    return _without_none({
+        "serverName": obj.settings_server_name,
+        "adminPassword": obj.settings_admin_password,
+        "carGroup": obj.settings_car_group,
+        "trackMedalsRequirement": obj.settings_track_medals_requirement,
+        "safetyRatingRequirement": obj.settings_safety_rating_requirement,
+        "racecraftRatingRequirement":
+            obj.settings_racecraft_rating_requirement,
+        "password": obj.settings_password or None,
+        "spectatorPassword": obj.settings_spectator_password or None,
+        "maxCarSlots": obj.settings_max_car_slots,
+        "dumpLeaderboards": int(obj.settings_dump_leaderboards),
+        "dumpEntryList": int(obj.settings_dump_entry_list),
+        "isRaceLocked": int(obj.settings_is_race_locked),
+        "shortFormationLap": int(obj.settings_short_formation_lap),
+        "formationLapType": obj.settings_formation_lap_type,
+        "doDriverSwapBroadcast": int(obj.settings_do_driver_swap_broadcast),
+        "randomizeTrackWhenEmpty":
+            int(obj.settings_randomize_track_when_empty),
+        "centralEntryListPath": obj.settings_central_entry_list_path or None,
+        "allowAutoDQ": int(obj.settings_allow_auto_dq),
+        "ignorePrematureDisconnects":
+            int(obj.settings_ignore_premature_disconnects),
+        "configVersion": _version(obj.settings_version),
+    })
+
+
+def render_configuration(obj: ServerConfigModel) -> dict:
+    return _without_none({
+        "tcpPort": obj.config_tcp_port,
+        "udpPort": obj.config_udp_port,
+        "registerToLobby": int(obj.config_register_to_lobby),
+        "maxConnections": obj.config_max_connections,
+        "lanDiscovery": int(obj.config_lan_discovery),
+        "publicIP": obj.config_public_ip or None,
+        "configVersion": _version(obj.config_version),
+    })
+
+
+def render_session(obj: SessionModel) -> dict:
+    return {
+        "hourOfDay": obj.hour_of_day,
+        "dayOfWeekend": obj.day_of_weekend,
+        "timeMultiplier": obj.time_multiplier,
+        "sessionType": obj.session_type,
+        "sessionDurationMinutes": obj.session_duration_minutes,
+    }
+
+
+def render_event(obj: EventModel, sessions: list[SessionModel]) -> dict:
+    return {
+        "track": obj.track,
+        "preRaceWaitingTimeSeconds": obj.pre_race_waiting_time_seconds,
+        "sessionOverTimeSeconds": obj.session_over_time_seconds,
+        "ambientTemp": obj.ambient_temp,
+        "cloudLevel": obj.cloud_level,
+        "rain": obj.rain,
+        "weatherRandomness": obj.weather_randomness,
+        "postQualySeconds": obj.post_qualy_seconds,
+        "postRaceSeconds": obj.post_race_seconds,
+        "metaData": obj.meta_data,
+        "simracerWeatherConditions": int(obj.simracer_weather_conditions),
+        "isFixedConditionQualification":
+            int(obj.is_fixed_condition_qualification),
+        "sessions": [render_session(it) for it in sessions],
+        "configVersion": 1,
+    }
+
+
+def _key(obj: ServerConfigModel, event_version: Optional[tuple]) -> tuple:
+    return obj.created, obj.version, event_version
+
+
+def _event_version(db, event_id: Optional[int]) -> Optional[tuple]:
+    if event_id is None:
+        return None
+    with db.atomic():
+        return EventModel.select(EventModel.created, EventModel.version) \
+            .where(EventModel.id == event_id).tuples().get_or_none()
+
+
+def render(db, obj: ServerConfigModel) -> Rendered:
+    """
+    Render cfg files of ``obj``, cached while ``obj`` and its event are of
+    the same versions.
+    """
+    with _cache_lock:
+        rendered = _cache.get(obj.id)
+    if rendered is not None \
+            and rendered.key == _key(obj, _event_version(db, obj.event_id)):
+        return rendered
+
+    files = [
+        RenderedFile("settings.json", _dump(render_settings(obj))),
+        RenderedFile("configuration.json", _dump(render_configuration(obj))),
+    ]
+    event_id = obj.event_id
+    event_obj = None
+    if event_id is not None:
+        with db.atomic():
+            event_obj = EventModel.get_or_none(EventModel.id == event_id)
+            sessions = list(
+                SessionModel.select()
+                .where(SessionModel.event == event_id)
+                .order_by(SessionModel.id)
+            )
+        if event_obj is not None:
+            files.append(RenderedFile(
+                "event.json", _dump(render_event(event_obj, sessions))
+            ))
+
+    key = _key(obj, event_obj and (event_obj.created, event_obj.version))
+    rendered = Rendered(obj.id, event_id, key, files)
+    with _cache_lock:
+        _cache[obj.id] = rendered
+    return rendered
+
+
+def write_atomic(path: pathlib.Path, content: bytes):
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    try:
+        with os.fdopen(fd, "wb") as fp:
+            fp.write(content)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def _digest_on_disk(path: pathlib.Path) -> Optional[str]:
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+
+    known = _written.get(str(path))
+    if known and known[1:] == (stat.st_mtime_ns, stat.st_size):
+        return known[0]
+
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+def write_files(db, obj: ServerConfigModel, cfg_path: pathlib.Path
+                ) -> list[str]:
+    """
+    Write rendered cfg files of ``obj`` to ``cfg_path``, skipping files with
+    unchanged content. Returns names of files written.
+    """
+    cfg_path.mkdir(parents=True, exist_ok=True)
+    written = []
+    for rendered_file in render(db, obj).files:
+        path = cfg_path / rendered_file.name
+        if _digest_on_disk(path) == rendered_file.digest:
+            continue
+        write_atomic(path, rendered_file.content)
+        stat = path.stat()
+        _written[str(path)] = (
+            rendered_file.digest, stat.st_mtime_ns, stat.st_size
+        )
+        written.append(rendered_file.name)
+    return written
+
+
+def invalidate(server_config_id: int):
+    with _cache_lock:
+        _cache.pop(server_config_id, None)
+
+
+def invalidate_event(event_id: int):
+    with _cache_lock:
+        for rendered in list(_cache.values()):
+            if rendered.event_id == event_id:
+                del _cache[rendered.server_config_id]
@@ -0,0 +1,146 @@
+"""
+Ingests result files ACC servers write to ``results`` of their instance
+directory when ``settings_dump_leaderboards`` is set.
+"""
+import asyncio
+import json
+import logging
+import os
+import pathlib
+import time
+from typing import Optional
+
+from acc_server_mgr.config import config
+from acc_server_mgr.database import db
+from acc_server_mgr.models.db import ServerConfig as ServerConfigModel
+from acc_server_mgr.storage import results as storage
+
+log = logging.getLogger(__name__)
+
+
+def decode(content: bytes) -> str:
+    """
+    ACC writes result files UTF-16 LE, accept UTF-8 too.
+    """
+    if content.startswith(b"\xff\xfe"):
+        return content[2:].decode("utf-16-le")
+    if len(content) > 1 and content[1] == 0:
+        return content.decode("utf-16-le")
+    return content.decode("utf-8-sig")
+
+
+def read_result_file(path: pathlib.Path) -> dict:
+    return json.loads(decode(path.read_bytes()))
+
+
+def new_result_files(results_path: pathlib.Path, checkpoint: Optional[str]
+                     ) -> list[str]:
+    """
+    Names of result files sorting after ``checkpoint``, in order. Only lists
+    the directory, files are neither opened nor stat'ed.
+    """
+    try:
+        with os.scandir(results_path) as entries:
+            names = [
+                entry.name for entry in entries
+                if entry.name.endswith(".json")
+                and (checkpoint is None or entry.name > checkpoint)
+            ]
+    except FileNotFoundError:
+        return []
+    return sorted(names)
+
+
+def _age(path: pathlib.Path) -> float:
+    try:
+        return time.time() - path.stat().st_mtime
+    except OSError:
+        return float("inf")
+
+
+class ResultsIngestor:
+    """
+    Background task scanning ``results`` directories of server instances with
+    ``settings_dump_leaderboards`` every ``interval`` seconds. New files are
+    ingested one transaction per file, together with advancing the checkpoint
+    of the instance, so files are ingested once, also across restarts.
+
+    A file that fails to parse is retried while younger than
+    ``settle_time`` seconds, because ACC may still be writing it, then
+    skipped. A file that parses but fails to ingest is skipped at once, so
+    it doesn't block files after it.
+    """
+
+    def __init__(self, db, instances_path, interval=30.0, settle_time=60.0):
+        self.db = db
+        self.instances_path = pathlib.Path(instances_path)
+        self.interval = interval
+        self.settle_time = settle_time
+        self.task = None
+
+    async def startup(self):
+        self.task = asyncio.create_task(self._run())
+
+    async def shutdown(self):
+        if self.task is not None:
+            self.task.cancel()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.ingest_all)
+            except Exception:
+                log.exception("ingesting results failed")
+            await asyncio.sleep(self.interval)
+
+    def ingest_all(self):
+        with self.db.atomic():
+            server_config_ids = [
+                row[0] for row in ServerConfigModel.select(ServerConfigModel.id)
+                .where(ServerConfigModel.settings_dump_leaderboards == True)
+                .tuples()
+            ]
+        for server_config_id in server_config_ids:
+            try:
+                self.ingest_instance(server_config_id)
+            except Exception:
+                log.exception("ingesting results of server_config %s failed",
+                              server_config_id)
+
+    def ingest_instance(self, server_config_id: int) -> int:
+        """
+        Ingest new result files of ``server_config_id``, returns number of
+        files ingested.
+        """
+        results_path = self.instances_path / str(server_config_id) / "results"
+        checkpoint = storage.get_checkpoint(self.db, server_config_id)
+        count = 0
+        for file_name in new_result_files(results_path, checkpoint):
+            path = results_path / file_name
+            try:
+                result = read_result_file(path)
+            except (ValueError, OSError):
+                if _age(path) < self.settle_time:
+                    break
+                log.exception("skipping result file %s", path)
+                storage.set_checkpoint(self.db, server_config_id, file_name)
+                continue
+
+            try:
+                storage.ingest(self.db, server_config_id, file_name, result)
+            except Exception:
+                log.exception("skipping result file %s", path)
+                storage.set_checkpoint(self.db, server_config_id, file_name)
+                continue
+            count += 1
+        if count:
+            log.info("ingested %s result files of server_config %s",
+                     count, server_config_id)
+        return count
+
+
+ingestor = ResultsIngestor(
+    db,
+    instances_path=config.get("acc", "instances_path"),
+    interval=config.getfloat("acc", "results_scan_interval"),
+)
@@ -0,0 +1,129 @@
+"""
+Serializes rows straight to JSON bytes in the shape of response schemas,
+without building and validating a schema instance per row with
+``from_orm``. Rows read from typed columns already have the types the schemas
+describe, keys are the field aliases and datetimes are formatted as
+``BaseModel`` does, so responses are the same as FastAPI would render them.
+"""
+import json
+from datetime import datetime
+
+import pydantic
+from fastapi import Response
+from pydantic.fields import SHAPE_LIST
+
+from acc_server_mgr.storage import cache, compiler
+from acc_server_mgr.models.schema import (
+    UserResponse,
+    EventResponse,
+    ServerConfigResponse,
+    PersonalBestResponse,
+    parse_splits,
+)
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+if orjson is not None:
+    def dumps(data) -> bytes:
+        return orjson.dumps(data)
+else:
+    def dumps(data) -> bytes:
+        return json.dumps(
+            data, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+        ).encode("UTF-8")
+
+
+def _isoformat(value: datetime) -> str:
+    return value.isoformat(timespec="seconds")
+
+
+def _converter(field):
+    if isinstance(field.type_, type) \
+            and issubclass(field.type_, pydantic.BaseModel):
+        convert = Serializer(field.type_).to_dict
+    elif field.type_ is datetime:
+        convert = _isoformat
+    else:
+        convert = None
+
+    if field.shape == SHAPE_LIST:
+        if convert is None:
+            return list
+        return lambda values: [convert(it) for it in values]
+    return convert
+
+
+class Serializer:
+    """
+    Converts rows to dicts shaped like ``schema``, keyed by field alias.
+    Nested schemas are read from attributes of the same name. ``converters``
+    maps field names to functions converting their values instead, for
+    fields with pre validators.
+    """
+
+    def __init__(self, schema, converters=None):
+        converters = converters or {}
+        self.schema = schema
+        self._fields = [
+            (field.alias, field.name,
+             converters.get(field.name) or _converter(field))
+            for field in schema.__fields__.values()
+        ]
+
+    def to_dict(self, obj) -> dict:
+        data = {}
+        for alias, name, convert in self._fields:
+            value = getattr(obj, name)
+            if value is not None and convert is not None:
+                value = convert(value)
+            data[alias] = value
+        return data
+
+
+def _render_search(serializer: Serializer, count, items, next_cursor
+                   ) -> bytes:
+    return dumps({
+        "total_count": count,
+        "items": [serializer.to_dict(it) for it in items],
+        "next_cursor": next_cursor,
+    })
+
+
+def search_response(serializer: Serializer, count, items, next_cursor
+                    ) -> Response:
+    """
+    Rendered search response of ``items``, as returned by ``storage.search``.
+    """
+    return Response(
+        _render_search(serializer, count, items, next_cursor),
+        media_type="application/json",
+    )
+
+
+def cached_search_response(serializer: Serializer, fields, search, db,
+                           filter_request) -> Response:
+    """
+    ``search_response`` of ``search(db, filter_request)``, cached by table
+    and ``compiler.request_key`` of ``filter_request`` until a table of
+    ``fields.models`` is written. Generations are read before searching, a
+    write committed in between only makes the cached response stale early.
+    """
+    key = (fields.model._meta.table_name, compiler.request_key(filter_request))
+    generations = cache.generations(*fields.models)
+    body = cache.results.get(key, generations)
+    if body is cache.results.MISSING:
+        body = _render_search(serializer, *search(db, filter_request))
+        cache.results.set(key, body, generations)
+    return Response(body, media_type="application/json")
+
+
+users = Serializer(UserResponse)
+events = Serializer(EventResponse)
+server_configs = Serializer(ServerConfigResponse)
+personal_bests = Serializer(
+    PersonalBestResponse, converters={"splits": parse_splits}
+)
@@ -0,0 +1,105 @@
+"""
+Opt-in log of SQL statements slower than a threshold, with the query plan
+SQLite chose for them, to find filters and sorts that end up as full scans.
+Statements are timed by ``Database.execute_hooks``, which covers executing
+up to the first row; rows fetched later aren't included.
+"""
+import re
+from collections import deque
+from datetime import datetime
+from typing import Optional
+
+from acc_server_mgr import metrics
+from acc_server_mgr.config import config
+from acc_server_mgr.database import db
+
+# statements EXPLAIN QUERY PLAN applies to
+EXPLAINED = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH", "REPLACE")
+
+_whitespace = re.compile(r"\s+")
+_placeholders = re.compile(r"\?(?:\s*,\s*\?)+")
+
+
+def normalize(sql: str) -> str:
+    """
+    ``sql`` on one line, lists of placeholders, e.g. of ``IN``, collapsed to
+    ``?, ...``, so statements differing in list lengths only are the same.
+    """
+    return _placeholders.sub("?, ...", _whitespace.sub(" ", sql).strip())
+
+
+def params_shape(params) -> list[str]:
+    return [
+        "null" if it is None else type(it).__name__ for it in params or ()
+    ]
+
+
+def _query_plan(db, sql, params) -> list[str]:
+    """
+    EXPLAIN QUERY PLAN of ``sql`` as lines indented by depth, run on the
+    connection of the calling thread, bypassing ``execute_hooks``.
+    """
+    rows = db.connection().execute(
+        "EXPLAIN QUERY PLAN " + sql, params or ()
+    ).fetchall()
+    depths = {0: -1}
+    lines = []
+    for id, parent, _, detail in rows:
+        depths[id] = depths.get(parent, -1) + 1
+        lines.append("  " * depths[id] + detail)
+    return lines
+
+
+class SlowQueryLog:
+    """
+    Last ``size`` statements executed on ``db`` taking at least
+    ``threshold`` seconds, oldest first. Nothing is recorded if
+    ``threshold`` is None.
+    """
+
+    def __init__(self, db, threshold: Optional[float] = None, size=100):
+        self.db = db
+        self.threshold = threshold
+        self.entries = deque(maxlen=size)
+
+    def install(self):
+        if self.threshold is not None \
+                and self.on_execute not in self.db.execute_hooks:
+            self.db.execute_hooks.append(self.on_execute)
+
+    def on_execute(self, sql, params, seconds):
+        if seconds < self.threshold:
+            return
+
+        plan = []
+        if sql.lstrip()[:7].upper().startswith(EXPLAINED):
+            try:
+                plan = _query_plan(self.db, sql, params)
+            except Exception as exc:
+                plan = [f"failed: {exc}"]
+        self.entries.append({
+            "time": datetime.now(),
+            "sql": normalize(sql),
+            "params": params_shape(params),
+            "seconds": seconds,
+            "route": metrics.current_route(),
+            "plan": plan,
+        })
+
+    def items(self) -> list[dict]:
+        return list(self.entries)
+
+    def clear(self):
+        self.entries.clear()
+
+
+def _threshold() -> Optional[float]:
+    value = config.get("database", "slow_query_seconds").strip()
+    return float(value) if value else None
+
+
+slow_queries = SlowQueryLog(
+    db,
+    threshold=_threshold(),
+    size=config.getint("database", "slow_query_log_size"),
+)
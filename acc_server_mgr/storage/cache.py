@@ -0,0 +1,158 @@
+"""
+Generation counters per table, bumped by storage write functions after
+commit. Cached values are stored with the generations of the tables they were
+read from and are stale once any of those changed, invalidating is O(1).
+
+Counters are kept in a memory mapped file next to the database, shared by
+all worker processes, so a write in one worker invalidates the caches of all.
+"""
+import mmap
+import os
+import struct
+import threading
+import zlib
+from collections import OrderedDict
+
+from acc_server_mgr.config import config
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# tables share slots by hash, a collision only invalidates more often
+SLOTS = 256
+_counter = struct.Struct("<Q")
+
+
+class LocalGenerations:
+    """
+    Generation counters of this process only.
+    """
+
+    def __init__(self):
+        self._counters = [0] * SLOTS
+        self._lock = threading.Lock()
+
+    def get(self, slot: int) -> int:
+        return self._counters[slot]
+
+    def increment(self, slots):
+        with self._lock:
+            for slot in slots:
+                self._counters[slot] += 1
+
+
+class SharedGenerations:
+    """
+    Generation counters in the memory mapped file at ``path``. Reads don't
+    lock, increments hold an exclusive ``flock`` on the file, so concurrent
+    increments of processes aren't lost.
+    """
+
+    def __init__(self, path):
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        size = SLOTS * _counter.size
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            if os.fstat(self._fd).st_size < size:
+                os.ftruncate(self._fd, size)
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        self._map = mmap.mmap(self._fd, size)
+        self._lock = threading.Lock()
+
+    def get(self, slot: int) -> int:
+        return _counter.unpack_from(self._map, slot * _counter.size)[0]
+
+    def increment(self, slots):
+        with self._lock:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                for slot in slots:
+                    offset = slot * _counter.size
+                    value = _counter.unpack_from(self._map, offset)[0]
+                    _counter.pack_into(self._map, offset, value + 1)
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+
+def _slot(model) -> int:
+    return zlib.crc32(model._meta.table_name.encode("UTF-8")) % SLOTS
+
+
+def _open_generations():
+    path = config.get("database", "path")
+    if fcntl is None or path == ":memory:":
+        return LocalGenerations()
+    return SharedGenerations(f"{path}-generations")
+
+
+_generations = _open_generations()
+
+
+def generations(*models) -> tuple[int, ...]:
+    """
+    Current generations of the tables of ``models``. Read before reading the
+    value to cache, within the read transaction.
+    """
+    return tuple(_generations.get(_slot(it)) for it in models)
+
+
+def bump(*models):
+    """
+    Invalidate cached values read from the tables of ``models``. Call after
+    commit of writes to these tables.
+    """
+    _generations.increment({_slot(it) for it in models})
+
+
+class LRUCache:
+    """
+    Bounded cache of values tagged with table generations, evicts least
+    recently used entries. Values not read from tables, use no generations.
+    """
+
+    MISSING = object()
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, generations=()):
+        """
+        Value of ``key`` cached with ``generations``, ``MISSING`` otherwise.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != generations:
+                self.misses += 1
+                return self.MISSING
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value, generations=()):
+        with self._lock:
+            self._entries[key] = (generations, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def info(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+        }
+
+
+counts = LRUCache()
+# rendered search responses
+results = LRUCache(maxsize=config.getint("database", "result_cache_size"))
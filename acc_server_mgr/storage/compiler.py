@@ -0,0 +1,264 @@
+"""
+Compiles ``FilterRequest``s to SQL. The shape of a request, filtered fields
+and operators, sort and pagination, without values, is compiled once to a
+parameterized statement kept in an LRU, repeated requests only bind values.
+Fields are checked against a whitelist per model, so requests can't filter
+by e.g. ``password_hash`` or fields that don't exist.
+"""
+import json
+from typing import Optional
+
+from peewee import Expression, OP, SQL, Select, Value, fn
+
+from acc_server_mgr.models.schema import (
+    FilterOperator, PaginationMode, CountStrategy,
+)
+from acc_server_mgr.storage import cache
+from acc_server_mgr.storage.utils import (
+    FilterError, apply_operator, apply_sort, sort_keys, decode_cursor,
+    page_items, seek,
+)
+
+statements = cache.LRUCache(maxsize=256)
+
+
+class Fields:
+    """
+    Fields of ``model`` requests may filter and sort by. ``select`` returns
+    the base query, defaults to all fields of ``model``. ``models`` are the
+    models search results are read from, defaults to ``model``.
+    """
+
+    def __init__(self, model, filterable, sortable, select=None,
+                 models=None):
+        self.model = model
+        self.filterable = frozenset(filterable)
+        self.sortable = frozenset(sortable)
+        self.select = select or model.select
+        self.models = tuple(models or (model,))
+
+    def check(self, filter_request):
+        for field_name, _, _ in filter_request.query:
+            if field_name not in self.filterable:
+                raise FilterError(f"can't filter by {field_name}")
+        for field_name, _ in filter_request.sort:
+            if field_name not in self.sortable:
+                raise FilterError(f"can't sort by {field_name}")
+
+
+class Placeholder:
+    """
+    Parameter of a compiled statement, bound to ``values[name][index]``
+    converted by ``converter``. Values it rejects raise ``FilterError``.
+    """
+    __slots__ = ("name", "index", "converter")
+
+    def __init__(self, name, index=None, converter=None):
+        self.name = name
+        self.index = index
+        self.converter = converter
+
+    def bind(self, values):
+        value = values[self.name]
+        if self.index is not None:
+            value = value[self.index]
+        if self.converter is not None and value is not None:
+            try:
+                value = self.converter(value)
+            except (TypeError, ValueError):
+                raise FilterError(f"invalid {self.name} value {value!r}")
+        return value
+
+
+class Statement:
+    """
+    Compiled ``query``, executed with values bound to its placeholders.
+    Rows are read as ``query`` would read them.
+    """
+
+    def __init__(self, query, sql, params):
+        self.query = query
+        self.sql = sql
+        self.params = params
+
+    def execute(self, db, values):
+        return db.execute_sql(self.sql, [
+            it.bind(values) if isinstance(it, Placeholder) else it
+            for it in self.params
+        ])
+
+    def rows(self, db, values) -> list:
+        return list(self.query._get_cursor_wrapper(self.execute(db, values)))
+
+    def scalar(self, db, values):
+        return self.execute(db, values).fetchone()[0]
+
+
+def _param(name, index=None, converter=None):
+    return Value(Placeholder(name, index, converter), converter=False)
+
+
+def _contains_converter(field):
+    return lambda value: field.db_value("%%%s%%" % value)
+
+
+def _criterion(field, operator, index, is_null):
+    if is_null and operator == FilterOperator.eq:
+        return field.is_null()
+    if is_null and operator == FilterOperator.neq:
+        return field.is_null(False)
+    if operator == FilterOperator.contains:
+        return Expression(
+            field, OP.ILIKE, _param("query", index, _contains_converter(field))
+        )
+    return apply_operator(
+        field, operator, _param("query", index, field.db_value)
+    )
+
+
+def _filtered(fields, terms):
+    query = fields.select()
+    for index, (field_name, operator, is_null) in enumerate(terms):
+        query = query.where(_criterion(
+            getattr(fields.model, field_name), operator, index, is_null
+        ))
+    return query
+
+
+def _compile(db, query, suffix="", suffix_params=()) -> Statement:
+    sql, params = db.get_sql_context().sql(query).query()
+    return Statement(query, sql + suffix, list(params) + list(suffix_params))
+
+
+def _compile_count(db, fields, terms) -> Statement:
+    query = _filtered(fields, terms).order_by().alias("_wrapped")
+    query = query.select(SQL("1"))
+    return _compile(db, Select([query], [fn.COUNT(SQL("1"))]))
+
+
+def _compile_page(db, fields, terms, filter_request, cursor_nulls
+                  ) -> Optional[Statement]:
+    """
+    Statement of the page, None if no row can come after the cursor.
+    """
+    query = apply_sort(_filtered(fields, terms), fields.model, filter_request)
+    if filter_request.pagination != PaginationMode.cursor:
+        return _compile(db, query, " LIMIT ? OFFSET ?", [
+            Placeholder("limit"), Placeholder("offset"),
+        ])
+
+    if cursor_nulls is not None:
+        keys = sort_keys(fields.model, filter_request)
+        criterion = seek(keys, [
+            None if is_null else _param("cursor", index, field.db_value)
+            for index, ((field, _), is_null)
+            in enumerate(zip(keys, cursor_nulls))
+        ])
+        if criterion is None:
+            return None
+        query = query.where(criterion)
+    return _compile(db, query, " LIMIT ?", [Placeholder("limit")])
+
+
+def _query_key(filter_request) -> tuple:
+    return tuple(sorted(
+        json.dumps(term, default=str) for term in filter_request.query
+    ))
+
+
+def request_key(filter_request) -> str:
+    """
+    Canonical form of ``filter_request``, equal for requests of the same
+    page. Filter terms are combined by AND, so their order doesn't matter,
+    ``page`` is ignored in cursor pagination and ``cursor`` in offset
+    pagination.
+    """
+    by_cursor = filter_request.pagination == PaginationMode.cursor
+    return json.dumps([
+        _query_key(filter_request),
+        filter_request.sort,
+        filter_request.pagination,
+        filter_request.items_per_page,
+        (filter_request.cursor or None) if by_cursor
+        else max((filter_request.page or 0) - 1, 0),
+        filter_request.count,
+    ], default=str)
+
+
+def _cached(key, compile_):
+    statement = statements.get(key)
+    if statement is statements.MISSING:
+        statement = compile_()
+        statements.set(key, statement)
+    return statement
+
+
+def _count(db, fields, terms, filter_request, values) -> Optional[int]:
+    """
+    Count rows matching ``filter_request`` by ``filter_request.count``.
+    Cached counts are keyed by table and the normalized filter terms, and
+    are invalidated by ``cache.bump`` of the table. Must be the first read of
+    the transaction, so a cached count is never older than its generation.
+    """
+    if filter_request.count == CountStrategy.none:
+        return None
+
+    statement = _cached(
+        ("count", fields, terms),
+        lambda: _compile_count(db, fields, terms)
+    )
+    if filter_request.count == CountStrategy.exact:
+        return statement.scalar(db, values)
+
+    key = (fields.model._meta.table_name, _query_key(filter_request))
+    generations = cache.generations(fields.model)
+    count = cache.counts.get(key, generations)
+    if count is cache.counts.MISSING:
+        count = statement.scalar(db, values)
+        cache.counts.set(key, count, generations)
+    return count
+
+
+def search(db, fields: Fields, filter_request
+           ) -> tuple[Optional[int], list, Optional[str]]:
+    """
+    Count of rows matching ``filter_request``, rows of the requested page
+    and cursor of the next page. Call within ``db.atomic()``, so count and
+    page are read from one snapshot.
+    """
+    fields.check(filter_request)
+    # comparing to null compiles to IS NULL, so it's part of the shape
+    terms = tuple(
+        (field_name, operator, value is None)
+        for field_name, operator, value in filter_request.query
+    )
+    values = {
+        "query": [value for _, _, value in filter_request.query],
+        "limit": filter_request.items_per_page,
+        "offset": max((filter_request.page or 0) - 1, 0)
+        * filter_request.items_per_page,
+    }
+    cursor_nulls = None
+    if filter_request.pagination == PaginationMode.cursor:
+        values["limit"] += 1
+        if filter_request.cursor:
+            values["cursor"] = decode_cursor(filter_request.cursor)
+            if len(values["cursor"]) != len(
+                sort_keys(fields.model, filter_request)
+            ):
+                raise FilterError("cursor doesn't match sort")
+            cursor_nulls = tuple(it is None for it in values["cursor"])
+
+    count = _count(db, fields, terms, filter_request, values)
+    statement = _cached(
+        (
+            "page", fields, terms, tuple(filter_request.sort),
+            filter_request.pagination, cursor_nulls,
+        ),
+        lambda: _compile_page(
+            db, fields, terms, filter_request, cursor_nulls
+        )
+    )
+    rows = [] if statement is None else statement.rows(db, values)
+    items, next_cursor = page_items(fields.model, filter_request, rows)
+    return count, items, next_cursor
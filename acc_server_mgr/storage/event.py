@@ -1,17 +1,31 @@
 from datetime import datetime
 from typing import Optional
 
-from peewee import prefetch
+from peewee import prefetch, chunked
 
-from acc_server_mgr.storage.utils import apply_filter, apply_sort
+from acc_server_mgr import render
+from acc_server_mgr.storage import cache, compiler
+from acc_server_mgr.storage.utils import (
+    inserted_ids, insert_chunk, check_version,
+)
 from acc_server_mgr.models.db import (
     Event as EventModel,
     Session as SessionModel,
+    ServerConfig as ServerConfigModel,
 )
 from acc_server_mgr.models.schema import (
     FilterRequest, EventCreateRequest, EventUpdateRequest,
 )
 
+CHUNK_SIZE = 100
+
+FIELDS = compiler.Fields(
+    EventModel,
+    filterable=EventModel._meta.sorted_field_names,
+    sortable=EventModel._meta.sorted_field_names,
+    models=[EventModel, SessionModel],
+)
+
 
 def _load_event(_id):
     event_query = EventModel.select(EventModel).where(EventModel.id == _id).limit(1)
@@ -21,70 +35,190 @@ def _load_event(_id):
         return result
 
 
+def _session_rows(event_id, sessions, created):
+    for session in sessions:
+        yield {
+            **session.dict(exclude={"id"}),
+            "event": event_id,
+            "created": created,
+        }
+
+
+def _insert_sessions(rows):
+    for chunk in chunked(rows, CHUNK_SIZE):
+        SessionModel.insert_many(chunk).execute()
+
+
 def create_one(db, data: EventCreateRequest) -> EventModel:
-    with db:
+    def create():
+        created = datetime.now()
         event_data = data.dict(exclude_unset=True)
         event_data.pop("sessions")
-        event_obj = EventModel(**event_data, created=datetime.now())
-        event_obj.save()
-        for session in data.sessions:
-            SessionModel(
-                **session.dict(exclude_unset=True),
-                event=event_obj,
-                created=datetime.now()
-            ).save()
+        event_obj = EventModel.create(**event_data, created=created)
+        _insert_sessions(_session_rows(event_obj.id, data.sessions, created))
         return event_obj
 
+    event_obj = db.write(create)
+    cache.bump(EventModel, SessionModel)
+    return event_obj
+
+
+def _insert_events(items: list[EventCreateRequest]) -> range:
+    created = datetime.now()
+    last_id = EventModel.insert_many([
+        {**it.dict(exclude={"sessions"}), "created": created} for it in items
+    ]).execute()
+    ids = inserted_ids(last_id, len(items))
+    _insert_sessions(
+        row for event_id, item in zip(ids, items)
+        for row in _session_rows(event_id, item.sessions, created)
+    )
+    return ids
+
+
+def create_many(db, items: list[EventCreateRequest]) -> list:
+    """
+    Insert events with their sessions in chunks of ``CHUNK_SIZE``, one
+    transaction per chunk. Returns per item the id of the new event or the
+    ``IntegrityError`` it was rejected with.
+    """
+    results = []
+    for chunk in chunked(items, CHUNK_SIZE):
+        results += db.write(lambda: insert_chunk(db, _insert_events, chunk))
+    cache.bump(EventModel, SessionModel)
+    return results
+
 
 def get_one(db, _id: int) -> Optional[EventModel]:
-    with db:
+    with db.atomic():
         return _load_event(_id)
 
 
-def update_one(db, _id: int, data: EventUpdateRequest) -> Optional[EventModel]:
-    with db:
-        obj = _load_event(_id)
+def version(obj: EventModel) -> tuple:
+    """
+    Version of ``obj``, changes with every write of the event or its
+    sessions. Includes ``created``, so a row reusing the id of a deleted row
+    has another version.
+    """
+    return obj.created, obj.version
+
+
+def _get_version(_id):
+    return EventModel.select(EventModel.created, EventModel.version) \
+        .where(EventModel.id == _id).tuples().first()
+
+
+def get_version(db, _id: int) -> Optional[tuple]:
+    """
+    Version of event ``_id`` by primary key lookup, None if it doesn't
+    exist.
+    """
+    with db.atomic():
+        return _get_version(_id)
+
+
+def _update_sessions(event_id, sessions):
+    """
+    Make ``sessions`` the sessions of ``event_id`` in a constant number of
+    statements. Sessions with the id of a session of the event update it,
+    others are inserted, sessions of the event not in ``sessions`` are
+    deleted.
+    """
+    current = {
+        it.id: it for it in
+        SessionModel.select().where(SessionModel.event == event_id)
+    }
+    updated = []
+    fields = set()
+    inserted = []
+    for session in sessions:
+        obj = current.get(session.id)
         if obj is None:
-            return None
-
-        event_data = data.dict(exclude_unset=True)
-        event_data.pop("sessions")
-        for attr, value in event_data.items():
+            inserted.append(session)
+            continue
+        session_data = session.dict(exclude_unset=True, exclude={"id"})
+        for attr, value in session_data.items():
             setattr(obj, attr, value)
-
-        updated_session_ids = []
-
-        for session in data.sessions:
-            if session.id is not None:
-                updated_session_ids.append(session.id)
-            SessionModel(
-                **session.dict(exclude_unset=True),
-                event=obj,
-                created=datetime.now()
-            ).save()
-
-
-        for session in obj.sessions:
-            if session.id not in updated_session_ids:
-                session.delete_instance()
-
-        obj.save()
-        return _load_event(obj.id)
+        if session_data:
+            obj.version += 1
+        fields.update(session_data)
+        updated.append(obj)
+
+    if updated and fields:
+        SessionModel.bulk_update(updated, [
+            getattr(SessionModel, it) for it in sorted(fields | {"version"})
+        ])
+    SessionModel.delete().where(
+        (SessionModel.event == event_id)
+        & SessionModel.id.not_in([it.id for it in updated])
+    ).execute()
+    _insert_sessions(_session_rows(event_id, inserted, datetime.now()))
+
+
+def update_one(db, _id: int, data: EventUpdateRequest, expected=None
+               ) -> Optional[EventModel]:
+    """
+    Update event ``_id`` and its sessions, if ``expected`` accepts its
+    version, see ``check_version``. Sessions are left as they are unless
+    ``data`` has sessions.
+    """
+    def update():
+        if check_version(_get_version(_id), expected) is None:
+            return False
+        event_data = data.dict(exclude_unset=True)
+        event_data.pop("sessions", None)
+        EventModel.update(**event_data, version=EventModel.version + 1) \
+            .where(EventModel.id == _id).execute()
+        if data.sessions is not None:
+            _update_sessions(_id, data.sessions)
+        return True
+
+    if not db.write(update):
+        return None
+    cache.bump(EventModel, SessionModel)
+    render.invalidate_event(_id)
+    with db.atomic():
+        return _load_event(_id)
 
 
-def delete_one(db, _id: int):
-    with db:
-        SessionModel.delete().where(SessionModel.event_id == _id)
-        EventModel.delete().where(EventModel.id == _id)
+def delete_one(db, _id: int) -> bool:
+    """
+    Delete event ``_id`` with its sessions. Returns False, deleting nothing,
+    if a server config uses the event.
+    """
+    def delete():
+        if ServerConfigModel.select() \
+                .where(ServerConfigModel.event == _id).exists():
+            return False
+        SessionModel.delete().where(SessionModel.event == _id).execute()
+        EventModel.delete().where(EventModel.id == _id).execute()
+        return True
+
+    if not db.write(delete):
+        return False
+    cache.bump(EventModel, SessionModel)
+    render.invalidate_event(_id)
+    return True
+
+
+def attach_sessions(events: list[EventModel]):
+    """
+    Load sessions of ``events`` with one query, as ``prefetch`` would.
+    """
+    by_id = {}
+    for event in events:
+        event.sessions = []
+        by_id[event.id] = event
+    if not by_id:
+        return
+    query = SessionModel.select(SessionModel) \
+        .where(SessionModel.event.in_(list(by_id)))
+    for session in query:
+        by_id[session.event_id].sessions.append(session)
 
 
 def search(db, filter_: FilterRequest):
-    with db:
-        event_query = EventModel.select(EventModel)
-        session_query = SessionModel.select(SessionModel)
-        event_query = apply_filter(event_query, EventModel, filter_)
-        event_query = apply_sort(event_query, EventModel, filter_)
-        return event_query.count(), prefetch(
-            event_query.paginate(filter_.page, filter_.items_per_page),
-            session_query
-        )
+    with db.atomic():
+        count, items, next_cursor = compiler.search(db, FIELDS, filter_)
+        attach_sessions(items)
+        return count, items, next_cursor
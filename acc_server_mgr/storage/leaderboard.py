@@ -0,0 +1,47 @@
+from typing import Optional
+
+from acc_server_mgr.storage import compiler
+from acc_server_mgr.models.db import (
+    PersonalBest as PersonalBestModel,
+    Driver as DriverModel,
+)
+from acc_server_mgr.models.schema import FilterRequest, SortingDir
+
+
+def _select():
+    return PersonalBestModel.select(PersonalBestModel, DriverModel) \
+        .join(DriverModel)
+
+
+FIELDS = compiler.Fields(
+    PersonalBestModel,
+    filterable=[
+        "id", "track", "car_group", "driver", "lap_time", "car_model",
+        "session_result", "achieved",
+    ],
+    sortable=[
+        "id", "track", "car_group", "driver", "lap_time", "car_model",
+        "achieved",
+    ],
+    select=_select,
+    models=[PersonalBestModel, DriverModel],
+)
+
+
+def get_one(db, _id: int) -> Optional[PersonalBestModel]:
+    with db.atomic():
+        return _select().where(PersonalBestModel.id == _id).first()
+
+
+def search(db, filter_: FilterRequest):
+    """
+    Personal bests matching ``filter_``, fastest first unless sorted
+    otherwise. Filtering by ``track`` and ``car_group`` reads the page from
+    the (track, car_group, lap_time) index.
+    """
+    if not filter_.sort:
+        filter_ = filter_.copy(update={
+            "sort": [("lap_time", SortingDir.asc)]
+        })
+    with db.atomic():
+        return compiler.search(db, FIELDS, filter_)
@@ -0,0 +1,48 @@
+import time
+from typing import Optional
+
+from acc_server_mgr.models.db import SupervisorLease as LeaseModel
+
+LEASE_ID = 1
+
+
+def get(db) -> Optional[LeaseModel]:
+    with db.atomic():
+        return LeaseModel.get_or_none(LeaseModel.id == LEASE_ID)
+
+
+def acquire(db, owner: str, address: str, secret: str, ttl: float,
+            replace: Optional[str] = None) -> LeaseModel:
+    """
+    Take or renew the lease for ``owner`` for ``ttl`` seconds, if there is
+    none, it expired, ``owner`` or ``replace`` holds it. Returns the lease
+    as committed, held by ``owner`` or the current holder.
+    """
+    def take():
+        now = time.time()
+        lease = LeaseModel.get_or_none(LeaseModel.id == LEASE_ID)
+        if lease is None:
+            lease = LeaseModel(id=LEASE_ID)
+            force_insert = True
+        elif lease.owner in (owner, replace) or lease.expires < now:
+            force_insert = False
+        else:
+            return lease
+        lease.owner = owner
+        lease.address = address
+        lease.secret = secret
+        lease.expires = now + ttl
+        lease.save(force_insert=force_insert)
+        return lease
+
+    return db.write(take)
+
+
+def release(db, owner: str):
+    """
+    Expire the lease if ``owner`` holds it, so another worker takes it over
+    without waiting for expiry.
+    """
+    db.write(LeaseModel.update(expires=0).where(
+        (LeaseModel.id == LEASE_ID) & (LeaseModel.owner == owner)
+    ).execute)
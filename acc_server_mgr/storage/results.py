@@ -0,0 +1,251 @@
+from datetime import datetime
+from typing import Optional
+
+from peewee import chunked, Case, EXCLUDED
+
+from acc_server_mgr.storage import cache
+from acc_server_mgr.models.db import (
+    Driver as DriverModel,
+    SessionResult as SessionResultModel,
+    SessionResultLine as SessionResultLineModel,
+    Lap as LapModel,
+    ResultCheckpoint as ResultCheckpointModel,
+    PersonalBest as PersonalBestModel,
+    ServerConfig as ServerConfigModel,
+)
+
+# ACC uses max int32 for "no time"
+NO_TIME = 2147483647
+CHUNK_SIZE = 200
+
+
+def _time(value) -> Optional[int]:
+    if value is None or value >= NO_TIME:
+        return None
+    return value
+
+
+def get_checkpoint(db, server_config_id: int) -> Optional[str]:
+    with db.atomic():
+        checkpoint = ResultCheckpointModel.get_or_none(
+            ResultCheckpointModel.server_config == server_config_id
+        )
+        return checkpoint.last_file if checkpoint else None
+
+
+def _set_checkpoint(server_config_id: int, file_name: str):
+    ResultCheckpointModel.insert(
+        server_config=server_config_id,
+        last_file=file_name,
+        updated=datetime.now(),
+    ).on_conflict(
+        conflict_target=[ResultCheckpointModel.server_config],
+        preserve=[
+            ResultCheckpointModel.last_file,
+            ResultCheckpointModel.updated,
+        ],
+    ).execute()
+
+
+def set_checkpoint(db, server_config_id: int, file_name: str):
+    db.write(lambda: _set_checkpoint(server_config_id, file_name))
+    cache.bump(ResultCheckpointModel)
+
+
+def _upsert_drivers(drivers: dict) -> dict[str, int]:
+    """
+    Insert or update ``drivers`` by player id, returns row ids by player id.
+    """
+    driver_ids = {}
+    for chunk in chunked(drivers.values(), CHUNK_SIZE):
+        DriverModel.insert_many([
+            {
+                "player_id": it["playerId"],
+                "first_name": it.get("firstName", ""),
+                "last_name": it.get("lastName", ""),
+                "short_name": it.get("shortName", ""),
+            }
+            for it in chunk
+        ]).on_conflict(
+            conflict_target=[DriverModel.player_id],
+            preserve=[
+                DriverModel.first_name,
+                DriverModel.last_name,
+                DriverModel.short_name,
+            ],
+        ).execute()
+        query = DriverModel.select(DriverModel.id, DriverModel.player_id) \
+            .where(DriverModel.player_id.in_([it["playerId"] for it in chunk]))
+        for row in query.tuples():
+            driver_ids[row[1]] = row[0]
+    return driver_ids
+
+
+def _line_rows(session_result_id, lines, driver_ids):
+    for position, line in enumerate(lines, 1):
+        car = line["car"]
+        current_driver = line.get("currentDriver") or {}
+        timing = line.get("timing", {})
+        yield {
+            "session_result": session_result_id,
+            "position": position,
+            "car_id": car["carId"],
+            "race_number": car.get("raceNumber", 0),
+            "car_model": car.get("carModel", 0),
+            "car_group": car.get("carGroup"),
+            "cup_category": car.get("cupCategory", 0),
+            "team_name": car.get("teamName", ""),
+            "driver": driver_ids.get(current_driver.get("playerId")),
+            "best_lap": _time(timing.get("bestLap")),
+            "total_time": _time(timing.get("totalTime")),
+            "lap_count": timing.get("lapCount", 0),
+        }
+
+
+def _car_group(car, default):
+    return car.get("carGroup") or default
+
+
+def _lap_rows(session_result_id, laps, cars, driver_ids, default_car_group):
+    for lap in laps:
+        car = cars.get(lap["carId"])
+        if car is None:
+            continue
+        try:
+            player_id = car["drivers"][lap["driverIndex"]]["playerId"]
+        except (IndexError, KeyError):
+            continue
+        lap_time = _time(lap.get("laptime"))
+        if lap_time is None:
+            continue
+        yield {
+            "session_result": session_result_id,
+            "driver": driver_ids[player_id],
+            "car_id": lap["carId"],
+            "car_model": car.get("carModel"),
+            "car_group": _car_group(car, default_car_group),
+            "lap_time": lap_time,
+            "splits": ",".join(str(it) for it in lap.get("splits", [])),
+            "is_valid_for_best": lap.get("isValidForBest", False),
+        }
+
+
+def _personal_best_rows(session_result, lap_rows):
+    """
+    Best valid lap per driver and car group of ``lap_rows``.
+    """
+    bests = {}
+    for lap in lap_rows:
+        key = (lap["driver"], lap["car_group"] or "")
+        best = bests.get(key)
+        if best is None:
+            best = bests[key] = {
+                "track": session_result.track,
+                "car_group": key[1],
+                "driver": key[0],
+                "lap_time": None,
+                "splits": "",
+                "car_model": None,
+                "session_result": session_result.id,
+                "achieved": session_result.created,
+            }
+        if lap["is_valid_for_best"] and (
+            best["lap_time"] is None or lap["lap_time"] < best["lap_time"]
+        ):
+            best["lap_time"] = lap["lap_time"]
+            best["splits"] = lap["splits"]
+            best["car_model"] = lap["car_model"]
+    return [it for it in bests.values() if it["lap_time"] is not None]
+
+
+def _keep_best(field):
+    """
+    Upsert expression updating ``field`` only if the inserted lap is faster.
+    """
+    return Case(None, [(
+        EXCLUDED.lap_time < PersonalBestModel.lap_time,
+        getattr(EXCLUDED, field.column_name)
+    )], field)
+
+
+def update_personal_bests(session_result, lap_rows):
+    """
+    Merge best laps of ``lap_rows`` into personal bests, one upsert per chunk.
+    """
+    for chunk in chunked(_personal_best_rows(session_result, lap_rows),
+                         CHUNK_SIZE):
+        PersonalBestModel.insert_many(chunk).on_conflict(
+            conflict_target=[
+                PersonalBestModel.track,
+                PersonalBestModel.car_group,
+                PersonalBestModel.driver,
+            ],
+            update={
+                PersonalBestModel.splits: _keep_best(PersonalBestModel.splits),
+                PersonalBestModel.car_model:
+                    _keep_best(PersonalBestModel.car_model),
+                PersonalBestModel.session_result:
+                    _keep_best(PersonalBestModel.session_result),
+                PersonalBestModel.achieved:
+                    _keep_best(PersonalBestModel.achieved),
+                PersonalBestModel.lap_time:
+                    _keep_best(PersonalBestModel.lap_time),
+            },
+        ).execute()
+
+
+def ingest(db, server_config_id: int, file_name: str, result: dict
+           ) -> SessionResultModel:
+    """
+    Insert session result, leaderboard lines, drivers and laps of a parsed
+    result file, update personal bests and advance the checkpoint of
+    ``server_config_id`` to ``file_name``, in one transaction.
+    """
+    session = result.get("sessionResult", {})
+    lines = session.get("leaderBoardLines", [])
+    cars = {line["car"]["carId"]: line["car"] for line in lines}
+    drivers = {
+        driver["playerId"]: driver
+        for car in cars.values()
+        for driver in car.get("drivers", [])
+    }
+
+    def write():
+        server_config = ServerConfigModel.get_or_none(
+            ServerConfigModel.id == server_config_id
+        )
+        default_car_group = server_config and server_config.settings_car_group
+        session_result = SessionResultModel.create(
+            server_config=server_config_id,
+            file_name=file_name,
+            created=datetime.now(),
+            session_type=result.get("sessionType", ""),
+            track=result.get("trackName", ""),
+            server_name=result.get("serverName", ""),
+            session_index=result.get("sessionIndex", 0),
+            race_weekend_index=result.get("raceWeekendIndex", 0),
+            meta_data=result.get("metaData", ""),
+            is_wet_session=bool(session.get("isWetSession", 0)),
+            best_lap=_time(session.get("bestlap")),
+        )
+        driver_ids = _upsert_drivers(drivers)
+        for chunk in chunked(
+            _line_rows(session_result.id, lines, driver_ids), CHUNK_SIZE
+        ):
+            SessionResultLineModel.insert_many(chunk).execute()
+        lap_rows = list(_lap_rows(
+            session_result.id, result.get("laps", []), cars, driver_ids,
+            default_car_group
+        ))
+        for chunk in chunked(lap_rows, CHUNK_SIZE):
+            LapModel.insert_many(chunk).execute()
+        update_personal_bests(session_result, lap_rows)
+        _set_checkpoint(server_config_id, file_name)
+        return session_result
+
+    session_result = db.write(write)
+    cache.bump(
+        DriverModel, SessionResultModel, SessionResultLineModel, LapModel,
+        PersonalBestModel, ResultCheckpointModel,
+    )
+    return session_result
@@ -1,50 +1,262 @@
 from datetime import datetime
+from typing import Optional
 
-from acc_server_mgr.storage.utils import apply_filter
+from peewee import JOIN, chunked
+
+from acc_server_mgr import render
+from acc_server_mgr.storage import cache, compiler
+from acc_server_mgr.storage.event import attach_sessions
+from acc_server_mgr.storage.utils import (
+    apply_filter, inserted_ids, insert_chunk, check_version, save_versioned,
+)
 from acc_server_mgr.models.schema import (
     ServerConfig,
     ServerConfigUpdate, FilterRequest,
 )
-from acc_server_mgr.models.db import ServerConfig as ServerConfigModel
+from acc_server_mgr.models.db import (
+    ServerConfig as ServerConfigModel,
+    Event as EventModel,
+    Session as SessionModel,
+    SessionResult as SessionResultModel,
+    ResultCheckpoint as ResultCheckpointModel,
+)
+
+CHUNK_SIZE = 100
+
+# passwords must not be guessable by filtering
+_FIELD_NAMES = [
+    it for it in ServerConfigModel._meta.sorted_field_names
+    if not it.endswith("password")
+]
+FIELDS = compiler.Fields(
+    ServerConfigModel,
+    filterable=_FIELD_NAMES,
+    sortable=_FIELD_NAMES,
+    models=[ServerConfigModel, EventModel, SessionModel],
+)
 
 
 def create_one(db, data: ServerConfig) -> ServerConfigModel:
-    with db:
-        obj = ServerConfigModel(
+    def create():
+        return ServerConfigModel.create(
             **data.dict(),
             created=datetime.now()
         )
-        obj.save()
-        return obj
+
+    obj = db.write(create)
+    cache.bump(ServerConfigModel)
+    return obj
+
+
+def _insert(items: list[ServerConfig]) -> range:
+    created = datetime.now()
+    last_id = ServerConfigModel.insert_many([
+        {**it.dict(), "created": created} for it in items
+    ]).execute()
+    return inserted_ids(last_id, len(items))
+
+
+def create_many(db, items: list[ServerConfig]) -> list:
+    """
+    Insert server configs in chunks of ``CHUNK_SIZE``, one transaction per
+    chunk. Returns per item the id of the new row or the ``IntegrityError``
+    it was rejected with.
+    """
+    results = []
+    for chunk in chunked(items, CHUNK_SIZE):
+        results += db.write(lambda: insert_chunk(db, _insert, chunk))
+    cache.bump(ServerConfigModel)
+    return results
 
 
 def get_one(db, _id: int) -> ServerConfigModel:
-    with db:
+    with db.atomic():
         return ServerConfigModel.get_or_none(ServerConfigModel.id == _id)
 
 
-def update_one(db, _id: int, data: ServerConfigUpdate) -> ServerConfigModel:
-    with db:
-        obj = ServerConfigModel.get_or_none(ServerConfigModel.id == _id)
-        if obj:
-            for attr, value in data.dict().items():
-                setattr(obj, attr, value)
+def version(obj: ServerConfigModel) -> tuple:
+    """
+    Version of ``obj`` and of its event, changes with every write of either.
+    Includes ``created``, so a row reusing the id of a deleted row has
+    another version.
+    """
+    return (
+        obj.created, obj.version,
+        obj.event.version if obj.event_id is not None else None,
+    )
+
+
+def _get_version(_id):
+    return ServerConfigModel.select(
+        ServerConfigModel.created, ServerConfigModel.version,
+        EventModel.version,
+    ).join(EventModel, JOIN.LEFT_OUTER) \
+        .where(ServerConfigModel.id == _id).tuples().first()
+
+
+def get_version(db, _id: int) -> Optional[tuple]:
+    """
+    Version of row ``_id`` by primary key lookup, None if it doesn't exist.
+    """
+    with db.atomic():
+        return _get_version(_id)
+
+
+def update_one(db, _id: int, data: ServerConfigUpdate, expected=None
+               ) -> ServerConfigModel:
+    """
+    Update row ``_id``, if ``expected`` accepts its version, see
+    ``check_version``.
+    """
+    def update():
+        if check_version(_get_version(_id), expected) is None:
+            return None
+        obj = ServerConfigModel.get(ServerConfigModel.id == _id)
+        for attr, value in data.dict(exclude_unset=True).items():
+            setattr(obj, attr, value)
+        save_versioned(obj)
         return obj
 
+    obj = db.write(update)
+    cache.bump(ServerConfigModel)
+    render.invalidate(_id)
+    return obj
+
 
 def delete_one(db, _id: int):
-    with db:
-        ServerConfigModel.delete().where(ServerConfigModel.id == _id)
+    db.write(
+        ServerConfigModel.delete().where(ServerConfigModel.id == _id).execute
+    )
+    # foreign keys of results and checkpoints are set null or cascade
+    cache.bump(ServerConfigModel, SessionResultModel, ResultCheckpointModel)
+    render.invalidate(_id)
 
 
-def search(db, filter_: FilterRequest):
-    with db:
+def get_many(db, ids: Optional[list[int]] = None,
+             filter_: Optional[FilterRequest] = None
+             ) -> list[ServerConfigModel]:
+    """
+    Rows with ``ids`` and matching ``filter_``, not paginated.
+    """
+    with db.atomic():
         query = ServerConfigModel.select()
-        apply_filter(query, ServerConfigModel, filter_)
-        return query.count(), list(query)
+        if ids is not None:
+            query = query.where(ServerConfigModel.id.in_(ids))
+        if filter_ is not None:
+            FIELDS.check(filter_)
+            query = apply_filter(query, ServerConfigModel, filter_)
+        return list(query)
+
+
+def _attach_events(items: list[ServerConfigModel]):
+    """
+    Load events of ``items`` and their sessions with two queries, instead of
+    two per item when serializing.
+    """
+    event_ids = {it.event_id for it in items if it.event_id is not None}
+    if not event_ids:
+        return
+    events = {
+        it.id: it for it in
+        EventModel.select().where(EventModel.id.in_(list(event_ids)))
+    }
+    attach_sessions(list(events.values()))
+    for item in items:
+        if item.event_id in events:
+            item.event = events[item.event_id]
+
+
+def search(db, filter_: FilterRequest):
+    with db.atomic():
+        count, items, next_cursor = compiler.search(db, FIELDS, filter_)
+        _attach_events(items)
+        return count, items, next_cursor
 
 
 def update_obj(db, obj: ServerConfigModel):
-    with db:
-        obj.save()
-        return obj
+    db.write(lambda: save_versioned(obj))
+    cache.bump(ServerConfigModel)
+    render.invalidate(obj.id)
+    return obj
+
+
+def get_process_ids(db) -> dict[int, int]:
+    """
+    ``process_id`` of running instances by row id.
+    """
+    with db.atomic():
+        return dict(
+            ServerConfigModel.select(
+                ServerConfigModel.id, ServerConfigModel.process_id
+            ).where(
+                (ServerConfigModel.process_is_running == True)
+                & ServerConfigModel.process_id.is_null(False)
+            ).tuples()
+        )
+
+
+def get_running_processes(db) -> dict[int, tuple[int, datetime]]:
+    """
+    ``process_id`` and ``process_last_start`` of running instances by row
+    id.
+    """
+    with db.atomic():
+        return {
+            _id: (process_id, last_start)
+            for _id, process_id, last_start in ServerConfigModel.select(
+                ServerConfigModel.id, ServerConfigModel.process_id,
+                ServerConfigModel.process_last_start,
+            ).where(
+                (ServerConfigModel.process_is_running == True)
+                & ServerConfigModel.process_id.is_null(False)
+            ).tuples()
+        }
+
+
+def update_process_info(db, _id: int, **process_info):
+    """
+    Update ``process_*`` house keeping fields of row ``_id`` without loading
+    it.
+    """
+    db.write(ServerConfigModel.update(
+        **process_info, version=ServerConfigModel.version + 1
+    ).where(
+        ServerConfigModel.id == _id
+    ).execute)
+    cache.bump(ServerConfigModel)
+
+
+def update_process_info_many(db, process_infos: dict[int, dict]):
+    """
+    Update ``process_*`` house keeping fields of many rows in one transaction,
+    ``process_infos`` maps row id to fields.
+    """
+    if not process_infos:
+        return
+
+    def update():
+        for _id, process_info in process_infos.items():
+            ServerConfigModel.update(
+                **process_info, version=ServerConfigModel.version + 1
+            ).where(
+                ServerConfigModel.id == _id
+            ).execute()
+
+    db.write(update)
+    cache.bump(ServerConfigModel)
+
+
+def reset_process_info(db, exclude=()):
+    """
+    Mark all rows, except ``exclude`` ids, as not running.
+    """
+    db.write(ServerConfigModel.update(
+        process_is_running=False,
+        process_last_stop=datetime.now(),
+        process_id=None,
+        version=ServerConfigModel.version + 1,
+    ).where(
+        (ServerConfigModel.process_is_running == True)
+        & ServerConfigModel.id.not_in(list(exclude))
+    ).execute)
+    cache.bump(ServerConfigModel)
@@ -1,72 +1,120 @@
 import logging
 from datetime import datetime
 from hashlib import sha512
+from typing import Optional
 
-from acc_server_mgr.storage.utils import apply_filter
+from acc_server_mgr import token_cache
+from acc_server_mgr.storage import cache, compiler
+from acc_server_mgr.storage.utils import check_version, save_versioned
 from acc_server_mgr.models.schema import UserCreate, UserUpdate, FilterRequest
 from acc_server_mgr.models.db import User as UserModel
 
 
 log = logging.getLogger(__name__)
 
+FIELDS = compiler.Fields(
+    UserModel,
+    filterable=["id", "mail", "is_enabled", "created", "last_login", "scopes"],
+    sortable=["id", "mail", "is_enabled", "created", "last_login"],
+)
+
 
 def hash_password(value):
     return sha512(value.encode("UTF-8")).hexdigest()
 
 
 def create_one(db, user: UserCreate) -> UserModel:
-    with db:
+    def create():
         data = user.dict()
         data["password_hash"] = hash_password(data.pop("password"))
-        new_user = UserModel(**data, created=datetime.now())
-        new_user.save()
-        return new_user
+        return UserModel.create(**data, created=datetime.now())
+
+    new_user = db.write(create)
+    cache.bump(UserModel)
+    return new_user
 
 
 def get_one(db, _id: int) -> UserModel:
-    with db:
+    with db.atomic():
         return UserModel.get_or_none(UserModel.id == _id)
 
 
+def version(obj: UserModel) -> tuple:
+    """
+    Version of ``obj``, changes with every write. Includes ``created``, so
+    a row reusing the id of a deleted row has another version.
+    """
+    return obj.created, obj.version
+
+
+def get_version(db, _id: int) -> Optional[tuple]:
+    """
+    Version of row ``_id`` by primary key lookup, None if it doesn't exist.
+    """
+    with db.atomic():
+        return UserModel.select(UserModel.created, UserModel.version) \
+            .where(UserModel.id == _id).tuples().first()
+
+
 def get_one_by(db, **kwargs):
-    with db:
+    with db.atomic():
         return UserModel.get_or_none(**kwargs)
 
 
-def update_one(db, _id: int, user: UserUpdate) -> UserModel:
-    with db:
+def update_one(db, _id: int, user: UserUpdate, expected=None) -> UserModel:
+    """
+    Update row ``_id``, if ``expected`` accepts its version, see
+    ``check_version``.
+    """
+    def update():
         user_obj = UserModel.get_or_none(UserModel.id == _id)
         if user_obj:
-            data = user.dict()
-            if "password" in data:
-                data["password_hash"] = hash_password(data.pop("password"))
+            check_version(version(user_obj), expected)
+            data = user.dict(exclude_unset=True)
+            data.pop("password_confirm", None)
+            password = data.pop("password", None)
+            if password:
+                data["password_hash"] = hash_password(password)
             for attr, value in data.items():
                 setattr(user_obj, attr, value)
-            user_obj.save()
+            save_versioned(user_obj)
         return user_obj
 
+    user_obj = db.write(update)
+    cache.bump(UserModel)
+    token_cache.tokens.evict_user(_id)
+    return user_obj
+
 
 def delete_one(db, _id: int):
-    with db:
-        UserModel.delete().where(UserModel.id == _id)
+    db.write(UserModel.delete().where(UserModel.id == _id).execute)
+    cache.bump(UserModel)
+    token_cache.tokens.evict_user(_id)
 
 
 def find_by_credentials(db, credentials) -> UserModel:
-    with db:
+    with db.atomic():
         password_hash = hash_password(credentials.password)
         query = UserModel.select().where(
             (UserModel.mail == credentials.username)
             & (UserModel.password_hash == password_hash)
         ).limit(1)
         user_obj = query.first()
-        if user_obj:
-            user_obj.last_login = datetime.now()
-            user_obj.save()
-            return user_obj
-
-
-def search(db, filter_: FilterRequest) -> tuple[int, list[UserModel]]:
-    with db:
-        query = UserModel.select()
-        query = apply_filter(query, UserModel, filter_)
-        return query.count(), list(query)
+    if user_obj is None:
+        return None
+
+    user_obj.last_login = datetime.now()
+    db.write(UserModel.update(
+        last_login=user_obj.last_login,
+        version=UserModel.version + 1,
+    ).where(
+        UserModel.id == user_obj.id
+    ).execute)
+    cache.bump(UserModel)
+    return user_obj
+
+
+def search(db, filter_: FilterRequest
+           ) -> tuple[Optional[int], list[UserModel], Optional[str]]:
+    with db.atomic():
+        return compiler.search(db, FIELDS, filter_)
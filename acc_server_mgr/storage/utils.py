@@ -1,6 +1,27 @@
-from pydantic import validator
+import base64
+import binascii
+import json
+from functools import reduce
+from operator import and_, or_
+from typing import Optional
 
-from acc_server_mgr.models.schema import FilterOperator, SortingDir
+from peewee import IntegrityError
+
+from acc_server_mgr.models.schema import (
+    FilterOperator, SortingDir, PaginationMode,
+)
+
+
+class FilterError(ValueError):
+    """
+    ``FilterRequest`` can't be applied, e.g. malformed cursor.
+    """
+
+
+class VersionConflict(Exception):
+    """
+    Row changed since the version a write was conditioned on.
+    """
 
 
 def apply_filter(query, model, filter_request):
@@ -11,10 +32,22 @@ def apply_filter(query, model, filter_request):
     return query
 
 
+def sort_keys(model, filter_request) -> list:
+    """
+    Fields and directions to sort by, primary key last as tie-breaker, so
+    sort order is total.
+    """
+    keys = []
+    for field_name, direction in filter_request.sort:
+        keys.append((getattr(model, field_name), direction))
+    if not any(field is model._meta.primary_key for field, _ in keys):
+        keys.append((model._meta.primary_key, SortingDir.asc))
+    return keys
+
+
 def apply_sort(query, model, filter_request):
     sorts = []
-    for field_name, direction in filter_request.sort:
-        field = getattr(model, field_name)
+    for field, direction in sort_keys(model, filter_request):
         if direction == SortingDir.asc:
             sorts.append(field.asc())
         elif direction == SortingDir.desc:
@@ -37,3 +70,140 @@ def apply_operator(field, operator, value):
         return field <= value
     elif operator == FilterOperator.contains:
         return field.contains(value)
+
+
+def encode_cursor(values: list) -> str:
+    return base64.urlsafe_b64encode(
+        json.dumps(values, default=str, separators=(",", ":")).encode("UTF-8")
+    ).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> list:
+    """
+    Values of ``cursor``, a list of JSON scalars as encoded by
+    ``encode_cursor``.
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except (ValueError, binascii.Error):
+        raise FilterError("malformed cursor")
+    if not isinstance(values, list) or not all(
+        it is None or isinstance(it, (str, int, float)) for it in values
+    ):
+        raise FilterError("malformed cursor")
+    return values
+
+
+def _after(field, direction, value):
+    """
+    Criterion for rows sorting after ``value`` on ``field``. SQLite sorts NULL
+    first ascending, last descending. None if no row can sort after.
+    """
+    if direction == SortingDir.asc:
+        if value is None:
+            return field.is_null(False)
+        return field > value
+    if value is None:
+        return None
+    return (field < value) | field.is_null()
+
+
+def _equal(field, value):
+    if value is None:
+        return field.is_null()
+    return field == value
+
+
+def seek(keys, values):
+    """
+    Criterion for rows sorting after ``values`` of ``keys``, expands to
+    ``(k0 after v0) OR (k0 = v0 AND k1 after v1) OR ...``.
+    """
+    criteria = []
+    for index, (field, direction) in enumerate(keys):
+        after = _after(field, direction, values[index])
+        if after is not None:
+            criteria.append(reduce(and_, [
+                _equal(keys[i][0], values[i]) for i in range(index)
+            ], after))
+    if not criteria:
+        return None
+    return reduce(or_, criteria)
+
+
+def page_items(model, filter_request, rows) -> tuple[list, Optional[str]]:
+    """
+    Rows of the page and cursor of the next page from rows fetched with one
+    extra row in cursor pagination. Cursor is None if there's no next page or
+    not paginating by cursor.
+    """
+    rows = list(rows)
+    if filter_request.pagination != PaginationMode.cursor:
+        return rows, None
+
+    if len(rows) <= filter_request.items_per_page:
+        return rows, None
+
+    rows = rows[:filter_request.items_per_page]
+    last = rows[-1]
+    return rows, encode_cursor([
+        last.__data__.get(field.name)
+        for field, _ in sort_keys(model, filter_request)
+    ])
+
+
+def inserted_ids(last_id: int, count: int) -> range:
+    """
+    Row ids of ``count`` rows inserted by one ``insert_many`` returning
+    ``last_id``. SQLite assigns rows of one INSERT consecutive ids, as long
+    as ids aren't inserted explicitly.
+    """
+    return range(last_id - count + 1, last_id + 1)
+
+
+def insert_chunk(db, insert, items: list) -> list:
+    """
+    Run ``insert(items)``, inserting ``items`` and returning their row ids,
+    in a savepoint. If a constraint fails, insert items one by one instead,
+    so only failing items are rejected. Returns per item its row id or the
+    ``IntegrityError`` it failed with. Call within ``db.write``.
+    """
+    try:
+        with db.atomic():
+            return list(insert(items))
+    except IntegrityError:
+        pass
+
+    results = []
+    for item in items:
+        try:
+            with db.atomic():
+                results.extend(insert([item]))
+        except IntegrityError as exc:
+            results.append(exc)
+    return results
+
+
+def check_version(version: Optional[tuple], expected) -> Optional[tuple]:
+    """
+    ``version`` of a row, raises ``VersionConflict`` unless ``expected``, if
+    given, accepts it. Call within the write, so the row can't change
+    between checking and writing.
+    """
+    if version is not None and expected is not None \
+            and not expected(version):
+        raise VersionConflict()
+    return version
+
+
+def save_versioned(obj):
+    """
+    Save ``obj`` and increment the version of its row. The version is
+    incremented in SQL, as ``obj`` may have been read before the row last
+    changed. Call within ``db.write``.
+    """
+    model = type(obj)
+    where = model._meta.primary_key == obj.get_id()
+    obj.version = model.version + 1
+    obj.save()
+    obj.version = model.select(model.version).where(where).scalar()
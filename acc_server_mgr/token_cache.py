@@ -0,0 +1,107 @@
+"""
+Cache of verified access tokens keyed by SHA-256 digest of the token, so
+requests with a known token skip signature verification and loading the
+user. Entries expire after ``ttl`` seconds. They are tagged with the
+generation of the user table, shared by all processes, so a write of users
+by any worker, e.g. disabling a user or changing their scopes, takes effect
+on the next request.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from acc_server_mgr.config import config
+
+
+def parse_scopes(scopes: Optional[str]) -> frozenset:
+    """
+    Scopes of comma separated ``scopes``.
+    """
+    if not scopes:
+        return frozenset()
+    return frozenset(filter(None, (it.strip() for it in scopes.split(","))))
+
+
+class VerifiedToken(dict):
+    """
+    Claims of a verified token with ``scopes`` of the user, also parsed as
+    ``scope_set``.
+    """
+
+    def __init__(self, claims: dict, scopes: Optional[str]):
+        super().__init__(claims)
+        self["scopes"] = scopes
+        self.scope_set = parse_scopes(scopes)
+
+
+class TokenCache:
+    """
+    Bounded cache of ``VerifiedToken``s tagged with generations of the user
+    table, see ``cache.generations``, evicts least recently used entries.
+    """
+
+    def __init__(self, maxsize=1024, ttl=300.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        # token digest -> (expires, generations, VerifiedToken)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(token: str) -> bytes:
+        return hashlib.sha256(token.encode("UTF-8")).digest()
+
+    def get(self, key: bytes, generations=()) -> Optional[VerifiedToken]:
+        """
+        Token of ``key`` cached with ``generations`` and not expired.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic() \
+                    or entry[1] != generations:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def set(self, key: bytes, token: VerifiedToken, generations=()):
+        """
+        Cache ``token`` with ``generations`` read before loading its user.
+        """
+        with self._lock:
+            self._entries[key] = (
+                time.monotonic() + self.ttl, generations, token
+            )
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def evict_user(self, user_id: int):
+        """
+        Free entries of ``user_id``, other processes miss them by generation.
+        """
+        with self._lock:
+            for key, (_, _, token) in list(self._entries.items()):
+                if token["user_id"] == user_id:
+                    del self._entries[key]
+
+    def info(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+        }
+
+
+tokens = TokenCache(
+    maxsize=config.getint("auth", "token_cache_size"),
+    ttl=config.getfloat("auth", "token_cache_ttl"),
+)
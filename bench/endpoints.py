@@ -0,0 +1,305 @@
+"""
+Drives endpoints of the ``auth``, ``user``, ``event`` and ``server_config``
+routers in process, through httpx's ASGI transport, on a temporary database
+seeded with generated rows. Reports latency percentiles and requests per
+second per endpoint as JSON, to compare storage and serialization between
+commits.
+
+    python -m bench.endpoints [--users 2000] [--events 20000]
+        [--server-configs 300] [--requests 500] [--concurrency 8]
+        [--only event] [--seed 1] [--output results.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+PASSWORD = "bench"
+ADMIN = "admin@bench.local"
+TRACKS = ["monza", "spa", "nurburgring", "silverstone", "zandvoort", "imola"]
+CHUNK_SIZE = 500
+
+
+def _event(index, rng):
+    return {
+        "name": f"event {index}", "track": rng.choice(TRACKS),
+        "preRaceWaitingTimeSeconds": 60, "sessionOverTimeSeconds": 120,
+        "ambientTemp": rng.randint(10, 30), "cloudLevel": 0.1, "rain": 0.0,
+        "weatherRandomness": 1, "postQualySeconds": 10,
+        "postRaceSeconds": 15, "metaData": "",
+        "simracerWeatherConditions": False,
+        "isFixedConditionQualification": False,
+        "sessions": [
+            {
+                "name": name, "hourOfDay": 10 + day, "dayOfWeekend": day,
+                "timeMultiplier": 1, "sessionType": name[0].upper(),
+                "sessionDurationMinutes": 20,
+            }
+            for day, name in enumerate(["practice", "qualifying", "race"], 1)
+        ],
+    }
+
+
+def _server_config(index, event_id):
+    return {
+        "name": f"server {index}", "is_enabled": index % 2 == 0,
+        "event_id": event_id, "settings_server_name": f"server {index}",
+        "settings_admin_password": "admin", "settings_car_group": "GT3",
+        "settings_track_medals_requirement": 0,
+        "settings_safety_rating_requirement": -1,
+        "settings_racecraft_rating_requirement": -1,
+        "settings_max_car_slots": 30, "settings_short_formation_lap": True,
+        "settings_formation_lap_type": 3, "settings_password": "",
+        "settings_spectator_password": "",
+        "settings_central_entry_list_path": "", "settings_version": "1",
+        "config_public_ip": "", "config_tcp_port": 9000 + index,
+        "config_udp_port": 9000 + index, "config_register_to_lobby": False,
+        "config_max_connections": 40, "config_version": "1",
+    }
+
+
+def seed(db, args, rng) -> dict:
+    """
+    Insert ``args.users`` users, ``args.events`` events with three sessions
+    each and ``args.server_configs`` server configs of random events.
+    """
+    from acc_server_mgr import migrations
+    from acc_server_mgr.models import schema
+    from acc_server_mgr.models.db import User
+    from acc_server_mgr.storage import user, event, server_config
+
+    migrations.migrate(db)
+    user.create_one(db, schema.UserCreate(
+        mail=ADMIN, password=PASSWORD, password_confirm=PASSWORD,
+        scopes="admin", is_enabled=True,
+    ))
+    password_hash = user.hash_password(PASSWORD)
+    start = datetime.now() - timedelta(days=365)
+    rows = [
+        {
+            "mail": f"user{index}@bench.local", "password_hash": password_hash,
+            "is_enabled": index % 10 != 0, "scopes": "event,server_config",
+            "created": start + timedelta(minutes=index),
+            "last_login": None if index % 3 else start,
+        }
+        for index in range(1, args.users + 1)
+    ]
+    for offset in range(0, len(rows), CHUNK_SIZE):
+        chunk = rows[offset:offset + CHUNK_SIZE]
+        db.write(lambda: User.insert_many(chunk).execute())
+
+    event_ids = event.create_many(db, [
+        schema.EventCreateRequest(**_event(index, rng))
+        for index in range(1, args.events + 1)
+    ])
+    server_config_ids = server_config.create_many(db, [
+        schema.ServerConfigCreate(
+            **_server_config(index, rng.choice(event_ids))
+        )
+        for index in range(1, args.server_configs + 1)
+    ])
+    rejected = [
+        it for it in event_ids + server_config_ids if isinstance(it, Exception)
+    ]
+    if rejected:
+        raise RuntimeError(f"seeding rejected {len(rejected)} rows")
+    return {
+        "users": args.users + 1,
+        "events": len(event_ids),
+        "sessions": 3 * len(event_ids),
+        "server_configs": len(server_config_ids),
+    }
+
+
+def scenarios(counts, rng) -> dict:
+    """
+    Request factories by endpoint name, returning method, URL and keyword
+    arguments of ``httpx.AsyncClient.request``. Filters vary in values and
+    pages, so not every request is served by the result cache.
+    """
+    def user_id():
+        # the admin is the first user
+        return rng.randint(2, counts["users"])
+
+    def event_id():
+        return rng.randint(1, counts["events"])
+
+    def server_config_id():
+        return rng.randint(1, counts["server_configs"])
+
+    def filter_body(query, sort):
+        return {
+            "query": query, "sort": sort, "page": rng.randint(0, 20),
+            "items_per_page": 50,
+        }
+
+    return {
+        "auth token": lambda: ("POST", "/auth/token", {
+            "data": {
+                "username": f"user{user_id() - 1}@bench.local",
+                "password": PASSWORD,
+            },
+        }),
+        "auth token-check": lambda: ("POST", "/auth/token-check", {}),
+        "user get": lambda: ("GET", f"/user/{user_id()}", {}),
+        "user filter": lambda: ("POST", "/user/_filter", {
+            "json": filter_body(
+                [["is_enabled", "==", True]], [["created", "desc"]]
+            ),
+        }),
+        "event get": lambda: ("GET", f"/event/{event_id()}", {}),
+        "event filter": lambda: ("POST", "/event/_filter", {
+            "json": filter_body(
+                [["track", "==", rng.choice(TRACKS)]], [["name", "asc"]]
+            ),
+        }),
+        "event patch": lambda: ("PATCH", f"/event/{event_id()}", {
+            "json": {"ambientTemp": rng.randint(10, 30)},
+        }),
+        "server_config get": lambda: (
+            "GET", f"/server_config/{server_config_id()}", {}
+        ),
+        "server_config filter": lambda: ("POST", "/server_config/_filter", {
+            "json": filter_body(
+                [["is_enabled", "==", rng.random() < 0.5]],
+                [["config_tcp_port", "desc"]],
+            ),
+        }),
+    }
+
+
+def summarize(latencies: list[float], errors: int, seconds: float) -> dict:
+    cuts = statistics.quantiles(latencies, n=100, method="inclusive")
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / seconds, 1),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 3),
+        "p50_ms": round(cuts[49] * 1000, 3),
+        "p95_ms": round(cuts[94] * 1000, 3),
+        "p99_ms": round(cuts[98] * 1000, 3),
+    }
+
+
+async def run(client, make, requests, concurrency) -> dict:
+    """
+    ``requests`` requests made by ``make``, ``concurrency`` at a time.
+    """
+    latencies = []
+    errors = 0
+    remaining = requests
+
+    async def worker():
+        nonlocal errors, remaining
+        while remaining > 0:
+            remaining -= 1
+            method, url, kwargs = make()
+            start = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return summarize(latencies, errors, time.perf_counter() - start)
+
+
+async def bench(app, counts, args, rng) -> dict:
+    import httpx
+
+    results = {}
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://bench"
+        ) as client:
+            response = await client.post("/auth/token", data={
+                "username": ADMIN, "password": PASSWORD,
+            })
+            response.raise_for_status()
+            client.headers["Authorization"] = \
+                f"Bearer {response.json()['access_token']}"
+
+            for name, make in scenarios(counts, rng).items():
+                if args.only and not name.startswith(tuple(args.only)):
+                    continue
+                await run(client, make, args.warmup, args.concurrency)
+                results[name] = await run(
+                    client, make, args.requests, args.concurrency
+                )
+                print(f"{name}: {results[name]}", file=sys.stderr)
+    return results
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--events", type=int, default=20000)
+    parser.add_argument("--server-configs", type=int, default=300)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument(
+        "--only", action="append",
+        help="run endpoints starting with this name only, repeatable",
+    )
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write results to this file")
+    args = parser.parse_args()
+
+    output = args.output and os.path.abspath(args.output)
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory(prefix="acc-bench-") as directory:
+        # the database, instances and config paths are relative to the
+        # working directory, so the app is imported in the temporary one
+        os.chdir(directory)
+        os.environ["ACC_SERVER_MGR_CONFIG"] = os.path.join(
+            directory, "config.ini"
+        )
+        from acc_server_mgr.database import db
+
+        start = time.perf_counter()
+        counts = seed(db, args, rng)
+        seed_seconds = time.perf_counter() - start
+        print(f"seeded {counts} in {seed_seconds:.1f}s", file=sys.stderr)
+
+        from acc_server_mgr.application import create_app
+        results = asyncio.run(bench(create_app(), counts, args, rng))
+
+    report = json.dumps({
+        "commit": _commit(),
+        "python": platform.python_version(),
+        "seeded": counts,
+        "seed_seconds": round(seed_seconds, 1),
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "results": results,
+    }, indent=2)
+    if output:
+        with open(output, "w", encoding="UTF-8") as fp:
+            fp.write(report + "\n")
+    print(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""
+Compares rendering search responses with ``from_orm`` and FastAPI's response
+serialization to ``serializers.search_response``. Rows are built in memory,
+so only serialization is measured.
+
+    python -m bench.serialize [--items 100] [--repeat 50]
+"""
+import argparse
+import asyncio
+import json
+import time
+from datetime import datetime
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from acc_server_mgr import serializers
+from acc_server_mgr.models import schema
+from acc_server_mgr.models.db import (
+    User, Event, Session, ServerConfig, PersonalBest, Driver,
+)
+
+NOW = datetime.now()
+
+
+def _event(id):
+    event = Event(
+        id=id, name=f"event {id}", track="monza", created=NOW,
+        pre_race_waiting_time_seconds=60, session_over_time_seconds=120,
+        ambient_temp=22, cloud_level=0.1, rain=0.0, weather_randomness=1,
+        post_qualy_seconds=10, post_race_seconds=15, meta_data="",
+        simracer_weather_conditions=False,
+        is_fixed_condition_qualification=False,
+    )
+    event.sessions = [
+        Session(
+            id=id * 3 + i, event=event, name=f"session {i}", created=NOW,
+            hour_of_day=10 + i, day_of_weekend=i + 1, time_multiplier=1,
+            session_type="PQR"[i], session_duration_minutes=20,
+        )
+        for i in range(3)
+    ]
+    return event
+
+
+def _server_config(id):
+    return ServerConfig(
+        id=id, name=f"server {id}", created=NOW, is_enabled=True,
+        event=_event(id), settings_server_name=f"server {id}",
+        settings_admin_password="", settings_car_group="GT3",
+        settings_track_medals_requirement=0,
+        settings_safety_rating_requirement=-1,
+        settings_racecraft_rating_requirement=-1, settings_password="",
+        settings_spectator_password="", settings_max_car_slots=30,
+        settings_dump_leaderboards=False, settings_dump_entry_list=False,
+        settings_is_race_locked=True, settings_short_formation_lap=True,
+        settings_formation_lap_type=3,
+        settings_do_driver_swap_broadcast=False,
+        settings_randomize_track_when_empty=False,
+        settings_central_entry_list_path="", settings_allow_auto_dq=False,
+        settings_ignore_premature_disconnects=True, settings_version="1",
+        config_public_ip="", config_tcp_port=9231, config_udp_port=9231,
+        config_register_to_lobby=False, config_max_connections=40,
+        config_lan_discovery=False, config_version="1",
+    )
+
+
+def _personal_best(id):
+    return PersonalBest(
+        id=id, track="spa", car_group="GT3", car_model=1, lap_time=137000,
+        splits="45000,46000,46000", achieved=NOW, session_result=1,
+        driver=Driver(
+            id=id, player_id=f"S{id}", first_name="First", last_name="Last",
+            short_name="FIL",
+        ),
+    )
+
+
+def _user(id):
+    return User(
+        id=id, mail=f"user{id}@example.com", is_enabled=True, created=NOW,
+        last_login=NOW, scopes="event,server_config",
+    )
+
+
+CASES = {
+    "user": (
+        _user, schema.UserResponse, schema.UserFilterResponse,
+        serializers.users,
+    ),
+    "event": (
+        _event, schema.EventResponse, schema.EventSearchResponse,
+        serializers.events,
+    ),
+    "server_config": (
+        _server_config, schema.ServerConfigResponse,
+        schema.ServerConfigSearchResponse, serializers.server_configs,
+    ),
+    "leaderboard": (
+        _personal_best, schema.PersonalBestResponse,
+        schema.PersonalBestSearchResponse, serializers.personal_bests,
+    ),
+}
+
+
+async def _from_orm(response_field, item_schema, search_schema, items):
+    content = await serialize_response(
+        field=response_field,
+        response_content=search_schema(
+            total_count=len(items),
+            items=[item_schema.from_orm(it) for it in items],
+            next_cursor=None,
+        ),
+        is_coroutine=True,
+    )
+    return JSONResponse(content).body
+
+
+def _timed(fn, repeat) -> float:
+    """
+    Best of ``repeat`` runs of ``fn`` in milliseconds.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--items", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    loop = asyncio.new_event_loop()
+    results = {}
+    for name, (make, item_schema, search_schema, serializer) in CASES.items():
+        items = [make(id) for id in range(1, args.items + 1)]
+        response_field = create_response_field(
+            name=f"Response_{name}", type_=search_schema
+        )
+
+        def before():
+            return loop.run_until_complete(_from_orm(
+                response_field, item_schema, search_schema, items
+            ))
+
+        def after():
+            return serializers.search_response(
+                serializer, len(items), items, None
+            ).body
+
+        assert json.loads(before()) == json.loads(after()), name
+        results[name] = {
+            "from_orm_ms": round(_timed(before, args.repeat), 3),
+            "serializer_ms": round(_timed(after, args.repeat), 3),
+        }
+        results[name]["speedup"] = round(
+            results[name]["from_orm_ms"] / results[name]["serializer_ms"], 1
+        )
+    loop.close()
+    print(json.dumps({
+        "items": args.items,
+        "encoder": "orjson" if serializers.orjson else "json",
+        "results": results,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
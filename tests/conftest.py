@@ -0,0 +1,155 @@
+"""
+Tests run on a temporary directory with its own ``config.ini``, written
+before ``acc_server_mgr`` is imported, as its singletons read the config on
+import. Server processes are played by ``dummy_server.py``.
+"""
+import asyncio
+import os
+import pathlib
+import shutil
+import tempfile
+import time
+
+import pytest
+
+DUMMY_SERVER = str(pathlib.Path(__file__).with_name("dummy_server.py"))
+PASSWORD = "test"
+ADMIN = "admin@test.local"
+
+_directory = tempfile.mkdtemp(prefix="acc-tests-")
+os.environ["ACC_SERVER_MGR_CONFIG"] = os.path.join(_directory, "config.ini")
+with open(os.environ["ACC_SERVER_MGR_CONFIG"], "w", encoding="UTF-8") as fp:
+    fp.write(
+        "[database]\n"
+        f"path = {os.path.join(_directory, 'app.db')}\n"
+        "[acc]\n"
+        f"server_exe_path = {DUMMY_SERVER}\n"
+        f"instances_path = {os.path.join(_directory, 'instances')}\n"
+        "stop_timeout = 2\n"
+        "results_scan_interval = 3600\n"
+    )
+
+
+def pytest_unconfigure(config):
+    shutil.rmtree(_directory, ignore_errors=True)
+
+
+async def wait_for(predicate, timeout=5.0):
+    """
+    Poll ``predicate`` until it returns a true value, which is returned.
+    """
+    deadline = time.monotonic() + timeout
+    while not (result := predicate()):
+        if time.monotonic() > deadline:
+            raise AssertionError("timed out waiting")
+        await asyncio.sleep(0.02)
+    return result
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture(scope="session")
+def db():
+    from acc_server_mgr import migrations
+    from acc_server_mgr.database import db
+
+    migrations.migrate(db)
+    yield db
+    db.stop_writer()
+
+
+@pytest.fixture
+def event(db):
+    from acc_server_mgr.models import schema
+    from acc_server_mgr.storage import event
+
+    return event.create_one(db, schema.EventCreateRequest(
+        name="event", track="monza", preRaceWaitingTimeSeconds=60,
+        sessionOverTimeSeconds=120, ambientTemp=20, cloudLevel=0.1,
+        rain=0.0, weatherRandomness=1, postQualySeconds=10,
+        postRaceSeconds=15, metaData="", simracerWeatherConditions=False,
+        isFixedConditionQualification=False,
+        sessions=[
+            {
+                "name": "race", "hourOfDay": 12, "dayOfWeekend": 3,
+                "timeMultiplier": 1, "sessionType": "R",
+                "sessionDurationMinutes": 20,
+            }
+        ],
+    ))
+
+
+@pytest.fixture
+def server_config_data(event):
+    """
+    Fields of an enabled server config of ``event``.
+    """
+    return {
+        "name": "server", "is_enabled": True, "event_id": event.id,
+        "settings_server_name": "server",
+        "settings_admin_password": "admin", "settings_car_group": "GT3",
+        "settings_track_medals_requirement": 0,
+        "settings_safety_rating_requirement": -1,
+        "settings_racecraft_rating_requirement": -1,
+        "settings_max_car_slots": 30, "settings_short_formation_lap": True,
+        "settings_formation_lap_type": 3, "settings_password": "",
+        "settings_spectator_password": "",
+        "settings_central_entry_list_path": "", "settings_version": "1",
+        "config_public_ip": "", "config_tcp_port": 9231,
+        "config_udp_port": 9232, "config_register_to_lobby": False,
+        "config_max_connections": 40, "config_version": "1",
+    }
+
+
+@pytest.fixture
+def make_server_config(db, server_config_data):
+    """
+    Creates server configs of ``event``, with ``server_config_data`` but
+    ``fields``.
+    """
+    from acc_server_mgr.models import schema
+    from acc_server_mgr.storage import server_config
+
+    def make(**fields):
+        obj = server_config.create_one(db, schema.ServerConfigCreate(
+            **{**server_config_data, **fields}
+        ))
+        return server_config.get_one(db, obj.id)
+
+    return make
+
+
+@pytest.fixture
+async def client(db):
+    """
+    Client of the app, authorized as admin, with the app started.
+    """
+    import httpx
+    from acc_server_mgr.application import create_app
+    from acc_server_mgr.models import schema
+    from acc_server_mgr.models.db import User
+    from acc_server_mgr.storage import user
+
+    with db.atomic():
+        exists = User.select().where(User.mail == ADMIN).exists()
+    if not exists:
+        user.create_one(db, schema.UserCreate(
+            mail=ADMIN, password=PASSWORD, password_confirm=PASSWORD,
+            scopes="admin", is_enabled=True,
+        ))
+
+    app = create_app()
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url="http://test"
+        ) as client:
+            response = await client.post("/auth/token", data={
+                "username": ADMIN, "password": PASSWORD,
+            })
+            response.raise_for_status()
+            client.headers["Authorization"] = \
+                f"Bearer {response.json()['access_token']}"
+            yield client
@@ -0,0 +1,25 @@
+#!/usr/bin/env python3
+"""
+Stands in for the ACC server executable in tests. Prints its working
+directory and the rendered cfg files, then a line every 0.1 seconds until
+terminated, it exits with 0 on SIGTERM.
+"""
+import os
+import signal
+import sys
+import time
+
+
+def terminate(signum, frame):
+    print("terminating", flush=True)
+    sys.exit(0)
+
+
+signal.signal(signal.SIGTERM, terminate)
+print(f"dummy server in {os.getcwd()}", flush=True)
+print(" ".join(sorted(os.listdir("cfg"))), flush=True)
+tick = 0
+while True:
+    tick += 1
+    print(f"tick {tick}", flush=True)
+    time.sleep(0.1)
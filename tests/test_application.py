@@ -0,0 +1,20 @@
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_cors_headers(client):
+    response = await client.options("/event/1", headers={
+        "Origin": "http://example.com",
+        "Access-Control-Request-Method": "GET",
+        "Access-Control-Request-Headers": "Accept, Content-Length",
+    })
+    assert response.status_code == 200
+    allowed = response.headers["access-control-allow-headers"].split(", ")
+    assert {"Accept", "Content-Length"} <= set(allowed)
+
+    response = await client.get("/event/1", headers={
+        "Origin": "http://example.com",
+    })
+    exposed = response.headers["access-control-expose-headers"].split(", ")
+    assert {"Accept", "Content-Length"} <= set(exposed)
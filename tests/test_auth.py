@@ -0,0 +1,106 @@
+import pathlib
+import subprocess
+import sys
+
+import pytest
+
+from acc_server_mgr.models import schema
+from acc_server_mgr.storage import user as storage
+
+pytestmark = pytest.mark.anyio
+
+ROOT = pathlib.Path(__file__).parent.parent
+
+
+def _create_user(db, mail, scopes):
+    return storage.create_one(db, schema.UserCreate(
+        mail=mail, password="test", password_confirm="test", scopes=scopes,
+        is_enabled=True,
+    ))
+
+
+async def _headers(client, mail):
+    response = await client.post("/auth/token", data={
+        "username": mail, "password": "test",
+    })
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def test_user_written_by_another_process(db, client, event):
+    user_obj = _create_user(db, "process@auth.test", "event")
+    headers = await _headers(client, "process@auth.test")
+    url = f"/event/{event.id}"
+    assert (await client.get(url, headers=headers)).status_code == 200
+
+    # another worker disables the user, this one only sees the generations
+    subprocess.run([
+        sys.executable, "-c",
+        "from acc_server_mgr.database import db\n"
+        "from acc_server_mgr.models.schema import UserUpdate\n"
+        "from acc_server_mgr.storage import user\n"
+        f"user.update_one(db, {user_obj.id}, UserUpdate(is_enabled=False))\n"
+        "db.stop_writer()\n",
+    ], cwd=ROOT, check=True)
+
+    assert (await client.get(url, headers=headers)).status_code == 403
+
+
+async def test_scope_is_no_substring(db, client, event):
+    _create_user(db, "substring@auth.test", "events_admin,server_config")
+    headers = await _headers(client, "substring@auth.test")
+
+    response = await client.get(f"/event/{event.id}", headers=headers)
+    assert response.status_code == 403
+
+
+async def test_cached_token(db, client, event):
+    from acc_server_mgr.token_cache import tokens
+
+    _create_user(db, "cached@auth.test", "event")
+    headers = await _headers(client, "cached@auth.test")
+    url = f"/event/{event.id}"
+    assert (await client.get(url, headers=headers)).status_code == 200
+
+    hits = tokens.hits
+    assert (await client.get(url, headers=headers)).status_code == 200
+    assert tokens.hits == hits + 1
+
+
+async def test_user_update_evicts_token(db, client, event):
+    user_obj = _create_user(db, "evicted@auth.test", "event")
+    headers = await _headers(client, "evicted@auth.test")
+    url = f"/event/{event.id}"
+    assert (await client.get(url, headers=headers)).status_code == 200
+
+    response = await client.patch(
+        f"/user/{user_obj.id}", json={"scopes": "server_config"}
+    )
+    assert response.status_code == 200
+    assert (await client.get(url, headers=headers)).status_code == 403
+
+    response = await client.patch(
+        f"/user/{user_obj.id}", json={"scopes": "event"}
+    )
+    assert (await client.get(url, headers=headers)).status_code == 200
+
+    response = await client.patch(
+        f"/user/{user_obj.id}", json={"is_enabled": False}
+    )
+    assert response.status_code == 200
+    assert (await client.get(url, headers=headers)).status_code == 403
+
+
+async def test_partial_user_update(db, client):
+    user_obj = _create_user(db, "partial@auth.test", "event")
+
+    response = await client.patch(
+        f"/user/{user_obj.id}", json={"scopes": "event,server_config"}
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert data["mail"] == "partial@auth.test"
+    assert data["is_enabled"] is True
+    assert data["scopes"] == "event,server_config"
+    # the password is kept
+    await _headers(client, "partial@auth.test")
@@ -0,0 +1,77 @@
+import base64
+import json
+from datetime import datetime
+
+import pytest
+
+from acc_server_mgr.models import schema
+from acc_server_mgr.models.db import User
+from acc_server_mgr.storage import user
+
+
+def _mails(db, query):
+    _, items, _ = user.search(db, schema.FilterRequest(
+        query=query, sort=[["mail", "asc"]], items_per_page=100,
+    ))
+    return [it.mail for it in items]
+
+
+def test_filter_by_null(db):
+    for mail in ("null1@compiler.test", "null2@compiler.test",
+                 "login@compiler.test"):
+        user.create_one(db, schema.UserCreate(
+            mail=mail, password="test", password_confirm="test",
+            scopes="event", is_enabled=True,
+        ))
+    db.write(lambda: User.update(last_login=datetime.now())
+             .where(User.mail == "login@compiler.test").execute())
+    domain = ["mail", "contains", "@compiler.test"]
+
+    assert _mails(db, [domain, ["last_login", "==", None]]) == [
+        "null1@compiler.test", "null2@compiler.test",
+    ]
+    assert _mails(db, [domain, ["last_login", "!=", None]]) == [
+        "login@compiler.test",
+    ]
+    # the same field and operator compared to a value
+    assert _mails(db, [domain, ["mail", "==", None]]) == []
+    assert _mails(db, [domain, ["mail", "==", "null1@compiler.test"]]) == [
+        "null1@compiler.test",
+    ]
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("pagination", ["offset", "cursor"])
+@pytest.mark.parametrize("items_per_page", [0, None])
+async def test_invalid_items_per_page(client, pagination, items_per_page):
+    response = await client.post("/user/_filter", json={
+        "query": [], "sort": [["mail", "asc"]], "pagination": pagination,
+        "items_per_page": items_per_page,
+    })
+    assert response.status_code == 422
+
+
+def _cursor(value) -> str:
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).decode()
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("cursor", [
+    "not base64!", _cursor({"a": 1}), _cursor([{"a": 1}]), _cursor([[1]]),
+])
+async def test_malformed_cursor(client, cursor):
+    response = await client.post("/user/_filter", json={
+        "query": [], "sort": [["id", "asc"]], "pagination": "cursor",
+        "cursor": cursor,
+    })
+    assert response.status_code == 422
+    assert response.json() == {"detail": "malformed cursor"}
+
+
+@pytest.mark.anyio
+async def test_value_of_other_type(client):
+    response = await client.post("/user/_filter", json={
+        "query": [["id", "==", {"a": 1}]], "sort": [["id", "asc"]],
+    })
+    assert response.status_code == 422
+    assert response.json() == {"detail": "invalid query value {'a': 1}"}
@@ -0,0 +1,22 @@
+import pathlib
+
+from acc_server_mgr import config
+
+DIST_CONFIG = pathlib.Path(__file__).parent.parent / "dist.config.ini"
+
+
+def test_empty_path_is_default(tmp_path):
+    path = tmp_path / "config.ini"
+    path.write_text(
+        "[database]\npath = ./other.db\n[acc]\ninstances_path =\n",
+        encoding="UTF-8",
+    )
+
+    parser = config.load(path)
+    assert parser.get("database", "path") == "./other.db"
+    assert parser.get("acc", "instances_path") == "./instances"
+
+
+def test_dist_config():
+    parser = config.load(DIST_CONFIG)
+    assert parser.get("acc", "instances_path") == "./instances"
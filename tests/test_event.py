@@ -0,0 +1,113 @@
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_delete_used_event_conflicts(client, event, make_server_config):
+    server_config = make_server_config()
+
+    response = await client.delete(f"/event/{event.id}")
+    assert response.status_code == 409
+    assert (await client.get(f"/event/{event.id}")).status_code == 200
+
+    response = await client.delete(f"/server_config/{server_config.id}")
+    assert response.status_code == 204
+    response = await client.delete(f"/event/{event.id}")
+    assert response.status_code == 204
+    assert (await client.get(f"/event/{event.id}")).status_code == 404
+
+
+def _session(name, session_type, **fields):
+    return {
+        "name": name, "hourOfDay": 12, "dayOfWeekend": 3,
+        "timeMultiplier": 1, "sessionType": session_type,
+        "sessionDurationMinutes": 20, **fields,
+    }
+
+
+def _sessions(db, event_id):
+    from acc_server_mgr.models.db import Session
+
+    with db.atomic():
+        return list(
+            Session.select().where(Session.event == event_id)
+            .order_by(Session.id).dicts()
+        )
+
+
+async def test_update_sessions(db, client, event):
+    practice, race = _session("practice", "P"), _session("race", "R")
+    response = await client.post("/event/", json={
+        **(await client.get(f"/event/{event.id}")).json(),
+        "name": "sessions", "sessions": [practice, race],
+    })
+    assert response.status_code == 200
+    event_id = response.json()["id"]
+    practice_id, _ = [it["id"] for it in _sessions(db, event_id)]
+
+    response = await client.patch(f"/event/{event_id}", json={
+        "sessions": [
+            {**practice, "id": practice_id, "sessionDurationMinutes": 30},
+            _session("qualifying", "Q"),
+        ],
+    })
+    assert response.status_code == 200
+    sessions = _sessions(db, event_id)
+    assert [(it["name"], it["session_duration_minutes"]) for it in sessions] \
+        == [("practice", 30), ("qualifying", 20)]
+    assert sessions[0]["id"] == practice_id
+    assert len({it["id"] for it in sessions}) == 2
+    assert [it["name"] for it in response.json()["sessions"]] == [
+        "practice", "qualifying",
+    ]
+
+    # without sessions they are kept
+    response = await client.patch(f"/event/{event_id}", json={"rain": 0.5})
+    assert response.status_code == 200
+    assert _sessions(db, event_id) == sessions
+    assert len(response.json()["sessions"]) == 2
+
+
+async def test_etag(client, event):
+    url = f"/event/{event.id}"
+    response = await client.get(url)
+    tag = response.headers["ETag"]
+
+    response = await client.get(url, headers={"If-None-Match": tag})
+    assert response.status_code == 304
+    assert response.headers["ETag"] == tag
+    response = await client.get(url, headers={"If-None-Match": f"W/{tag}"})
+    assert response.status_code == 304
+
+    response = await client.patch(
+        url, json={"rain": 0.2}, headers={"If-Match": tag}
+    )
+    assert response.status_code == 200
+    new_tag = response.headers["ETag"]
+    assert new_tag != tag
+    assert (await client.get(url)).headers["ETag"] == new_tag
+    response = await client.get(url, headers={"If-None-Match": tag})
+    assert response.status_code == 200
+
+    # stale
+    response = await client.patch(
+        url, json={"rain": 0.3}, headers={"If-Match": tag}
+    )
+    assert response.status_code == 412
+    assert (await client.get(url)).json()["rain"] == 0.2
+
+
+async def test_etag_of_sessions(client, event):
+    url = f"/event/{event.id}"
+    response = await client.get(url)
+    tag = response.headers["ETag"]
+    sessions = response.json()["sessions"]
+
+    response = await client.patch(url, json={
+        "sessions": [{**sessions[0], "sessionDurationMinutes": 45}],
+    })
+    assert response.status_code == 200
+    assert response.headers["ETag"] != tag
+    response = await client.get(url, headers={"If-None-Match": tag})
+    assert response.status_code == 200
+    assert response.json()["sessions"][0]["sessionDurationMinutes"] == 45
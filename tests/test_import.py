@@ -0,0 +1,53 @@
+import json
+
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+
+def _statuses(response):
+    assert response.status_code == 200
+    return [
+        (it["index"], it["status"]) for it in response.json()["items"]
+    ]
+
+
+async def _name(client, server_config_id):
+    response = await client.get(f"/server_config/{server_config_id}")
+    return response.json()["name"]
+
+
+@pytest.mark.parametrize("ndjson", [False, True])
+async def test_import_rejects_single_records(client, server_config_data,
+                                             ndjson):
+    records = [
+        {**server_config_data, "name": "imported 0"},
+        {**server_config_data, "name": "unknown event", "event_id": 999999},
+        {**server_config_data, "name": None},
+        {**server_config_data, "name": "imported 3"},
+    ]
+    if ndjson:
+        lines = [json.dumps(it) for it in records]
+        lines.insert(2, "{not json")
+        response = await client.post(
+            "/server_config/_bulk", content="\n".join(lines),
+            headers={"Content-Type": "application/x-ndjson"},
+        )
+        expected = [
+            (0, "created"), (1, "rejected"), (2, "invalid"), (3, "invalid"),
+            (4, "created"),
+        ]
+    else:
+        response = await client.post("/server_config/_bulk", json=records)
+        expected = [
+            (0, "created"), (1, "rejected"), (2, "invalid"), (3, "created"),
+        ]
+
+    assert _statuses(response) == expected
+    body = response.json()
+    assert (body["created"], body["failed"]) == (2, len(expected) - 2)
+    ids = [it["id"] for it in body["items"] if it["status"] == "created"]
+    assert len(set(ids)) == 2
+    assert [await _name(client, it) for it in ids] == [
+        "imported 0", "imported 3",
+    ]
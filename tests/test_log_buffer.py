@@ -0,0 +1,74 @@
+import asyncio
+
+import anyio
+import pytest
+
+from acc_server_mgr.log_buffer import (
+    FileTail, LogBuffer, RingBuffer, read_lines,
+)
+
+from conftest import wait_for
+
+pytestmark = pytest.mark.anyio
+
+
+async def _next_items(buffer, position, count):
+    follower = buffer.follow(position, keep_alive=0.1)
+    try:
+        return [await follower.__anext__() for _ in range(count)]
+    finally:
+        await follower.aclose()
+
+
+async def test_follow_resumes():
+    buffer = RingBuffer(3)
+    for item in "abcd":
+        buffer.append(item)
+
+    assert await _next_items(buffer, 2, 2) == [(2, "c"), (3, "d")]
+    # dropped items are skipped
+    assert await _next_items(buffer, 0, 1) == [(1, "b")]
+
+
+async def test_follow_position_after_end_starts_over():
+    # e.g. Last-Event-ID of a buffer before an app restart
+    buffer = RingBuffer(3)
+    for item in "ab":
+        buffer.append(item)
+
+    assert await _next_items(buffer, 5000, 2) == [(0, "a"), (1, "b")]
+
+
+async def test_negative_backlog_is_rejected(client, make_server_config):
+    server_config = make_server_config()
+
+    # a stream accepted wouldn't end
+    with anyio.fail_after(5):
+        response = await client.get(
+            f"/server_config/{server_config.id}/_log", params={"backlog": -1}
+        )
+        assert response.status_code == 422
+        response = await client.get(
+            "/server_config/_states", params={"backlog": -1}
+        )
+        assert response.status_code == 422
+
+
+async def test_file_tail_truncates(tmp_path):
+    path = tmp_path / "output.log"
+    buffer = LogBuffer(100)
+    with open(path, "ab", buffering=0) as output:
+        output.write(b"line 1\nline 2\n")
+        tail = FileTail(path, poll_interval=0.01, max_size=10)
+        reader = asyncio.create_task(read_lines(tail, buffer))
+
+        await wait_for(lambda: path.stat().st_size == 0)
+        output.write(b"line 3\n")
+        await wait_for(lambda: buffer.end == 3)
+        tail.finish()
+        await reader
+
+    assert [line for _, line in buffer.tail(0)] == [
+        "line 1", "line 2", "line 3",
+    ]
+    assert path.read_bytes() == b"line 3\n"
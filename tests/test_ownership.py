@@ -0,0 +1,133 @@
+import os
+import socket
+import subprocess
+
+import pytest
+
+from conftest import DUMMY_SERVER, wait_for
+
+pytestmark = pytest.mark.anyio
+
+
+def _exited_owner() -> str:
+    """
+    Owner name of a worker that exited.
+    """
+    process = subprocess.Popen(["true"])
+    process.wait()
+    return f"{socket.gethostname()}:{process.pid}"
+
+
+@pytest.fixture
+async def make_ownership(db, tmp_path):
+    """
+    Starts ownerships of workers named ``owner``, their supervisors share the
+    instances directory. Leases don't expire and aren't renewed during tests.
+    """
+    from acc_server_mgr.ownership import Ownership
+    from acc_server_mgr.process_control import Supervisor
+
+    started = []
+
+    async def make(owner):
+        supervisor = Supervisor(
+            db, DUMMY_SERVER, tmp_path / "instances", stop_timeout=2
+        )
+        ownership = Ownership(db, supervisor, ttl=60, interval=60)
+        ownership.owner = owner
+        started.append(ownership)
+        await ownership.startup()
+        return ownership
+
+    yield make
+    for ownership in reversed(started):
+        await ownership.shutdown()
+
+
+def _exit(ownership):
+    """
+    Stop serving ``ownership`` as if its worker was killed, its server
+    processes keep running.
+    """
+    ownership.task.cancel()
+    ownership.server.close()
+    ownership.local.release()
+    ownership.is_owner = False
+
+
+async def test_take_over_from_exited_owner(make_ownership):
+    previous = await make_ownership(_exited_owner())
+    assert previous.owns()
+
+    ownership = await make_ownership(f"{socket.gethostname()}:1")
+    assert ownership.owns()
+    assert ownership.lease.owner == ownership.owner
+
+    await previous.renew()
+    assert not previous.owns()
+    assert previous.supervisor is previous.client
+
+
+async def test_forward_to_owner(make_ownership, make_server_config):
+    from acc_server_mgr.ownership import RemoteInstance
+
+    owner = await make_ownership(f"{socket.gethostname()}:1")
+    ownership = await make_ownership(f"{socket.gethostname()}:{os.getpid()}")
+    assert owner.owns() and not ownership.owns()
+    server_config = make_server_config()
+    supervisor = ownership.supervisor
+
+    instance = await supervisor.start(server_config)
+    assert isinstance(instance, RemoteInstance)
+    local = owner.local.get(server_config.id)
+    assert instance.pid == local.pid
+    assert instance.started == local.started
+    assert await supervisor.running([server_config.id, -1]) == \
+        {server_config.id}
+
+    stopped = await supervisor.stop(server_config.id)
+    assert stopped.pid == local.pid
+    assert stopped.stopped == local.stopped
+    assert await supervisor.running([server_config.id]) == set()
+    assert await supervisor.stop(server_config.id) is None
+
+
+async def test_owner_unavailable(client, make_server_config, monkeypatch):
+    from acc_server_mgr.ownership import ownership
+
+    server_config = make_server_config()
+    monkeypatch.setattr(ownership, "owns", lambda: False)
+
+    response = await client.post(f"/server_config/{server_config.id}/_start")
+    assert response.status_code == 503
+    assert response.json() == {
+        "detail": "supervisor unavailable: not owner"
+    }
+
+
+async def test_adopt_after_owner_change(db, make_ownership,
+                                        make_server_config):
+    from acc_server_mgr.storage import server_config as storage
+
+    previous = await make_ownership(_exited_owner())
+    server_config = make_server_config()
+    instance = await previous.local.start(server_config)
+    _exit(previous)
+
+    ownership = await make_ownership(f"{socket.gethostname()}:1")
+    assert ownership.owns()
+    adopted = ownership.local.get(server_config.id)
+    assert adopted.pid == instance.pid
+    assert storage.get_one(db, server_config.id).process_id == instance.pid
+    assert await ownership.supervisor.running([server_config.id]) == \
+        {server_config.id}
+    buffer = ownership.local.log(server_config.id)
+    await wait_for(lambda: any(
+        "tick 1" in line for _, line in buffer.tail(buffer.start)
+    ))
+
+    await ownership.supervisor.stop(server_config.id)
+    assert await instance.reaper == 0
+    await wait_for(
+        lambda: not storage.get_one(db, server_config.id).process_is_running
+    )
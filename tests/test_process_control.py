@@ -0,0 +1,143 @@
+import asyncio
+import json
+import os
+import signal
+
+import pytest
+
+from conftest import DUMMY_SERVER, wait_for
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def supervisor(db, tmp_path):
+    from acc_server_mgr.process_control import Supervisor
+
+    supervisor = Supervisor(
+        db, DUMMY_SERVER, tmp_path / "instances", stop_timeout=2
+    )
+    await supervisor.startup()
+    yield supervisor
+    await supervisor.shutdown()
+
+
+def _row(db, server_config_id):
+    from acc_server_mgr.storage import server_config
+
+    return server_config.get_one(db, server_config_id)
+
+
+def _lines(supervisor, server_config_id):
+    buffer = supervisor.log(server_config_id)
+    return [line for _, line in buffer.tail(buffer.start)]
+
+
+async def test_start_stop(db, supervisor, make_server_config):
+    server_config = make_server_config()
+
+    instance = await supervisor.start(server_config)
+    assert supervisor.is_running(server_config.id)
+    assert await supervisor.start(server_config) is instance
+    row = _row(db, server_config.id)
+    assert row.process_is_running
+    assert row.process_id == instance.pid
+
+    await wait_for(lambda: any(
+        "configuration.json" in it
+        for it in _lines(supervisor, server_config.id)
+    ))
+
+    assert await supervisor.stop(server_config.id) is instance
+    assert instance.process.returncode == 0
+    assert not supervisor.is_running(server_config.id)
+    row = _row(db, server_config.id)
+    assert not row.process_is_running
+    assert row.process_id is None
+    assert await supervisor.stop(server_config.id) is None
+
+
+async def test_reap_killed_process(db, supervisor, make_server_config):
+    server_config = make_server_config()
+    instance = await supervisor.start(server_config)
+
+    os.kill(instance.pid, signal.SIGKILL)
+    assert await instance.reaper == -signal.SIGKILL
+    assert not supervisor.is_running(server_config.id)
+    assert not _row(db, server_config.id).process_is_running
+    assert f"[pid {instance.pid} exited with -9]" in \
+        _lines(supervisor, server_config.id)
+
+
+async def test_start_disabled_conflicts(client, make_server_config):
+    server_config = make_server_config(is_enabled=False)
+
+    response = await client.post(f"/server_config/{server_config.id}/_start")
+    assert response.status_code == 409
+    assert response.json() == {"detail": "server_config is disabled"}
+
+
+def _states(supervisor, server_config_id):
+    return [
+        json.loads(data)["state"]
+        for _, (id, data) in supervisor.states.buffer.tail(0)
+        if id == server_config_id
+    ]
+
+
+async def test_concurrent_starts(db, supervisor, make_server_config):
+    server_config = make_server_config()
+
+    first, second = await asyncio.gather(
+        supervisor.start(server_config), supervisor.start(server_config)
+    )
+    assert first is second
+    await supervisor.stop(server_config.id)
+    assert _states(supervisor, server_config.id) == [
+        "starting", "running", "stopped",
+    ]
+
+
+async def test_adopt_across_supervisors(db, tmp_path, make_server_config):
+    from acc_server_mgr.process_control import Supervisor
+
+    server_config = make_server_config()
+    previous = Supervisor(
+        db, DUMMY_SERVER, tmp_path / "instances", stop_timeout=2
+    )
+    await previous.startup()
+    instance = await previous.start(server_config)
+    # output goes to a file and the process runs in its own session, so it
+    # doesn't depend on the worker that spawned it
+    assert os.readlink(f"/proc/{instance.pid}/fd/1").endswith("output.log")
+    # appended to, so it can be truncated
+    with open(f"/proc/{instance.pid}/fdinfo/1") as fp:
+        flags = int(fp.read().split("flags:")[1].split()[0], 8)
+    assert flags & os.O_APPEND
+    assert os.getsid(instance.pid) == instance.pid
+    await wait_for(lambda: "tick 1" in _lines(previous, server_config.id))
+    previous.release()
+
+    supervisor = Supervisor(
+        db, DUMMY_SERVER, tmp_path / "instances", stop_timeout=2
+    )
+    await supervisor.startup()
+    try:
+        adopted = supervisor.get(server_config.id)
+        assert adopted.pid == instance.pid
+        assert _row(db, server_config.id).process_id == instance.pid
+        # recent output, then new output
+        await wait_for(
+            lambda: "tick 1" in _lines(supervisor, server_config.id)
+        )
+        ticks = len(_lines(supervisor, server_config.id))
+        await wait_for(
+            lambda: len(_lines(supervisor, server_config.id)) > ticks
+        )
+    finally:
+        await supervisor.shutdown()
+
+    assert not supervisor.is_running(server_config.id)
+    assert not _row(db, server_config.id).process_is_running
+    assert await instance.reaper == 0
+    assert "terminating" in _lines(supervisor, server_config.id)
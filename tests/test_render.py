@@ -0,0 +1,28 @@
+from acc_server_mgr import render
+from acc_server_mgr.models.db import Event, ServerConfig
+
+
+def _content(rendered, name):
+    return next(
+        it.content for it in rendered.files if it.name == name
+    )[len(render.BOM):].decode(render.ENCODING)
+
+
+def test_render_written_rows_anew(db, make_server_config):
+    from acc_server_mgr.storage import server_config
+
+    obj = make_server_config(settings_server_name="OLD")
+    assert '"OLD"' in _content(render.render(db, obj), "settings.json")
+
+    # written by another process, which invalidates its own cache only
+    db.write(lambda: ServerConfig.update(
+        settings_server_name="NEW", version=ServerConfig.version + 1
+    ).where(ServerConfig.id == obj.id).execute())
+    db.write(lambda: Event.update(
+        ambient_temp=31, version=Event.version + 1
+    ).where(Event.id == obj.event_id).execute())
+
+    rendered = render.render(db, server_config.get_one(db, obj.id))
+    assert '"NEW"' in _content(rendered, "settings.json")
+    assert '"ambientTemp": 31' in _content(rendered, "event.json")
+    assert render.render(db, server_config.get_one(db, obj.id)) is rendered
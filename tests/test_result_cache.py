@@ -0,0 +1,91 @@
+import pytest
+
+from test_results import _result, _write
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def statements(db):
+    """
+    SQL of statements executed while the test runs.
+    """
+    executed = []
+
+    def hook(sql, params, seconds):
+        executed.append(sql)
+
+    db.execute_hooks.append(hook)
+    yield executed
+    db.execute_hooks.remove(hook)
+
+
+async def _filter(client, path, query):
+    response = await client.post(f"/{path}/_filter", json={
+        "query": query, "sort": [["id", "asc"]],
+    })
+    assert response.status_code == 200
+    return response.json()
+
+
+async def _count(client, path, query):
+    return (await _filter(client, path, query))["total_count"]
+
+
+async def test_repeated_filter(client, statements, make_server_config):
+    server_config = make_server_config()
+    query = [["id", "==", server_config.id]]
+    first = await _filter(client, "server_config", query)
+
+    statements.clear()
+    assert await _filter(client, "server_config", query) == first
+    assert statements == []
+
+
+async def test_writes_invalidate(db, client, event, make_server_config):
+    from acc_server_mgr.storage import server_config as storage
+
+    server_config = make_server_config()
+    query = [["id", "==", server_config.id]]
+    await _filter(client, "server_config", query)
+
+    response = await client.patch(f"/event/{event.id}", json={"rain": 0.7})
+    assert response.status_code == 200
+    item, = (await _filter(client, "server_config", query))["items"]
+    assert item["event"]["rain"] == 0.7
+
+    storage.update_process_info(
+        db, server_config.id, process_is_running=True, process_id=4321
+    )
+    item, = (await _filter(client, "server_config", query))["items"]
+    assert item["process_is_running"] and item["process_id"] == 4321
+
+
+async def test_deletes_invalidate(db, client, tmp_path, make_server_config):
+    from acc_server_mgr.models.db import ResultCheckpoint, SessionResult
+    from acc_server_mgr.results import ResultsIngestor
+    from acc_server_mgr.storage import cache, server_config as storage
+
+    server_config = make_server_config(settings_dump_leaderboards=True)
+    query = [["id", "==", server_config.id]]
+    results_path = tmp_path / str(server_config.id) / "results"
+    results_path.mkdir(parents=True)
+    leaderboard_query = [["track", "==", "monza"], ["lap_time", "==", 98765]]
+    assert await _count(client, "leaderboard", leaderboard_query) == 0
+
+    _write(results_path / "231002_100000_R.json", _result(
+        car_id=1010, lap_time=98765
+    ))
+    ingestor = ResultsIngestor(db, tmp_path)
+    assert ingestor.ingest_instance(server_config.id) == 1
+    assert await _count(client, "leaderboard", leaderboard_query) == 1
+
+    generations = cache.generations(SessionResult, ResultCheckpoint)
+    assert await _count(client, "server_config", query) == 1
+    storage.delete_one(db, server_config.id)
+    assert await _count(client, "server_config", query) == 0
+    # the delete set results' server config null and deleted the checkpoint
+    for before, after in zip(
+        generations, cache.generations(SessionResult, ResultCheckpoint)
+    ):
+        assert after > before
@@ -0,0 +1,64 @@
+import json
+
+from acc_server_mgr.results import ResultsIngestor
+
+
+def _result(car_id=1001, lap_time=105000, with_car=True):
+    car = {
+        "carId": car_id, "raceNumber": 1, "carModel": 1, "cupCategory": 0,
+        "carGroup": "GT3", "teamName": "", "nationality": 0,
+        "drivers": [{
+            "firstName": "First", "lastName": "Last", "shortName": "FLA",
+            "playerId": f"S{car_id}",
+        }],
+    }
+    line = {
+        "currentDriver": car["drivers"][0], "currentDriverIndex": 0,
+        "timing": {
+            "lastLap": lap_time, "bestLap": lap_time, "totalTime": lap_time,
+            "lapCount": 1, "bestSplits": [], "lastSplits": [],
+        },
+    }
+    if with_car:
+        line["car"] = car
+    return {
+        "sessionType": "R", "trackName": "monza", "sessionIndex": 2,
+        "raceWeekendIndex": 0, "metaData": "", "serverName": "server",
+        "sessionResult": {
+            "bestlap": lap_time, "bestSplits": [], "isWetSession": 0,
+            "type": 0, "leaderBoardLines": [line],
+        },
+        "laps": [{
+            "carId": car_id, "driverIndex": 0, "laptime": lap_time,
+            "isValidForBest": True, "splits": [],
+        }],
+        "penalties": [], "post_race_penalties": [],
+    }
+
+
+def _write(path, result):
+    path.write_bytes(b"\xff\xfe" + json.dumps(result).encode("utf-16-le"))
+
+
+def test_malformed_file_is_skipped(db, tmp_path, make_server_config):
+    from acc_server_mgr.storage import results as storage
+
+    blocked = make_server_config(settings_dump_leaderboards=True)
+    other = make_server_config(settings_dump_leaderboards=True)
+    ingestor = ResultsIngestor(db, tmp_path)
+    for server_config in (blocked, other):
+        (tmp_path / str(server_config.id) / "results").mkdir(parents=True)
+    results_path = tmp_path / str(blocked.id) / "results"
+    # valid JSON, but a leaderboard line without car
+    _write(results_path / "231001_100000_R.json", _result(with_car=False))
+    _write(results_path / "231001_110000_R.json", _result())
+    _write(
+        tmp_path / str(other.id) / "results" / "231001_100000_R.json",
+        _result(car_id=1002),
+    )
+
+    ingestor.ingest_all()
+
+    assert storage.get_checkpoint(db, blocked.id) == "231001_110000_R.json"
+    assert storage.get_checkpoint(db, other.id) == "231001_100000_R.json"
+    assert ingestor.ingest_instance(blocked.id) == 0